@@ -1,75 +1,438 @@
 import os
-import re
 import json
-from typing import Dict, Any, List, Tuple
-from flask import Flask, request, jsonify, render_template
+import hmac
+import importlib
+import importlib.util
+import io
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Any, Iterator, List, Optional, Tuple, BinaryIO
+
+# Relatório de inicialização (log e GET /models)
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context, url_for
 from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
 from dotenv import load_dotenv
-from openai import OpenAI 
 from config import OPENAI_MODEL
+from model_registry import ModelRegistry, current_rss_mb
+from hf_batcher import MicroBatcher
+from chunking import aggregate_scores, chunk_text, token_offsets
+from keyword_matcher import KeywordMatcher
+from result_cache import ResultCache, make_key as make_cache_key
+from near_duplicates import NearDuplicateIndex
+from reply_index import ReplyIndex, ReplyMatch, make_embedder
+from openai_client import AsyncOpenAIRunner
+from resilience import CircuitBreaker, deadline_scope, remaining_budget
+from pdf_extraction import PdfExtractor
+from cascade import CascadeClassifier, CascadeTier
+from history_store import create_history_store
+from batch_io import classify_stream, iter_jsonl_emails, iter_zip_emails
+from mail_ingest import iter_mail_items, iter_mbox
+from job_queue import JobQueue, validate_callback_url
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as metrics_registry, STAGE_SECONDS, span
 
-import nltk
-from nltk.corpus import stopwords
-
-from PyPDF2 import PdfReader
-
-# Hugging Face (gratuito)
-try:
-    from transformers import pipeline
-    HF_AVAILABLE = True
-except Exception:
-    HF_AVAILABLE = False
-
+from preprocessing import Preprocessor
 
 load_dotenv()
-print("🔑 API Key existe?", bool(os.getenv("OPENAI_API_KEY")))
 
 # Importar configuração
 try:
     from config import CLASSIFICATION_METHOD, HF_MODEL, OPENAI_MODEL
+    from config import HF_SENTIMENT_MODEL, HF_PREWARM
+    from config import HF_BATCH_MAX_SIZE, HF_BATCH_MAX_WAIT_MS, HF_BATCH_MAX_TOKENS
+    from config import HF_CHUNKING, HF_CHUNK_TOKENS, HF_CHUNK_STRIDE, HF_MAX_CHUNKS
+    from config import HF_BACKEND, HF_ONNX_DIR, HF_ONNX_QUANTIZE, HF_ONNX_TOLERANCE, HF_ONNX_THREADS
+    from config import BATCH_MAX_IN_FLIGHT
+    from config import RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS
+    from config import RESULT_CACHE_DB_PATH, RESULT_CACHE_DB_MAX_ENTRIES
+    from config import NEAR_DUP_ENABLED, NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_ENTRIES, NEAR_DUP_MIN_TOKENS
+    from config import NEAR_DUP_METHODS, NEAR_DUP_REPLY_OPENAI
+    from config import REPLY_INDEX_ENABLED, REPLY_INDEX_DIR, REPLY_INDEX_EMBEDDER, REPLY_INDEX_DIM
+    from config import REPLY_INDEX_MIN_SIMILARITY, REPLY_INDEX_ONLY_APPROVED, REPLY_INDEX_LEARN, REPLY_INDEX_NPROBE
+    from config import REPLY_INDEX_APPROVE_TOKEN
+    from config import OPENAI_MAX_CONCURRENCY, OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE
+    from config import OPENAI_MAX_RETRIES, OPENAI_TIMEOUT_SECONDS, OPENAI_CONNECT_TIMEOUT_SECONDS, OPENAI_MAX_CONNECTIONS
+    from config import REQUEST_DEADLINE_SECONDS, FALLBACK_RESERVE_SECONDS, HF_COLD_START_MIN_SECONDS
+    from config import BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS
+    from config import PDF_MAX_PAGES, PDF_MAX_CHARS, PDF_WORKERS, PDF_TIMEOUT_SECONDS, UPLOAD_MAX_MB
+    from config import MAIL_MAX_MESSAGE_BYTES, MAIL_MAX_CHARS
+    from config import HISTORY_BACKEND, HISTORY_MAX, HISTORY_DB_PATH, CLASSIFICATION_STORE_MAX
+    from config import CLASSIFICATION_STORE_TTL_SECONDS
+    from config import LINEAR_MODEL_PATH, LINEAR_THRESHOLD
+    from config import CASCADE_TIERS, CASCADE_MIN_CONFIDENCE, CASCADE_COST_PER_CALL
+    from config import JOBS_DB_PATH, JOBS_FILES_DIR, JOBS_WORKERS, JOBS_BACKEND_CONCURRENCY
+    from config import JOBS_LEASE_SECONDS, JOBS_MAX_ATTEMPTS, JOBS_RETENTION_SECONDS, JOBS_CALLBACK_ALLOWED_HOSTS
+    from config import JOBS_RETRY_BACKOFF_SECONDS, JOBS_RETRY_BACKOFF_MAX_SECONDS
+    from config import LOG_LEVEL
 except ImportError:
     CLASSIFICATION_METHOD = "heuristic"
     HF_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
     OPENAI_MODEL = "gpt-4o-mini"
+    HF_SENTIMENT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+    HF_PREWARM = False
+    HF_BATCH_MAX_SIZE = 8
+    HF_BATCH_MAX_WAIT_MS = 10
+    HF_BATCH_MAX_TOKENS = 4096
+    HF_CHUNKING = True
+    HF_CHUNK_TOKENS = 510
+    HF_CHUNK_STRIDE = 64
+    HF_MAX_CHUNKS = 4
+    HF_BACKEND = "pytorch"
+    HF_ONNX_DIR = "models/onnx"
+    HF_ONNX_QUANTIZE = True
+    HF_ONNX_TOLERANCE = 0.05
+    HF_ONNX_THREADS = 0
+    BATCH_MAX_IN_FLIGHT = 8
+    RESULT_CACHE_ENABLED = True
+    RESULT_CACHE_MAX_ENTRIES = 2048
+    RESULT_CACHE_TTL_SECONDS = 7 * 24 * 3600
+    RESULT_CACHE_DB_PATH = None
+    RESULT_CACHE_DB_MAX_ENTRIES = 100_000
+    NEAR_DUP_ENABLED = True
+    NEAR_DUP_THRESHOLD = 0.5
+    NEAR_DUP_MAX_ENTRIES = 10_000
+    NEAR_DUP_MIN_TOKENS = 8
+    NEAR_DUP_METHODS = ["openai", "huggingface", "cascade"]
+    NEAR_DUP_REPLY_OPENAI = True
+    REPLY_INDEX_ENABLED = False
+    REPLY_INDEX_DIR = "models/replies"
+    REPLY_INDEX_EMBEDDER = "hashing"
+    REPLY_INDEX_DIM = 256
+    REPLY_INDEX_MIN_SIMILARITY = 0.7
+    REPLY_INDEX_ONLY_APPROVED = False
+    REPLY_INDEX_LEARN = True
+    REPLY_INDEX_NPROBE = 8
+    REPLY_INDEX_APPROVE_TOKEN = None
+    OPENAI_MAX_CONCURRENCY = 16
+    OPENAI_REQUESTS_PER_MINUTE = 500
+    OPENAI_TOKENS_PER_MINUTE = 200_000
+    OPENAI_MAX_RETRIES = 5
+    OPENAI_TIMEOUT_SECONDS = 60
+    OPENAI_CONNECT_TIMEOUT_SECONDS = 5
+    OPENAI_MAX_CONNECTIONS = 64
+    REQUEST_DEADLINE_SECONDS = 20
+    FALLBACK_RESERVE_SECONDS = 2.0
+    HF_COLD_START_MIN_SECONDS = 15.0
+    BREAKER_FAILURE_THRESHOLD = 5
+    BREAKER_COOLDOWN_SECONDS = 30
+    PDF_MAX_PAGES = 20
+    PDF_MAX_CHARS = 20_000
+    PDF_WORKERS = 2
+    PDF_TIMEOUT_SECONDS = 30
+    UPLOAD_MAX_MB = 50
+    MAIL_MAX_MESSAGE_BYTES = 25 * 1024 * 1024
+    MAIL_MAX_CHARS = 20_000
+    HISTORY_BACKEND = "sqlite"
+    HISTORY_MAX = 20
+    HISTORY_DB_PATH = "data/historico.sqlite3"
+    CLASSIFICATION_STORE_MAX = 200_000
+    CLASSIFICATION_STORE_TTL_SECONDS = 7 * 24 * 3600
+    LINEAR_MODEL_PATH = "models/linear.npz"
+    LINEAR_THRESHOLD = 0.5
+    CASCADE_TIERS = ["heuristic", "linear", "openai"]
+    CASCADE_MIN_CONFIDENCE = {"heuristic": 0.7, "linear": 0.7}
+    CASCADE_COST_PER_CALL = {"openai": 0.0003}
+    JOBS_DB_PATH = "data/jobs.sqlite3"
+    JOBS_FILES_DIR = "data/jobs"
+    JOBS_WORKERS = 2
+    JOBS_BACKEND_CONCURRENCY = {"openai": 8, "huggingface": 2, "linear": 4, "cascade": 4, "heuristic": 8}
+    JOBS_LEASE_SECONDS = 600
+    JOBS_MAX_ATTEMPTS = 3
+    JOBS_RETRY_BACKOFF_SECONDS = 5
+    JOBS_RETRY_BACKOFF_MAX_SECONDS = 300
+    JOBS_RETENTION_SECONDS = 7 * 24 * 3600
+    JOBS_CALLBACK_ALLOWED_HOSTS = []
+    LOG_LEVEL = "INFO"
+
+# Logs por e-mail ficam em DEBUG: em produção (INFO) não custam nada no caminho quente
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", LOG_LEVEL).upper(),
+    format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s",
+)
+logger = logging.getLogger("email_classifier")
+if logger.getEffectiveLevel() > logging.DEBUG:
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # uma linha por chamada à OpenAI
+_warned = set()
+
+
+def warn_once(key: str, message: str, *args: Any) -> None:
+    """Problemas de configuração (sem chave, sem modelo): aviso uma vez por processo, depois só em DEBUG"""
+    if key in _warned:
+        logger.debug(message, *args)
+    else:
+        _warned.add(key)
+        logger.warning(message, *args)
+logger.info("🔑 API Key existe? %s", bool(os.getenv("OPENAI_API_KEY")))
+
+# Hugging Face (gratuito). Só verifica se está instalado: importar transformers
+# (e torch) custa segundos e centenas de MB, pagos apenas quando o modelo carrega.
+# Com HF_BACKEND = "onnx" basta o onnxruntime para servir um artefato já exportado
+HF_ONNX_RUNTIME = HF_BACKEND == "onnx" and all(
+    importlib.util.find_spec(name) is not None for name in ("onnxruntime", "tokenizers")
+)
+HF_AVAILABLE = importlib.util.find_spec("transformers") is not None or HF_ONNX_RUNTIME
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_MB * 1024 * 1024
+
+# Extração de PDF em processos separados, parando quando já há texto suficiente
+pdf_extractor = PdfExtractor(
+    workers=PDF_WORKERS,
+    max_pages=PDF_MAX_PAGES,
+    max_chars=PDF_MAX_CHARS,
+    timeout=PDF_TIMEOUT_SECONDS,
+)
+
+def load_sentiment_pipeline():
+    if HF_ONNX_RUNTIME:
+        try:
+            from onnx_sentiment import load_or_export
+            pipe = load_or_export(HF_SENTIMENT_MODEL, HF_ONNX_DIR, quantize=HF_ONNX_QUANTIZE,
+                                  tolerance=HF_ONNX_TOLERANCE, threads=HF_ONNX_THREADS)
+            logger.info("⚡ Modelo de sentimento em ONNX (%s, diferença máxima %s)",
+                        pipe.meta["arquivo"], pipe.meta["validacao"]["max_diff"])
+            return pipe
+        except Exception as e:
+            warn_once("onnx", "⚠️ Backend ONNX indisponível (%s), usando PyTorch", e)
+    elif HF_BACKEND == "onnx":
+        warn_once("onnx", "⚠️ HF_BACKEND = 'onnx' sem onnxruntime/tokenizers instalados, usando PyTorch")
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=HF_SENTIMENT_MODEL, return_all_scores=True)
+
+
+def load_linear_model():
+    from linear_classifier import LinearEmailClassifier  # numpy só para quem usa o modelo linear
+    return LinearEmailClassifier.load(LINEAR_MODEL_PATH)
+
+
+# Modelos carregados uma vez por processo e compartilhados entre threads
+model_registry = ModelRegistry()
+if HF_AVAILABLE:
+    model_registry.register(
+        "sentiment",
+        load_sentiment_pipeline,
+        warmup_input="Olá, podemos agendar uma reunião sobre o projeto?",
+    )
+    if HF_PREWARM and CLASSIFICATION_METHOD in ("huggingface", "openai"):
+        # Só os pesos: sob gunicorn (preload_app) isto roda no mestre antes do fork, e a
+        # inferência de aquecimento fica para cada worker (post_worker_init no gunicorn.conf.py)
+        try:
+            model_registry.get("sentiment")
+            logger.info("🔥 Modelo Hugging Face carregado")
+        except Exception as e:
+            logger.warning("⚠️ Falha ao pré-carregar modelo Hugging Face: %s", e)
+
+# Modelo linear local (arquivo .npz gerado por "python linear_classifier.py treinar")
+model_registry.register("linear", load_linear_model)
+
+# Agrupa requisições concorrentes em um único forward do modelo de sentimento
+hf_batcher = MicroBatcher(
+    lambda: model_registry.get("sentiment"),
+    max_batch_size=HF_BATCH_MAX_SIZE,
+    max_wait_ms=HF_BATCH_MAX_WAIT_MS,
+    max_batch_tokens=HF_BATCH_MAX_TOKENS,
+)
+
+
+# Regex compiladas e stopwords (PT + EN) carregadas uma vez por processo
+preprocessor = Preprocessor()
+
+# Palavras-chave produtivas (peso maior) - heurística
+PRODUCTIVE_KEYWORDS = {
+    "reuni": 3, "cronograma": 3, "prazo": 3, "entrega": 3, "alinhamento": 3,
+    "orçamento": 3, "proposta": 3, "contrato": 3, "briefing": 3, "escopo": 3,
+    "documenta": 2, "status": 2, "retorno": 2, "agenda": 2, "projeto": 3,
+    "cliente": 2, "empresa": 2, "trabalho": 2, "colaboração": 2, "parceria": 2,
+    "desenvolvimento": 2, "implementação": 2, "apresentação": 2, "relatório": 2
+}
+
+# Palavras-chave improdutivas (peso negativo) - heurística
+UNPRODUCTIVE_KEYWORDS = {
+    "spam": -3, "oferta": -2, "ganhe": -3, "promo": -2, "desconto": -2,
+    "sorteio": -3, "bitcoin": -2, "cripto": -2, "investimento": -1,
+    "marketing": -1, "vendas": -1, "propaganda": -2, "anúncio": -2
+}
+
+PROFESSIONAL_STRUCTURE = ["assunto:", "para:", "de:", "data:", "horário:", "local:"]
+
+# Análise contextual (Hugging Face)
+BUSINESS_INDICATORS = {
+    "meetings": ["reunião", "reuni", "encontro", "call", "videochamada", "zoom", "teams"],
+    "projects": ["projeto", "desenvolvimento", "implementação", "sistema", "aplicação", "software"],
+    "business": ["proposta", "orçamento", "contrato", "briefing", "escopo", "cronograma", "prazo"],
+    "professional": ["empresa", "cliente", "parceria", "colaboração", "trabalho", "serviço"],
+    "communication": ["retorno", "feedback", "alinhamento", "status", "atualização", "informações"]
+}
+
+# Indicadores de spam/improdutivo (mais rigoroso)
+SPAM_INDICATORS = {
+    "promotional": ["oferta", "promoção", "desconto", "grátis", "ganhe", "sorteio", "prêmio"],
+    "financial_scam": ["bitcoin", "cripto", "investimento", "lucro", "dinheiro fácil", "renda extra"],
+    "generic_sales": ["vendas", "marketing", "anúncio", "propaganda", "divulgação"],
+    "suspicious": ["clique aqui", "limitado", "exclusivo", "imperdível"]
+}
+
+GREETINGS = ["prezado", "caro", "olá", "bom dia", "boa tarde", "boa noite"]
+GENERIC_PHRASES = ["tudo bem", "como vai", "e aí", "oi", "tchau", "até mais", "falou"]
+
+OPENAI_SYSTEM_PROMPT = """Você é um assistente especializado em análise e resposta de emails profissionais.
+
+TAREFA: Analise o email e forneça:
+1) Classificação: "Produtivo" ou "Improdutivo"
+2) Motivo detalhado da classificação
+3) Resposta contextual que responda EXATAMENTE ao conteúdo do email
+
+CRITÉRIOS PARA CLASSIFICAÇÃO:
+- PRODUTIVO: Emails sobre trabalho, projetos, reuniões, propostas, colaborações, feedbacks, solicitações profissionais
+- IMPRODUTIVO: Spam, ofertas genéricas, emails muito vagos, conteúdo irrelevante
+
+INSTRUÇÕES PARA RESPOSTA:
+- Leia CUIDADOSAMENTE o conteúdo do email
+- Responda de forma ESPECÍFICA ao que foi mencionado
+- Se mencionam prazo, reconheça o prazo
+- Se pedem reunião, responda sobre reunião
+- Se é mudança de requisito, responda sobre a mudança
+- Se é proposta, responda sobre a proposta
+- Seja profissional, educado e direto
+- Use tom apropriado (formal/informal baseado no email recebido)
+
+FORMATO DE RESPOSTA: JSON válido com exatamente estes campos:
+{
+  "categoria": "Produtivo" ou "Improdutivo",
+  "motivo": "explicação detalhada da classificação",
+  "resposta_sugerida": "resposta contextual específica"
+}"""
+
+# Só a categoria (lotes/backfills): prompt curto e poucos tokens de saída
+OPENAI_CLASSIFY_PROMPT = """Classifique o email como "Produtivo" (trabalho, projetos, reuniões, propostas, \
+solicitações profissionais) ou "Improdutivo" (spam, ofertas genéricas, emails vagos ou irrelevantes).
+Responda APENAS com JSON: {"categoria": "Produtivo" ou "Improdutivo", "motivo": "uma frase curta"}"""
+
+# Resposta gerada depois, para uma classificação já feita (POST /reply/<id>)
+OPENAI_REPLY_PROMPT = """Você escreve respostas a emails profissionais em português.
+Responda de forma ESPECÍFICA ao conteúdo do email (prazos, reuniões, propostas, mudanças), \
+com tom profissional, educado e direto, adequado à categoria informada.
+Devolva APENAS o texto da resposta, sem JSON e sem comentários."""
 
+# Respostas fixas da heurística, por categoria
+HEURISTIC_REPLIES = {
+    "Produtivo": (
+        "Olá, obrigado pelo contato. Podemos agendar uma reunião para alinhar os próximos passos? "
+        "Envie, por favor, sua disponibilidade e eventuais materiais relevantes."
+    ),
+    "Improdutivo": (
+        "Olá, obrigado pela mensagem. No momento, não temos interesse. Caso deseje, mantenha-nos "
+        "informados sobre novidades mais alinhadas às nossas necessidades."
+    ),
+}
 
-# histórico de e-mails processados
-HISTORY_MAX = 20
-processed_history: List[Dict[str, Any]] = []
-counts = {"Produtivo": 0, "Improdutivo": 0}
+# Autômato único com todos os léxicos, montado uma vez na inicialização
+keyword_matcher = (
+    KeywordMatcher()
+    .add_lexicon("productive", PRODUCTIVE_KEYWORDS)
+    .add_lexicon("unproductive", UNPRODUCTIVE_KEYWORDS)
+    .add_terms("professional_structure", PROFESSIONAL_STRUCTURE)
+    .add_lexicon("business", BUSINESS_INDICATORS, default_weight=1)
+    .add_lexicon("spam", SPAM_INDICATORS, default_weight=2)
+    .add_terms("urgency", ["urgente"])
+    .add_terms("greetings", GREETINGS)
+    .add_terms("generic", GENERIC_PHRASES)
+    .build()
+)
 
+# Cliente OpenAI único por processo (event loop de fundo, pool HTTP e rate limiting)
+openai_runner = AsyncOpenAIRunner(
+    max_concurrency=OPENAI_MAX_CONCURRENCY,
+    requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+    max_retries=OPENAI_MAX_RETRIES,
+    timeout=OPENAI_TIMEOUT_SECONDS,
+    connect_timeout=OPENAI_CONNECT_TIMEOUT_SECONDS,
+    max_connections=OPENAI_MAX_CONNECTIONS,
+)
 
+# Disjuntores (por processo): um backend que vem falhando é pulado por BREAKER_COOLDOWN_SECONDS
+breakers = {
+    name: CircuitBreaker(name, BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS)
+    for name in ("openai", "huggingface")
+}
+_warming: set = set()
+_warming_lock = threading.Lock()
 
-def ensure_nltk() -> None:
+# Cache de resultados: chave = hash(texto normalizado + método + modelo)
+CLASSIFIER_MODELS = {
+    "openai": OPENAI_MODEL,
+    # Scores do ONNX int8 diferem um pouco do PyTorch: não compartilham cache
+    "huggingface": HF_SENTIMENT_MODEL + ("+onnx" + ("-int8" if HF_ONNX_QUANTIZE else "") if HF_ONNX_RUNTIME else ""),
+    "linear": LINEAR_MODEL_PATH,
+    "heuristic": "heuristic",
+    "cascade": ",".join(CASCADE_TIERS),
+}
+result_cache = (
+    ResultCache(
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+        db_path=RESULT_CACHE_DB_PATH,
+        db_max_entries=RESULT_CACHE_DB_MAX_ENTRIES,
+    )
+    if RESULT_CACHE_ENABLED
+    else None
+)
+
+# E-mails-modelo (mesmo texto, outro nome/data/chamado): reaproveitam a categoria de um parecido
+near_duplicates = (
+    NearDuplicateIndex(NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_ENTRIES, NEAR_DUP_MIN_TOKENS)
+    if NEAR_DUP_ENABLED
+    else None
+)
+
+# Respostas já dadas a e-mails parecidos: servidas sem gerar outra (vetores em memmap, por máquina)
+reply_index = None
+if REPLY_INDEX_ENABLED:
     try:
-        _ = stopwords.words("english")
-    except LookupError:
-        nltk.download("stopwords")
+        reply_index = ReplyIndex(
+            REPLY_INDEX_DIR,
+            make_embedder(REPLY_INDEX_EMBEDDER, REPLY_INDEX_DIM, preprocessor.tokens),
+            REPLY_INDEX_NPROBE,
+        )
+    except Exception as e:
+        logger.warning("⚠️ Índice de respostas indisponível: %s", e)
 
+# histórico de e-mails processados (compartilhado entre workers com HISTORY_BACKEND = "sqlite")
+history_store = create_history_store(HISTORY_BACKEND, HISTORY_MAX, HISTORY_DB_PATH, CLASSIFICATION_STORE_MAX,
+                                     CLASSIFICATION_STORE_TTL_SECONDS)
 
-def extract_text_from_file(upload: FileStorage) -> str:
-    filename = (upload.filename or "").lower()
+
+
+def extract_text(filename: str, stream: BinaryIO) -> str:
+    filename = (filename or "").lower()
     if filename.endswith(".txt"):
-        content = upload.read()
-        try:
-            return content.decode("utf-8", errors="ignore")
-        finally:
-            upload.close()
+        # Leitura limitada: um membro de .zip pode expandir muito além do upload
+        data = stream.read(MAIL_MAX_MESSAGE_BYTES + 1)
+        if len(data) > MAIL_MAX_MESSAGE_BYTES:
+            raise ValueError(f"Arquivo .txt maior que {MAIL_MAX_MESSAGE_BYTES // (1024 * 1024)} MB.")
+        return data.decode("utf-8", errors="ignore")
     if filename.endswith(".pdf"):
-        reader = PdfReader(upload)
-        text_parts: List[str] = []
-        for page in reader.pages:
-            try:
-                text_parts.append(page.extract_text() or "")
-            except Exception:
-                continue
-        upload.close()
-        return "\n".join(text_parts)
+        # Página a página, com limite de páginas/caracteres, fora da thread da requisição
+        return pdf_extractor.extract_stream(stream)
     raise ValueError("Formato de arquivo não suportado. Envie .txt ou .pdf.")
 
 
+def extract_text_from_file(upload: FileStorage) -> str:
+    try:
+        with span("upload"):
+            return extract_text(upload.filename or "", upload.stream)
+    finally:
+        upload.close()
+
+
 def generate_contextual_response(response_type: str, email_original: str, context_data: List[str]) -> str:
     """Gera respostas dinâmicas baseadas no contexto do email"""
     
@@ -126,60 +489,121 @@ def generate_contextual_response(response_type: str, email_original: str, contex
 
 
 def basic_preprocess(text: str) -> str:
-    ensure_nltk()
+    return preprocessor.preprocess(text)
 
-    # Normalize whitespace and lowercase
-    text = text.replace("\r", " ").replace("\n", " ")
-    text = re.sub(r"\s+", " ", text).strip().lower()
 
-    # Remove URLs, emails
-    text = re.sub(r"https?://\S+", " ", text)
-    text = re.sub(r"\b\S+@\S+\.[a-z]{2,}\b", " ", text)
+def contextual_result(categoria: str, motivo: str, metodo: str, email_original: str,
+                      response_type: str, context_data: List[str], with_reply: bool) -> Dict[str, Any]:
+    """Monta o resultado; sem resposta, guarda só o necessário para gerá-la depois"""
+    result = {"categoria": categoria, "motivo": motivo, "resposta_sugerida": None, "metodo": metodo}
+    if with_reply:
+        result["resposta_sugerida"] = generate_contextual_response(response_type, email_original, context_data)
+    else:
+        result["contexto_resposta"] = {"tipo": response_type, "termos": list(context_data)}
+    return result
 
-    # Remove numbers and punctuation (keep letters and spaces)
-    text = re.sub(r"[^a-zá-úà-ùâ-ûãõç\s]", " ", text)
 
-    # Stopwords (Portuguese + English)
-    sw_pt = set()
-    sw_en = set()
-    try:
-        sw_pt = set(stopwords.words("portuguese"))
-    except Exception:
-        pass
-    try:
-        sw_en = set(stopwords.words("english"))
-    except Exception:
-        pass
-    sw_all = sw_pt | sw_en
+def backend_allowed(backend: str, reserve: float = 0.0) -> bool:
+    """Prazo e disjuntor permitem chamar o backend agora? Se não, conta o motivo e o chamador cai para o próximo"""
+    budget = remaining_budget()
+    if budget is not None and budget - reserve <= 0:
+        BACKEND_FAILOVERS.inc(backend=backend, reason="deadline")
+        return False
+    if not breakers[backend].allow():
+        BACKEND_FAILOVERS.inc(backend=backend, reason="breaker_open")
+        return False
+    return True
+
+
+def call_deadline(reserve: float = 0.0) -> Optional[float]:
+    """Instante-limite (time.monotonic) de uma chamada: o prazo da requisição menos a reserva dos fallbacks"""
+    budget = remaining_budget()
+    return None if budget is None else time.monotonic() + max(0.0, budget - reserve)
+
+
+def record_backend_result(backend: str, exc: Optional[BaseException] = None) -> None:
+    """Informa o disjuntor; erros da requisição (4xx que não sejam de conta/limite) não contam como queda"""
+    breaker = breakers[backend]
+    status = getattr(exc, "status_code", None)
+    if exc is None or (status is not None and status < 500 and status not in (401, 403, 429)):
+        breaker.record_success()
+        return
+    BACKEND_FAILOVERS.inc(backend=backend, reason="timeout" if isinstance(exc, TimeoutError) else "error")
+    if breaker.record_failure():
+        logger.warning("🔌 %s falhando: disjuntor aberto, backend pulado por %.0fs", backend,
+                       breaker.cooldown_seconds)
+
+
+def warm_in_background(name: str) -> None:
+    """Carrega um modelo numa thread (uma vez por processo) sem segurar a requisição atual"""
+    with _warming_lock:
+        if name in _warming:
+            return
+        _warming.add(name)
+
+    def run() -> None:
+        try:
+            model_registry.prewarm(name)
+            logger.info("🔥 Modelo %s carregado em segundo plano", name)
+        except Exception as e:
+            logger.warning("⚠️ Falha ao carregar o modelo %s em segundo plano: %s", name, e)
+
+    threading.Thread(target=run, name=f"warm-{name}", daemon=True).start()
+
 
-    tokens = [t for t in text.split() if t and t not in sw_all]
-    return " ".join(tokens)
+def sentiment_scores(text: str) -> List[Dict[str, Any]]:
+    """Scores "1 star" ... "5 stars" do e-mail inteiro
 
+    E-mails longos viram janelas de até HF_CHUNK_TOKENS tokens (no máximo
+    HF_MAX_CHUNKS), que entram no micro-batching junto com as outras
+    requisições; os scores são combinados pela média ponderada.
+    """
+    if not HF_CHUNKING:
+        with span("inference", "huggingface"):
+            return hf_batcher.infer(text[:512], timeout=remaining_budget())
+    with span("chunking", "huggingface"):
+        offsets = token_offsets(model_registry.get("sentiment"), text)
+        chunks = chunk_text(text, offsets, HF_CHUNK_TOKENS, HF_CHUNK_STRIDE, HF_MAX_CHUNKS)
+    lengths = [n_tokens + 2 for _, n_tokens in chunks]  # + [CLS] e [SEP]
+    with span("inference", "huggingface"):
+        outputs = hf_batcher.infer_many([chunk for chunk, _ in chunks], lengths, timeout=remaining_budget())
+    if len(chunks) > 1:
+        logger.debug("🧩 %d tokens em %d janelas", len(offsets), len(chunks))
+    return aggregate_scores(outputs, lengths)
 
-def classify_with_huggingface(email_original: str, email_preprocessed: str) -> Dict[str, Any]:
+
+def classify_with_huggingface(email_original: str, email_preprocessed: str, with_reply: bool = True) -> Dict[str, Any]:
     """Classificação usando Hugging Face (gratuito) - IA inteligente e flexível"""
     if not HF_AVAILABLE:
-        print("⚠️ Hugging Face não disponível, usando heurística")
-        return heuristic_classification(email_original, email_preprocessed)
-    
+        warn_once("hf", "⚠️ Hugging Face não disponível, usando heurística")
+        return heuristic_classification(email_original, email_preprocessed, with_reply)
+
+    # Carregar o modelo a frio não cabe no que sobrou do prazo: heurística agora, modelo carregando ao fundo
+    budget = remaining_budget()
+    if budget is not None and budget < HF_COLD_START_MIN_SECONDS and not model_registry.is_loaded("sentiment"):
+        BACKEND_FAILOVERS.inc(backend="huggingface", reason="cold_start")
+        warm_in_background("sentiment")
+        return heuristic_classification(email_original, email_preprocessed, with_reply)
+    if not backend_allowed("huggingface"):
+        return heuristic_classification(email_original, email_preprocessed, with_reply)
+
     try:
-        print("🤗 Iniciando classificação inteligente com IA...")
-        
-        # Usar modelo de sentimento
-        classifier = pipeline("sentiment-analysis", 
-                           model="nlptown/bert-base-multilingual-uncased-sentiment",
-                           return_all_scores=True)
+        logger.debug("🤗 Iniciando classificação inteligente com IA...")
         
-        # Analisar tanto o texto original quanto o pré-processado
-        text_to_analyze = email_original[:512] if len(email_original) > 512 else email_original
-        results = classifier(text_to_analyze)
+        # Inferência agrupada com outras requisições concorrentes (modelo carregado uma vez)
+        try:
+            scores = sentiment_scores(email_original)
+        except Exception as e:
+            record_backend_result("huggingface", e)
+            raise
+        record_backend_result("huggingface")
         
         # Extrair scores
         positive_score = 0
         negative_score = 0
         neutral_score = 0
         
-        for result in results[0]:
+        for result in scores:
             label = result['label']
             score = result['score']
             
@@ -190,150 +614,93 @@ def classify_with_huggingface(email_original: str, email_preprocessed: str) -> D
             elif label in ['3 stars']:
                 neutral_score = max(neutral_score, score)
         
-        print(f"📊 Sentimento IA - Positivo: {positive_score:.2f}, Negativo: {negative_score:.2f}, Neutro: {neutral_score:.2f}")
+        logger.debug("📊 Sentimento IA - Positivo: %.2f, Negativo: %.2f, Neutro: %.2f",
+                     positive_score, negative_score, neutral_score)
         
         # Análise contextual mais rigorosa
-        business_indicators = {
-            "meetings": ["reunião", "reuni", "encontro", "call", "videochamada", "zoom", "teams"],
-            "projects": ["projeto", "desenvolvimento", "implementação", "sistema", "aplicação", "software"],
-            "business": ["proposta", "orçamento", "contrato", "briefing", "escopo", "cronograma", "prazo"],
-            "professional": ["empresa", "cliente", "parceria", "colaboração", "trabalho", "serviço"],
-            "communication": ["retorno", "feedback", "alinhamento", "status", "atualização", "informações"]
-        }
-        
-        # Indicadores de spam/improdutivo (mais rigoroso)
-        spam_indicators = {
-            "promotional": ["oferta", "promoção", "desconto", "grátis", "ganhe", "sorteio", "prêmio"],
-            "financial_scam": ["bitcoin", "cripto", "investimento", "lucro", "dinheiro fácil", "renda extra"],
-            "generic_sales": ["vendas", "marketing", "anúncio", "propaganda", "divulgação"],
-            "suspicious": ["clique aqui", "limitado", "exclusivo", "imperdível"]
-        }
-        
-        # Calcular scores contextuais
-        business_score = 0
-        spam_score = 0
-        found_business = []
-        found_spam = []
-        
-        # Verificar indicadores de negócio
-        for category, keywords in business_indicators.items():
-            category_found = False
-            for keyword in keywords:
-                if keyword.lower() in email_original.lower() or keyword in email_preprocessed:
-                    business_score += 1
-                    if not category_found:
-                        found_business.append(category)
-                        category_found = True
-        
-        # Verificar indicadores de spam (com contexto inteligente)
-        for category, keywords in spam_indicators.items():
-            for keyword in keywords:
-                if keyword.lower() in email_original.lower():
-                    spam_score += 2  # Peso maior para spam
-                    found_spam.append(keyword)
-        
+        # Uma passada do autômato por texto encontra todos os termos de todos os léxicos
+        with span("keywords", "huggingface"):
+            original_matches = keyword_matcher.scan(email_original.lower())
+            preprocessed_matches = keyword_matcher.scan(email_preprocessed)
+
+        # Indicadores de negócio (no texto original ou no pré-processado)
+        business_hits = sorted(
+            set(original_matches.hits("business")) | set(preprocessed_matches.hits("business")),
+            key=lambda hit: hit.order,
+        )
+        business_score = int(sum(hit.weight for hit in business_hits))
+        found_business = list(dict.fromkeys(hit.category for hit in business_hits))
+
+        # Indicadores de spam (com contexto inteligente)
+        spam_hits = original_matches.hits("spam")
+        spam_score = int(sum(hit.weight for hit in spam_hits))  # Peso maior para spam
+        found_spam = [hit.term for hit in spam_hits]
+
         # Verificar "urgente" com contexto - só é spam se não tiver contexto profissional
-        if "urgente" in email_original.lower():
+        if original_matches.hits("urgency"):
             if business_score == 0:  # Sem contexto profissional = provável spam
                 spam_score += 2
                 found_spam.append("urgente")
             # Se tem contexto profissional, "urgente" é legítimo
-        
+
         # Análise estrutural do email
         email_lines = email_original.strip().split('\n')
-        has_proper_greeting = any(greeting in email_original.lower() for greeting in 
-                                ["prezado", "caro", "olá", "bom dia", "boa tarde", "boa noite"])
+        has_proper_greeting = bool(original_matches.hits("greetings"))
         has_signature = len(email_lines) > 2 and any(line.strip() for line in email_lines[-2:])
         is_structured = len(email_lines) >= 3
         is_substantial = len(email_original.strip()) >= 80
-        
+
         # Verificar se é muito genérico/vago
-        generic_phrases = ["tudo bem", "como vai", "e aí", "oi", "tchau", "até mais", "falou"]
-        generic_count = sum(1 for phrase in generic_phrases if phrase in email_original.lower())
-        
-        print(f"🔍 Análise contextual - Business: {business_score}, Spam: {spam_score}, Genérico: {generic_count}")
+        generic_count = len(original_matches.hits("generic"))
+
+        logger.debug("🔍 Análise contextual - Business: %s, Spam: %s, Genérico: %s", business_score, spam_score, generic_count)
         
         # Lógica de classificação mais inteligente
         if spam_score >= 2:  # Spam detectado
             categoria = "Improdutivo"
             motivo = f"IA detectou indicadores de spam/promoção (score: {spam_score}). Palavras: {found_spam[:3]}"
-            resposta = generate_contextual_response("spam", email_original, found_spam)
+            response_type, response_data = "spam", found_spam
             
         elif business_score >= 3 and spam_score == 0:  # Contexto profissional forte
             categoria = "Produtivo"
             motivo = f"IA identificou contexto profissional sólido (business_score: {business_score}, categorias: {found_business})"
-            resposta = generate_contextual_response("business_strong", email_original, found_business)
+            response_type, response_data = "business_strong", found_business
             
         elif business_score >= 2 and is_structured and is_substantial and spam_score == 0:
             categoria = "Produtivo"
             motivo = f"IA detectou email profissional estruturado (business_score: {business_score}, estruturado e substancial)"
-            resposta = generate_contextual_response("business_moderate", email_original, found_business)
+            response_type, response_data = "business_moderate", found_business
             
         elif business_score >= 1 and positive_score > 0.4 and spam_score == 0 and is_substantial:
             categoria = "Produtivo"
             motivo = f"IA identificou contexto profissional com sentimento positivo (business: {business_score}, sentimento: {positive_score:.2f})"
-            resposta = generate_contextual_response("business_light", email_original, found_business)
+            response_type, response_data = "business_light", found_business
             
         elif generic_count >= 2 or not is_substantial:
             categoria = "Improdutivo"
             motivo = f"IA detectou email muito genérico ou insubstancial (genérico: {generic_count}, tamanho: {len(email_original)})"
-            resposta = generate_contextual_response("generic", email_original, [])
+            response_type, response_data = "generic", []
             
         else:
             categoria = "Improdutivo"
             motivo = f"IA não identificou contexto profissional suficiente (business: {business_score}, spam: {spam_score}, sentimento: pos={positive_score:.2f})"
-            resposta = generate_contextual_response("unclear", email_original, [])
+            response_type, response_data = "unclear", []
         
-        print(f"✅ Classificação IA: {categoria}")
-        return {"categoria": categoria, "motivo": motivo, "resposta_sugerida": resposta}
+        logger.debug("✅ Classificação IA: %s", categoria)
+        return contextual_result(categoria, motivo, "huggingface", email_original, response_type, response_data,
+                                 with_reply)
         
     except Exception as e:
-        print(f"❌ Erro no Hugging Face: {e}")
-        print("🔄 Fallback para classificação heurística...")
-        return heuristic_classification(email_original, email_preprocessed)
-
-
-def classify_and_respond_with_openai(email_original: str, email_preprocessed: str) -> Dict[str, Any]:
-    """Classificação e resposta contextual inteligente com OpenAI"""
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    print(f"🔍 Debug OpenAI - API Key existe: {'✅' if api_key else '❌'}")
-    print(f"🔍 Debug OpenAI - OpenAI disponível: {'✅' if OpenAI else '❌'}")
-    
-    if not api_key or OpenAI is None:
-        print("⚠️ OpenAI não configurado, usando Hugging Face como fallback")
-        return classify_with_huggingface(email_original, email_preprocessed)
-
-    client = OpenAI()
-
-    system_prompt = """Você é um assistente especializado em análise e resposta de emails profissionais.
-
-TAREFA: Analise o email e forneça:
-1) Classificação: "Produtivo" ou "Improdutivo"
-2) Motivo detalhado da classificação
-3) Resposta contextual que responda EXATAMENTE ao conteúdo do email
-
-CRITÉRIOS PARA CLASSIFICAÇÃO:
-- PRODUTIVO: Emails sobre trabalho, projetos, reuniões, propostas, colaborações, feedbacks, solicitações profissionais
-- IMPRODUTIVO: Spam, ofertas genéricas, emails muito vagos, conteúdo irrelevante
+        logger.error("❌ Erro no Hugging Face: %s - fallback para classificação heurística", e)
+        return heuristic_classification(email_original, email_preprocessed, with_reply)
 
-INSTRUÇÕES PARA RESPOSTA:
-- Leia CUIDADOSAMENTE o conteúdo do email
-- Responda de forma ESPECÍFICA ao que foi mencionado
-- Se mencionam prazo, reconheça o prazo
-- Se pedem reunião, responda sobre reunião
-- Se é mudança de requisito, responda sobre a mudança
-- Se é proposta, responda sobre a proposta
-- Seja profissional, educado e direto
-- Use tom apropriado (formal/informal baseado no email recebido)
-
-FORMATO DE RESPOSTA: JSON válido com exatamente estes campos:
-{
-  "categoria": "Produtivo" ou "Improdutivo",
-  "motivo": "explicação detalhada da classificação",
-  "resposta_sugerida": "resposta contextual específica"
-}"""
 
+def build_openai_messages(email_original: str, with_reply: bool = True) -> List[Dict[str, str]]:
+    if not with_reply:
+        return [
+            {"role": "system", "content": OPENAI_CLASSIFY_PROMPT},
+            {"role": "user", "content": email_original.strip()},
+        ]
     user_prompt = f"""Analise este email e forneça classificação + resposta contextual:
 
 EMAIL RECEBIDO:
@@ -346,160 +713,621 @@ Gere a resposta em JSON considerando:
 - O tom apropriado para responder
 
 Responda APENAS com o JSON válido."""
+    return [
+        {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def build_openai_reply_messages(email_original: str, categoria: str) -> List[Dict[str, str]]:
+    user_prompt = f"""Categoria do email: {categoria}
+
+EMAIL RECEBIDO:
+{email_original.strip()}"""
+    return [
+        {"role": "system", "content": OPENAI_REPLY_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def parse_openai_content(content: str) -> Dict[str, Any]:
+    """Extrai o JSON da resposta do modelo (tolerando blocos markdown) e valida os campos"""
+    # Limpar possível markdown do JSON
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
 
+    data = json.loads(content)
+    categoria = str(data.get("categoria", "Improdutivo")).strip()
+
+    # Validar categoria
+    if categoria not in ("Produtivo", "Improdutivo"):
+        categoria = "Improdutivo"
+
+    motivo = str(data.get("motivo", "Classificação automática")).strip()
+    # Sem o campo (prompt só de classificação), a resposta fica para depois
+    resposta = str(data["resposta_sugerida"]).strip() if data.get("resposta_sugerida") else None
+    return {"categoria": categoria, "motivo": motivo, "resposta_sugerida": resposta, "metodo": "openai"}
+
+
+def classify_and_respond_with_openai(email_original: str, email_preprocessed: str,
+                                     with_reply: bool = True) -> Dict[str, Any]:
+    """Classificação e resposta contextual inteligente com OpenAI"""
+    api_key = os.getenv("OPENAI_API_KEY")
+    
+    if not api_key:
+        warn_once("openai", "⚠️ OpenAI não configurado, usando Hugging Face como fallback")
+        return classify_with_huggingface(email_original, email_preprocessed, with_reply)
+    if not backend_allowed("openai", FALLBACK_RESERVE_SECONDS):
+        return classify_with_huggingface(email_original, email_preprocessed, with_reply)
+
+    content = ""
     try:
-        print("🤖 Gerando resposta contextual com OpenAI...")
-        completion = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3,  # Pouca criatividade para manter consistência
-            max_tokens=500,   # Limite para respostas concisas
-        )
+        logger.debug("🤖 Gerando resposta contextual com OpenAI..." if with_reply else "🤖 Classificando com OpenAI...")
+        # Cliente compartilhado (pool de conexões, limites de RPM/TPM e backoff em 429)
+        with span("openai", "openai"):
+            try:
+                completion = openai_runner.complete(
+                    build_openai_messages(email_original, with_reply),
+                    OPENAI_MODEL,
+                    deadline=call_deadline(FALLBACK_RESERVE_SECONDS),
+                    temperature=0.3 if with_reply else 0.0,  # Pouca criatividade para manter consistência
+                    max_tokens=500 if with_reply else 80,    # Só a categoria precisa de poucos tokens
+                )
+            except Exception as e:
+                record_backend_result("openai", e)
+                raise
+        record_backend_result("openai")
         
         content = completion.choices[0].message.content or "{}"
-        print(f"📝 Resposta OpenAI: {content[:150]}...")
+        logger.debug("📝 Resposta OpenAI: %.150s...", content)
         
-        # Limpar possível markdown do JSON
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-        
-        data = json.loads(content)
-        categoria = str(data.get("categoria", "Improdutivo")).strip()
-        
-        # Validar categoria
-        if categoria not in ("Produtivo", "Improdutivo"):
-            categoria = "Improdutivo"
-            
-        motivo = str(data.get("motivo", "Classificação automática")).strip()
-        resposta = str(data.get("resposta_sugerida", "Obrigado pelo contato.")).strip()
-        
-        print(f"✅ OpenAI Classificou: {categoria}")
-        return {"categoria": categoria, "motivo": motivo, "resposta_sugerida": resposta}
+        with span("json_repair", "openai"):
+            result = parse_openai_content(content)
+        if with_reply and not result["resposta_sugerida"]:
+            result["resposta_sugerida"] = "Obrigado pelo contato."
+        logger.debug("✅ OpenAI Classificou: %s", result["categoria"])
+        return result
         
     except json.JSONDecodeError as e:
-        print(f"❌ Erro ao decodificar JSON da OpenAI: {e}")
-        print(f"Conteúdo recebido: {content}")
-        return classify_with_huggingface(email_original, email_preprocessed)
+        logger.error("❌ Erro ao decodificar JSON da OpenAI: %s", e)
+        logger.debug("Conteúdo recebido: %s", content)
+        return classify_with_huggingface(email_original, email_preprocessed, with_reply)
     except Exception as e:
-        print(f"❌ Erro na OpenAI API: {e}")
-        return classify_with_huggingface(email_original, email_preprocessed)
+        logger.error("❌ Erro na OpenAI API: %s", e)
+        return classify_with_huggingface(email_original, email_preprocessed, with_reply)
 
 
-def heuristic_classification(email_original: str, email_preprocessed: str) -> Dict[str, Any]:
+def classify_with_linear(email_original: str, email_preprocessed: str, with_reply: bool = True) -> Dict[str, Any]:
+    """Classificação com o modelo linear local (TF-IDF com hashing + regressão logística)"""
+    try:
+        model = model_registry.get("linear")
+    except Exception as e:
+        warn_once("linear", "⚠️ Modelo linear indisponível (%s), usando heurística", e)
+        return heuristic_classification(email_original, email_preprocessed, with_reply)
+
+    with span("inference", "linear"):
+        proba = float(model.predict_proba([email_preprocessed])[0])
+    if proba >= LINEAR_THRESHOLD:
+        categoria, response_type = "Produtivo", "business_moderate"
+    else:
+        categoria, response_type = "Improdutivo", "unclear"
+    motivo = f"Modelo linear local: probabilidade de ser produtivo {proba:.2f} (limiar {LINEAR_THRESHOLD:.2f})"
+    result = contextual_result(categoria, motivo, "linear", email_original, response_type, [], with_reply)
+    result["confianca"] = abs(proba - 0.5) * 2
+    return result
+
+
+def heuristic_classification(email_original: str, email_preprocessed: str, with_reply: bool = True) -> Dict[str, Any]:
     """Classificação heurística melhorada (gratuita)"""
-    print("🔍 Usando classificação heurística...")
-    
-    # Palavras-chave produtivas (peso maior)
-    productive_keywords = {
-        "reuni": 3, "cronograma": 3, "prazo": 3, "entrega": 3, "alinhamento": 3,
-        "orçamento": 3, "proposta": 3, "contrato": 3, "briefing": 3, "escopo": 3,
-        "documenta": 2, "status": 2, "retorno": 2, "agenda": 2, "projeto": 3,
-        "cliente": 2, "empresa": 2, "trabalho": 2, "colaboração": 2, "parceria": 2,
-        "desenvolvimento": 2, "implementação": 2, "apresentação": 2, "relatório": 2
-    }
-    
-    # Palavras-chave improdutivas (peso negativo)
-    unproductive_keywords = {
-        "spam": -3, "oferta": -2, "ganhe": -3, "promo": -2, "desconto": -2,
-        "sorteio": -3, "bitcoin": -2, "cripto": -2, "investimento": -1,
-        "marketing": -1, "vendas": -1, "propaganda": -2, "anúncio": -2
-    }
-    
-    # Calcular score
-    score = 0
-    found_productive = []
-    found_unproductive = []
-    
-    for kw, weight in productive_keywords.items():
-        if kw in email_preprocessed:
-            score += weight
-            found_productive.append(kw)
-    
-    for kw, weight in unproductive_keywords.items():
-        if kw in email_preprocessed:
-            score += weight
-            found_unproductive.append(kw)
-    
+    # Calcular score (pesos positivos = produtivo, negativos = improdutivo)
+    with span("inference", "heuristic"):
+        preprocessed_matches = keyword_matcher.scan(email_preprocessed)
+        has_structure = bool(keyword_matcher.scan(email_original.lower()).hits("professional_structure"))
+    found_productive = preprocessed_matches.terms("productive")
+    found_unproductive = preprocessed_matches.terms("unproductive")
+    score = int(preprocessed_matches.score("productive") + preprocessed_matches.score("unproductive"))
+
     # Verificar tamanho do e-mail (e-mails muito curtos tendem a ser improdutivos)
     if len(email_original.strip()) < 50:
         score -= 2
-    
+
     # Verificar se tem estrutura de e-mail profissional
-    professional_indicators = ["assunto:", "para:", "de:", "data:", "horário:", "local:"]
-    has_structure = any(indicator in email_original.lower() for indicator in professional_indicators)
     if has_structure:
         score += 1
-    
+
     # Classificar
     if score >= 3:
         categoria = "Produtivo"
         motivo = f"Score: {score}. Palavras-chave encontradas: {', '.join(found_productive[:3])}"
-        resposta = (
-            "Olá, obrigado pelo contato. Podemos agendar uma reunião para alinhar os próximos passos? "
-            "Envie, por favor, sua disponibilidade e eventuais materiais relevantes."
-        )
     else:
         categoria = "Improdutivo"
         motivo = f"Score: {score}. Não apresenta contexto profissional suficiente."
         if found_unproductive:
             motivo += f" Palavras improdutivas: {', '.join(found_unproductive[:2])}"
-        resposta = (
-            "Olá, obrigado pela mensagem. No momento, não temos interesse. Caso deseje, mantenha-nos "
-            "informados sobre novidades mais alinhadas às nossas necessidades."
-        )
+    resposta = HEURISTIC_REPLIES[categoria] if with_reply else None
+
+    # Distância do limiar de decisão (score 3), normalizada para 0..1
+    confianca = min(1.0, abs(score - 2.5) / 7.5)
+    return {"categoria": categoria, "motivo": motivo, "resposta_sugerida": resposta, "metodo": "heuristic",
+            "confianca": confianca}
 
-    return {"categoria": categoria, "motivo": motivo, "resposta_sugerida": resposta}
+
+# Cascata: cada nível só escala para o próximo quando a confiança fica abaixo do limiar
+CASCADE_BACKENDS = {
+    "heuristic": (heuristic_classification, lambda: True),
+    "linear": (classify_with_linear, lambda: os.path.exists(LINEAR_MODEL_PATH)),
+    "huggingface": (classify_with_huggingface, lambda: HF_AVAILABLE),
+    "openai": (classify_and_respond_with_openai, lambda: bool(os.getenv("OPENAI_API_KEY"))),
+}
+cascade_classifier = CascadeClassifier([
+    CascadeTier(
+        name,
+        CASCADE_BACKENDS[name][0],
+        min_confidence=CASCADE_MIN_CONFIDENCE.get(name, 0.0),
+        cost_per_call=CASCADE_COST_PER_CALL.get(name, 0.0),
+        available=CASCADE_BACKENDS[name][1],
+    )
+    for name in CASCADE_TIERS
+])
 
 
 def update_history(entry: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
-    processed_history.insert(0, entry)
-    if len(processed_history) > HISTORY_MAX:
-        processed_history.pop()
-    cat = entry.get("categoria")
-    if cat in counts:
-        counts[cat] += 1
-    return processed_history, counts
+    with span("history"):
+        history_store.record(entry)
+        return history_store.snapshot()
+
+
+def classify_email(email_text: str, use_cache: bool = True, with_reply: bool = True) -> Dict[str, Any]:
+    """Pré-processa e classifica um e-mail com o método configurado
+
+    Com ``with_reply=False`` só a categoria é calculada (``resposta_sugerida``
+    fica ``None``); a resposta pode ser gerada depois com ``generate_reply``.
+    """
+    # Prazo da classificação inteira: cada backend só usa o que sobrou (fallbacks incluídos)
+    with deadline_scope(REQUEST_DEADLINE_SECONDS):
+        started = time.perf_counter()
+        cache_key = None
+        if result_cache is not None and use_cache:
+            model = CLASSIFIER_MODELS.get(CLASSIFICATION_METHOD, "")
+            method_key = CLASSIFICATION_METHOD if with_reply else f"{CLASSIFICATION_METHOD}:classificacao"
+            cache_key = make_cache_key(email_text, method_key, model)
+            cached = result_cache.get(cache_key)
+            if cached is None and not with_reply:
+                # Um resultado completo já em cache também serve (a resposta vem de graça)
+                cached = result_cache.get(make_cache_key(email_text, CLASSIFICATION_METHOD, model))
+            if cached is not None:
+                CLASSIFICATIONS.inc(backend=cached.get("metodo"), categoria=cached.get("categoria"), cache="hit")
+                return cached
+
+        with span("preprocess"):
+            preprocessed = basic_preprocess(email_text)
+
+        near_dup_tokens = None
+        near_dup_namespace = f"{CLASSIFICATION_METHOD}:{CLASSIFIER_MODELS.get(CLASSIFICATION_METHOD, '')}"
+        if near_duplicates is not None and use_cache and CLASSIFICATION_METHOD in NEAR_DUP_METHODS:
+            near_dup_tokens = preprocessed.split()
+            with span("near_duplicates"):
+                match = near_duplicates.lookup(near_dup_tokens, near_dup_namespace)
+            if match is not None:
+                result = reuse_classification(email_text, match[0], match[1], with_reply)
+                if cache_key is not None:
+                    result_cache.set(cache_key, result)
+                CLASSIFICATIONS.inc(backend=result.get("metodo"), categoria=result.get("categoria"),
+                                    cache="near_duplicate")
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="classify", backend=CLASSIFICATION_METHOD)
+                return result
+
+        # Resposta de um e-mail parecido já respondido: o backend só classifica
+        indexed = find_indexed_reply(email_text) if with_reply else None
+        backend_with_reply = with_reply and indexed is None
+
+        # Usar método configurado
+        logger.debug("Classificando com o método %s", CLASSIFICATION_METHOD)
+        if CLASSIFICATION_METHOD == "openai":
+            result = classify_and_respond_with_openai(email_text, preprocessed, backend_with_reply)
+        elif CLASSIFICATION_METHOD == "huggingface" and HF_AVAILABLE:
+            result = classify_with_huggingface(email_text, preprocessed, backend_with_reply)
+        elif CLASSIFICATION_METHOD == "linear":
+            result = classify_with_linear(email_text, preprocessed, backend_with_reply)
+        elif CLASSIFICATION_METHOD == "cascade":
+            result = cascade_classifier.classify(email_text, preprocessed, with_reply=backend_with_reply)
+        else:
+            result = heuristic_classification(email_text, preprocessed, backend_with_reply)
+        if indexed is not None:
+            result = with_indexed_reply(email_text, result, indexed)
+        elif backend_with_reply and result.get("metodo") == "openai":
+            learn_reply(email_text, result)
+
+        # Resultados de fallback (ex.: OpenAI fora do ar) não entram no cache do método configurado
+        expected_method = result.get("nivel_cascata") or CLASSIFICATION_METHOD
+        if result.get("metodo") != expected_method:
+            FALLBACKS.inc(configured=expected_method, served=result.get("metodo"))
+        else:
+            if cache_key is not None:
+                result_cache.set(cache_key, result)
+            if near_dup_tokens is not None:
+                near_duplicates.add(near_dup_tokens, {
+                    key: result[key] for key in ("categoria", "motivo", "metodo", "confianca", "nivel_cascata", "contexto_resposta")
+                    if result.get(key) is not None
+                }, near_dup_namespace)
+        CLASSIFICATIONS.inc(backend=result.get("metodo"), categoria=result.get("categoria"), cache="miss")
+        TIERS_SERVED.inc(configured=CLASSIFICATION_METHOD, served=result.get("metodo"))
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="classify", backend=CLASSIFICATION_METHOD)
+        return result
+
+
+def find_indexed_reply(email_text: str, categoria: Optional[str] = None) -> Optional[ReplyMatch]:
+    """Resposta já dada ao e-mail mais parecido, se passar de REPLY_INDEX_MIN_SIMILARITY"""
+    if reply_index is None:
+        return None
+    try:
+        with span("reply_index"):
+            match = reply_index.best(email_text, REPLY_INDEX_MIN_SIMILARITY, categoria, REPLY_INDEX_ONLY_APPROVED)
+    except Exception as e:
+        warn_once("reply_index", "⚠️ Falha na busca do índice de respostas: %s", e)
+        return None
+    REPLY_INDEX_LOOKUPS.inc(result="hit" if match is not None else "miss")
+    return match
+
+
+def with_indexed_reply(email_text: str, result: Dict[str, Any], match: ReplyMatch) -> Dict[str, Any]:
+    """Usa a resposta do índice se a categoria bate; senão gera a resposta normalmente"""
+    result = dict(result)
+    if match.categoria == result.get("categoria"):
+        result["resposta_sugerida"] = match.resposta
+        result["resposta_indice"] = {"id": match.id, "similaridade": round(match.score, 3),
+                                     "aprovada": match.aprovada}
+    else:
+        REPLY_INDEX_LOOKUPS.inc(result="category_mismatch")
+        result["resposta_sugerida"] = generate_reply(email_text, result)
+    result.pop("contexto_resposta", None)
+    return result
+
+
+def learn_reply(email_text: str, result: Dict[str, Any], aprovada: bool = False, fonte: str = "openai") -> Optional[int]:
+    """Guarda uma resposta gerada (ou aprovada) no índice para e-mails parecidos no futuro"""
+    if reply_index is None or not (REPLY_INDEX_LEARN or aprovada) or not result.get("resposta_sugerida"):
+        return None
+    try:
+        return reply_index.add(email_text, result["resposta_sugerida"], result.get("categoria") or "Improdutivo",
+                               aprovada=aprovada, fonte=fonte)
+    except Exception as e:
+        warn_once("reply_index_add", "⚠️ Falha ao guardar resposta no índice: %s", e)
+        return None
+
+
+def reuse_classification(email_text: str, stored: Dict[str, Any], similarity: float,
+                         with_reply: bool = True) -> Dict[str, Any]:
+    """Categoria e motivo de um e-mail quase igual; a resposta é gerada para este e-mail"""
+    result = dict(stored, resposta_sugerida=None, quase_duplicata=round(similarity, 3))
+    if with_reply:
+        result["resposta_sugerida"] = generate_reply(email_text, result, use_openai=NEAR_DUP_REPLY_OPENAI)
+        result.pop("contexto_resposta", None)
+    return result
+
+
+def generate_reply(email_text: str, result: Dict[str, Any], use_openai: bool = True) -> str:
+    """Gera a resposta sugerida para uma classificação feita sem resposta"""
+    categoria = result.get("categoria") or "Improdutivo"
+    match = find_indexed_reply(email_text, categoria)
+    if match is not None:
+        return match.resposta
+    # Fora de classify_email (ex.: POST /reply/<id>) a chamada também tem prazo; dentro, vale o que sobrou
+    with deadline_scope(REQUEST_DEADLINE_SECONDS):
+        if (use_openai and result.get("metodo") == "openai" and os.getenv("OPENAI_API_KEY")
+                and backend_allowed("openai", FALLBACK_RESERVE_SECONDS)):
+            try:
+                logger.debug("🤖 Gerando resposta sob demanda com OpenAI...")
+                with span("openai_reply", "openai"):
+                    try:
+                        completion = openai_runner.complete(
+                            build_openai_reply_messages(email_text, categoria),
+                            OPENAI_MODEL,
+                            deadline=call_deadline(FALLBACK_RESERVE_SECONDS),
+                            temperature=0.3,
+                            max_tokens=400,
+                        )
+                    except Exception as e:
+                        record_backend_result("openai", e)
+                        raise
+                record_backend_result("openai")
+                resposta = (completion.choices[0].message.content or "").strip()
+                if resposta:
+                    learn_reply(email_text, {"categoria": categoria, "resposta_sugerida": resposta})
+                    return resposta
+            except Exception as e:
+                logger.error("❌ Erro na OpenAI API: %s", e)
+
+    contexto = result.get("contexto_resposta")
+    if contexto:
+        return generate_contextual_response(contexto["tipo"], email_text, contexto.get("termos", []))
+    if result.get("metodo") == "heuristic":
+        return HEURISTIC_REPLIES.get(categoria, HEURISTIC_REPLIES["Improdutivo"])
+    response_type = "business_moderate" if categoria == "Produtivo" else "unclear"
+    return generate_contextual_response(response_type, email_text, [])
+
+
+def stream_reply(email_text: str, result: Dict[str, Any]) -> Iterator[str]:
+    """Resposta sugerida em trechos: token a token na OpenAI, de uma vez nos demais métodos"""
+    if result.get("resposta_sugerida"):
+        yield result["resposta_sugerida"]
+        return
+    match = find_indexed_reply(email_text, result.get("categoria") or "Improdutivo")
+    if match is not None:
+        yield match.resposta
+        return
+    if result.get("metodo") != "openai" or not os.getenv("OPENAI_API_KEY"):
+        yield generate_reply(email_text, result)
+        return
+    if not backend_allowed("openai"):
+        yield generate_reply(email_text, result, use_openai=False)
+        return
+
+    parts: List[str] = []
+    # Prazo até o primeiro trecho (o gerador pode ser consumido fora do contexto de deadline_scope)
+    deadline = None if REQUEST_DEADLINE_SECONDS is None else time.monotonic() + REQUEST_DEADLINE_SECONDS
+    try:
+        logger.debug("🤖 Transmitindo resposta da OpenAI...")
+        messages = build_openai_reply_messages(email_text, result.get("categoria") or "Improdutivo")
+        with span("openai_stream", "openai"):
+            for delta in openai_runner.stream(messages, OPENAI_MODEL, deadline=deadline, temperature=0.3,
+                                              max_tokens=400):
+                parts.append(delta)
+                yield delta
+    except GeneratorExit:
+        record_backend_result("openai")  # o cliente desistiu; a OpenAI estava respondendo
+        raise
+    except Exception as e:
+        logger.error("❌ Erro na OpenAI API: %s", e)
+        record_backend_result("openai", e)
+        if parts:
+            raise
+        # Nada foi enviado ainda: cai para a resposta contextual local
+        yield generate_reply(email_text, result, use_openai=False)
+        return
+    record_backend_result("openai")
+    resposta = "".join(parts).strip()
+    if resposta:
+        learn_reply(email_text, {"categoria": result.get("categoria"), "resposta_sugerida": resposta})
+
+
+def classification_record(email_text: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """O texto do e-mail só é guardado enquanto a resposta ainda precisa ser gerada"""
+    if result.get("resposta_sugerida"):
+        return {"resultado": result}
+    return {"email_text": email_text, "resultado": result}
+
+
+def store_classification(email_text: str, result: Dict[str, Any]) -> str:
+    """Guarda a classificação (e o texto, se a resposta ficou para depois) para POST /reply/<id>"""
+    classification_id = uuid.uuid4().hex
+    with span("history"):
+        history_store.save_classification(classification_id, classification_record(email_text, result))
+    return classification_id
+
+
+def classification_only_requested() -> bool:
+    """Campo/parâmetro modo=classificacao: devolve só a categoria, sem gerar a resposta"""
+    mode = (request.values.get("modo") or "").strip().lower()
+    return mode in ("classificacao", "classificação")
+
+
+def run_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um job da fila: extrai o texto (se veio arquivo), classifica e guarda a classificação"""
+    email_text = payload.get("email_text") or ""
+    if not email_text and payload.get("file_path"):
+        with open(payload["file_path"], "rb") as fh:
+            email_text = extract_text(payload.get("filename") or "", fh).strip()
+    if not email_text:
+        raise ValueError("Arquivo sem texto extraível.")
+
+    result = classify_email(email_text, use_cache=payload.get("use_cache", True),
+                            with_reply=payload.get("with_reply", True))
+    return {
+        "classificacao_id": store_classification(email_text, result),
+        "categoria": result.get("categoria"),
+        "motivo": result.get("motivo"),
+        "resposta_sugerida": result.get("resposta_sugerida"),
+        "metodo": result.get("metodo"),
+    }
+
+
+def remove_job_file(payload: Dict[str, Any]) -> None:
+    path = payload.get("file_path")
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+
+# Fila persistente de jobs (SQLite): sobrevive a reinícios; threads criadas por processo
+job_queue = JobQueue(
+    JOBS_DB_PATH,
+    run_job,
+    workers=JOBS_WORKERS,
+    on_finish=remove_job_file,
+    backend_limits=JOBS_BACKEND_CONCURRENCY,
+    lease_seconds=JOBS_LEASE_SECONDS,
+    max_attempts=JOBS_MAX_ATTEMPTS,
+    retention_seconds=JOBS_RETENTION_SECONDS,
+    retry_backoff=JOBS_RETRY_BACKOFF_SECONDS,
+    retry_backoff_max=JOBS_RETRY_BACKOFF_MAX_SECONDS,
+    callback_allowed_hosts=JOBS_CALLBACK_ALLOWED_HOSTS,
+)
+
+
+# Métricas (GET /metrics); tempos por etapa ficam em metrics.STAGE_SECONDS
+CLASSIFICATIONS = metrics_registry.counter(
+    "email_classifier_classifications_total", "E-mails classificados", ("backend", "categoria", "cache")
+)
+FALLBACKS = metrics_registry.counter(
+    "email_classifier_fallbacks_total",
+    "Classificações servidas por outro método que o configurado (ou que o nível da cascata aceito)",
+    ("configured", "served"),
+)
+# Só e-mails que chegaram a um backend: classifications_total também conta acertos de cache e quase-duplicatas
+TIERS_SERVED = metrics_registry.counter(
+    "email_classifier_tier_served_total",
+    "Classificações feitas por um backend (sem cache), por método configurado e método que de fato respondeu "
+    "(openai → huggingface → heuristic)",
+    ("configured", "served"),
+)
+REPLY_INDEX_LOOKUPS = metrics_registry.counter(
+    "email_classifier_reply_index_lookups_total", "Buscas no índice de respostas (hit = resposta reaproveitada)",
+    ("result",),
+)
+BACKEND_FAILOVERS = metrics_registry.counter(
+    "email_classifier_backend_failovers_total",
+    "Backends pulados ou que falharam, por motivo (deadline, breaker_open, cold_start, timeout, error)",
+    ("backend", "reason"),
+)
+HTTP_REQUESTS = metrics_registry.counter(
+    "email_classifier_http_requests_total", "Requisições HTTP", ("endpoint", "method", "status")
+)
+HTTP_SECONDS = metrics_registry.histogram(
+    "email_classifier_http_request_seconds", "Tempo até a resposta (em streaming, até os cabeçalhos)", ("endpoint",)
+)
+metrics_registry.gauge(
+    "email_classifier_result_cache", "Cache de resultados (acertos, falhas, entradas em memória)",
+    lambda: {} if result_cache is None else {
+        (k,): v for k, v in result_cache.stats().items() if k in ("hits", "disk_hits", "misses", "memory_entries")
+    },
+    ("stat",),
+)
+metrics_registry.gauge(
+    "email_classifier_near_duplicates", "Índice de quase-duplicatas (consultas, reaproveitados, entradas)",
+    lambda: {} if near_duplicates is None else {
+        (k,): v for k, v in near_duplicates.stats().items() if k in ("lookups", "hits", "entries", "evictions")
+    },
+    ("stat",),
+)
+metrics_registry.gauge(
+    "email_classifier_openai", "Chamadas à OpenAI neste processo",
+    lambda: {(k,): openai_runner.stats()[k] for k in ("calls", "retries", "rate_limited", "throttled_seconds")},
+    ("stat",),
+)
+metrics_registry.gauge(
+    "email_classifier_circuit_open", "Disjuntor por backend (0 = fechado, 0.5 = meio-aberto, 1 = aberto)",
+    lambda: {(name,): {"closed": 0, "half_open": 0.5, "open": 1}[b.state] for name, b in breakers.items()},
+    ("backend",),
+)
+metrics_registry.gauge(
+    "email_classifier_pdf_extraction", "Processos de extração de PDF (ociosos, mortos por timeout, que caíram)",
+    lambda: {(k,): pdf_extractor.stats()[k] for k in ("idle_processes", "killed_on_timeout", "crashed")},
+    ("stat",),
+)
+metrics_registry.gauge(
+    "email_classifier_hf_batches", "Micro-batching do Hugging Face",
+    lambda: {(k,): hf_batcher.stats()[k] for k in ("batches", "items")},
+    ("stat",),
+)
+metrics_registry.gauge(
+    "email_classifier_jobs", "Jobs na fila por estado (todos os workers)",
+    lambda: {(k,): v for k, v in job_queue.stats()["jobs"].items()},
+    ("status",),
+)
+
+
+def email_text_from_request() -> str:
+    """Texto do campo email_text ou, se vazio, do arquivo enviado (.txt/.pdf)"""
+    email_text = (request.form.get("email_text") or "").strip()
+    file = request.files.get("file")
+    if not email_text and file and getattr(file, "filename", ""):
+        email_text = extract_text_from_file(file)
+    return email_text
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def cache_bypass_requested() -> bool:
+    """Permite ignorar o cache por requisição (campo/parâmetro no_cache ou Cache-Control: no-cache)"""
+    flag = (request.values.get("no_cache") or "").strip().lower()
+    return flag in ("1", "true", "sim", "yes") or "no-cache" in (request.headers.get("Cache-Control") or "")
 
 
 # -----------------------------
 # Routes
 # -----------------------------
+@app.before_request
+def start_job_workers():
+    g.request_started = time.perf_counter()
+    # Dentro do worker (nunca no mestre do gunicorn): jobs pendentes de antes do reinício voltam a andar
+    job_queue.ensure_started()
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    # Rota (não a URL) para não criar uma série por ID de job/classificação
+    endpoint = request.url_rule.rule if request.url_rule is not None else "desconhecido"
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+
+@app.errorhandler(413)
+def upload_too_large(_exc):
+    return jsonify({"error": f"Arquivo muito grande. Limite: {UPLOAD_MAX_MB} MB."}), 413
+
+
 @app.get("/")
 def index():
-    return render_template("index.html", counts=counts, history=processed_history)
+    history, counts = history_store.snapshot()
+    return render_template("index.html", counts=counts, history=history, metodo=CLASSIFICATION_METHOD)
+
+
+@app.get("/healthz")
+def healthz():
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
+@app.get("/models")
+def models_info():
+    info = model_registry.describe()
+    info["startup"] = startup_report()
+    info["batcher"] = hf_batcher.stats()
+    info["openai"] = openai_runner.stats()
+    info["circuit_breakers"] = {name: b.stats() for name, b in breakers.items()}
+    return jsonify(info)
+
+
+@app.get("/cascade")
+def cascade_info():
+    return jsonify(cascade_classifier.stats())
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/cache")
+def cache_info():
+    near = near_duplicates.stats() if near_duplicates is not None else {"enabled": False}
+    if result_cache is None:
+        return jsonify({"enabled": False, "near_duplicates": near})
+    return jsonify({"enabled": True, **result_cache.stats(), "near_duplicates": near})
 
 
 @app.post("/process")
 def process_email():
     try:
-        email_text = (request.form.get("email_text") or "").strip()
-        file = request.files.get("file")
-
-        if not email_text and file and getattr(file, "filename", ""):
-            email_text = extract_text_from_file(file)
-
+        email_text = email_text_from_request()
         if not email_text:
             return jsonify({"error": "Forneça texto do e-mail ou envie um arquivo .txt/.pdf."}), 400
 
-        preprocessed = basic_preprocess(email_text)
-        
-        # Usar método configurado
-        if CLASSIFICATION_METHOD == "openai":
-            print("🤖 Usando OpenAI...")
-            result = classify_and_respond_with_openai(email_text, preprocessed)
-        elif CLASSIFICATION_METHOD == "huggingface" and HF_AVAILABLE:
-            print("🤗 Usando Hugging Face (gratuito)...")
-            result = classify_with_huggingface(email_text, preprocessed)
-        else:
-            print("🔍 Usando classificação heurística (gratuito)...")
-            result = heuristic_classification(email_text, preprocessed)
+        result = classify_email(
+            email_text,
+            use_cache=not cache_bypass_requested(),
+            with_reply=not classification_only_requested(),
+        )
+        classification_id = store_classification(email_text, result)
 
         entry = {
+            "id": classification_id,
             "categoria": result.get("categoria"),
             "motivo": result.get("motivo"),
             "resposta_sugerida": result.get("resposta_sugerida"),
@@ -508,18 +1336,317 @@ def process_email():
         history, totals = update_history(entry)
 
         return jsonify({
+            "id": classification_id,
             "categoria": entry["categoria"],
             "motivo": entry["motivo"],
             "resposta_sugerida": entry["resposta_sugerida"],
             "counts": totals,
             "history": history[:10],  # send a short recent history snapshot
         })
+    except RequestEntityTooLarge as exc:
+        return upload_too_large(exc)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
     except Exception as exc:  # pragma: no cover
         return jsonify({"error": f"Falha no processamento: {exc}"}), 500
 
 
+@app.post("/process/stream")
+def process_email_stream():
+    """Como /process, mas em Server-Sent Events: a categoria sai primeiro e a resposta vem em trechos
+
+    Eventos: ``classificacao`` (id, categoria, motivo), vários ``resposta``
+    (texto parcial), e ``fim`` (resposta completa, contadores, histórico) ou ``erro``.
+    """
+    try:
+        email_text = email_text_from_request()
+        if not email_text:
+            return jsonify({"error": "Forneça texto do e-mail ou envie um arquivo .txt/.pdf."}), 400
+        # Só a categoria primeiro (prompt curto na OpenAI); a resposta é gerada em seguida, em streaming
+        result = classify_email(email_text, use_cache=not cache_bypass_requested(), with_reply=False)
+    except RequestEntityTooLarge as exc:
+        return upload_too_large(exc)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as exc:  # pragma: no cover
+        return jsonify({"error": f"Falha no processamento: {exc}"}), 500
+
+    classification_id = store_classification(email_text, result)
+
+    def generate():
+        yield sse_event("classificacao", {
+            "id": classification_id,
+            "categoria": result.get("categoria"),
+            "motivo": result.get("motivo"),
+        })
+        parts = []
+        try:
+            for delta in stream_reply(email_text, result):
+                parts.append(delta)
+                yield sse_event("resposta", {"texto": delta})
+        except Exception as exc:
+            yield sse_event("erro", {"error": f"Falha ao gerar resposta: {exc}"})
+            return
+
+        resposta = "".join(parts).strip()
+        history_store.save_classification(
+            classification_id, classification_record(email_text, dict(result, resposta_sugerida=resposta))
+        )
+        history, totals = update_history({
+            "id": classification_id,
+            "categoria": result.get("categoria"),
+            "motivo": result.get("motivo"),
+            "resposta_sugerida": resposta,
+            "preview": email_text[:220] + ("..." if len(email_text) > 220 else ""),
+        })
+        yield sse_event("fim", {"resposta_sugerida": resposta, "counts": totals, "history": history[:10]})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/reply/<classification_id>")
+def reply_for_classification(classification_id: str):
+    """Gera (uma vez) a resposta sugerida de uma classificação já feita"""
+    stored = history_store.get_classification(classification_id)
+    if stored is None:
+        return jsonify({"error": "Classificação não encontrada (ID inválido ou expirado)."}), 404
+
+    result = stored["resultado"]
+    resposta = result.get("resposta_sugerida")
+    if not resposta:
+        try:
+            resposta = generate_reply(stored["email_text"], result)
+        except Exception as exc:  # pragma: no cover
+            return jsonify({"error": f"Falha ao gerar resposta: {exc}"}), 500
+        result = dict(result, resposta_sugerida=resposta)
+        history_store.save_classification(classification_id, classification_record(stored["email_text"], result))
+
+    return jsonify({
+        "id": classification_id,
+        "categoria": result.get("categoria"),
+        "motivo": result.get("motivo"),
+        "resposta_sugerida": resposta,
+    })
+
+
+@app.get("/replies")
+def reply_index_info():
+    if reply_index is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **reply_index.stats()})
+
+
+@app.post("/replies")
+def approve_reply():
+    """Guarda uma resposta revisada por um atendente: passa a ser servida para e-mails parecidos
+
+    Exige ``Authorization: Bearer <REPLY_INDEX_APPROVE_TOKEN>``; sem token configurado fica desativado.
+    """
+    token = os.getenv("REPLY_INDEX_APPROVE_TOKEN") or REPLY_INDEX_APPROVE_TOKEN
+    if reply_index is None or not token:
+        return jsonify({"error": "Aprovação de respostas desativada (REPLY_INDEX_ENABLED e REPLY_INDEX_APPROVE_TOKEN)."}), 404
+    sent = request.headers.get("Authorization", "")
+    if not sent.startswith("Bearer ") or not hmac.compare_digest(sent[len("Bearer "):].encode(), token.encode()):
+        return jsonify({"error": "Token de aprovação inválido."}), 401
+    email_text = (request.values.get("email_text") or "").strip()
+    resposta = (request.values.get("resposta_sugerida") or "").strip()
+    categoria = (request.values.get("categoria") or "").strip()
+    if not email_text or not resposta or categoria not in ("Produtivo", "Improdutivo"):
+        return jsonify({"error": "Informe email_text, resposta_sugerida e categoria (Produtivo/Improdutivo)."}), 400
+    reply_id = learn_reply(email_text, {"categoria": categoria, "resposta_sugerida": resposta},
+                           aprovada=True, fonte="aprovada")
+    if reply_id is None:
+        return jsonify({"error": "Falha ao guardar a resposta."}), 500
+    return jsonify({"id": reply_id, "categoria": categoria, "aprovada": True}), 201
+
+
+@app.post("/jobs")
+def submit_job():
+    """Enfileira um e-mail (texto ou arquivo) e devolve o ID do job na hora (202)"""
+    email_text = (request.form.get("email_text") or "").strip()
+    file = request.files.get("file")
+    callback_url = (request.form.get("callback_url") or "").strip() or None
+    try:
+        priority = int(request.form.get("prioridade") or 0)
+    except ValueError:
+        return jsonify({"error": "prioridade deve ser um número inteiro."}), 400
+    if callback_url:
+        try:
+            validate_callback_url(callback_url, JOBS_CALLBACK_ALLOWED_HOSTS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    payload: Dict[str, Any] = {
+        "use_cache": not cache_bypass_requested(),
+        "with_reply": not classification_only_requested(),
+    }
+    if email_text:
+        payload["email_text"] = email_text
+    elif file and getattr(file, "filename", ""):
+        filename = file.filename.lower()
+        if not filename.endswith((".txt", ".pdf")):
+            return jsonify({"error": "Formato de arquivo não suportado. Envie .txt ou .pdf."}), 400
+        # O arquivo vai para disco; a extração (PDFs grandes) acontece no worker do job
+        os.makedirs(JOBS_FILES_DIR, exist_ok=True)
+        path = os.path.join(JOBS_FILES_DIR, uuid.uuid4().hex + os.path.splitext(filename)[1])
+        file.save(path)
+        payload.update(file_path=path, filename=filename)
+    else:
+        return jsonify({"error": "Forneça texto do e-mail ou envie um arquivo .txt/.pdf."}), 400
+
+    job_id = job_queue.submit(payload, CLASSIFICATION_METHOD, priority=priority, callback_url=callback_url)
+    return jsonify({"id": job_id, "status": "queued", "url": url_for("job_status", job_id=job_id)}), 202
+
+
+@app.get("/jobs/<job_id>")
+def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+    return jsonify(job)
+
+
+@app.get("/jobs")
+def jobs_info():
+    return jsonify(job_queue.stats())
+
+
+def spool_upload(upload: FileStorage) -> BinaryIO:
+    """Copia o upload para um arquivo temporário (o original é fechado ao fim do request)"""
+    spool = tempfile.TemporaryFile()
+    shutil.copyfileobj(upload.stream, spool)
+    spool.seek(0)
+    return spool
+
+
+@app.post("/process/batch")
+def process_batch():
+    """Classifica muitos e-mails (corpo JSONL ou upload .zip/.jsonl) e devolve NDJSON em streaming"""
+    file = request.files.get("file")
+    spool = None
+    if file and getattr(file, "filename", ""):
+        filename = file.filename.lower()
+        if filename.endswith(".zip"):
+            spool = spool_upload(file)
+            items = iter_zip_emails(spool, extract_text, MAIL_MAX_MESSAGE_BYTES)
+        elif filename.endswith((".jsonl", ".ndjson")):
+            spool = spool_upload(file)
+            items = iter_jsonl_emails(spool)
+        elif filename.endswith((".mbox", ".eml")):
+            # Caixa de e-mail: uma mensagem por vez, PDFs anexados no pool de extração
+            spool = spool_upload(file)
+            messages = (
+                iter_mbox(spool, file.filename, MAIL_MAX_MESSAGE_BYTES) if filename.endswith(".mbox")
+                else iter([(file.filename, spool.read(MAIL_MAX_MESSAGE_BYTES), None)])
+            )
+            items = iter_mail_items(messages, lambda data: pdf_extractor.extract_stream(io.BytesIO(data)),
+                                    MAIL_MAX_CHARS)
+        else:
+            return jsonify({"error": "Envie um arquivo .zip (com .txt/.pdf), .jsonl, .mbox ou .eml."}), 400
+    elif request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        return jsonify({"error": "Envie um arquivo .zip/.jsonl no campo 'file' ou um corpo JSONL."}), 400
+    else:
+        items = iter_jsonl_emails(request.stream)
+
+    use_cache = not cache_bypass_requested()
+    with_reply = not classification_only_requested()
+
+    def classify(email_text: str) -> Dict[str, Any]:
+        result = classify_email(email_text, use_cache=use_cache, with_reply=with_reply)
+        if not with_reply:
+            # Resposta fica para depois: POST /reply/<classificacao_id>
+            result = dict(result, classificacao_id=store_classification(email_text, result))
+        return result
+
+    def generate():
+        try:
+            for line in classify_stream(items, classify, BATCH_MAX_IN_FLIGHT):
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        except ValueError as ve:
+            yield json.dumps({"error": str(ve)}, ensure_ascii=False) + "\n"
+        finally:
+            if spool is not None:
+                spool.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# Módulos pesados de cada backend: importados sob demanda, ou antecipados no
+# processo mestre do gunicorn (wsgi.py) para serem compartilhados com os workers
+BACKEND_MODULES = {
+    "openai": ("openai", "httpx"),
+    "huggingface": ("onnxruntime", "tokenizers", "numpy") if HF_ONNX_RUNTIME else ("transformers",),
+    "linear": ("numpy",),
+    "heuristic": (),
+}
+HEAVY_MODULES = ("transformers", "torch", "onnxruntime", "openai", "httpx", "numpy", "nltk", "PyPDF2")
+
+
+def backend_modules(method: str) -> List[str]:
+    methods = CASCADE_TIERS if method == "cascade" else [method]
+    names = [name for m in methods for name in BACKEND_MODULES.get(m, ())]
+    if "openai" in methods and HF_AVAILABLE:
+        names.extend(BACKEND_MODULES["huggingface"])  # fallback da OpenAI
+    return list(dict.fromkeys(names))
+
+
+def preload_backend_modules(method: str = CLASSIFICATION_METHOD) -> List[str]:
+    """Importa os módulos do backend configurado; devolve os que foram carregados"""
+    loaded = []
+    for name in backend_modules(method):
+        if importlib.util.find_spec(name) is None:
+            continue  # backend opcional não instalado: o fallback cuida
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as e:
+            logger.warning("⚠️ Falha ao importar %s: %s", name, e)
+    return loaded
+
+
+def warm_backend(method: str = CLASSIFICATION_METHOD) -> List[str]:
+    """Importa os módulos e carrega (e aquece) os modelos do backend; usado pelos workers de lote"""
+    warmed = preload_backend_modules(method)
+    methods = CASCADE_TIERS if method == "cascade" else [method]
+    models = []
+    if HF_AVAILABLE and ("huggingface" in methods or "openai" in methods):
+        models.append("sentiment")
+    if "linear" in methods:
+        models.append("linear")
+    for name in models:
+        try:
+            model_registry.prewarm(name)
+            warmed.append(name)
+        except Exception as e:
+            logger.warning("⚠️ Falha ao carregar o modelo %s: %s", name, e)
+    return warmed
+
+
+def startup_report() -> Dict[str, Any]:
+    return {
+        "import_seconds": IMPORT_SECONDS,
+        "rss_mb_after_import": IMPORT_RSS_MB,
+        "rss_mb": round(current_rss_mb(), 1),
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+IMPORT_SECONDS = round(time.perf_counter() - IMPORT_STARTED, 3)
+IMPORT_RSS_MB = round(current_rss_mb(), 1)
+logger.info(
+    "🚀 App carregado em %.2f s (RSS %.0f MB, método %s; módulos pesados já importados: %s)",
+    IMPORT_SECONDS, IMPORT_RSS_MB, CLASSIFICATION_METHOD,
+    ", ".join(startup_report()["heavy_modules_loaded"]) or "nenhum",
+)
+
+
 if __name__ == "__main__":
+    if HF_PREWARM and model_registry.is_loaded("sentiment"):
+        # Servidor de desenvolvimento: sem post_worker_init, aquece aqui mesmo
+        warm_in_background("sentiment")
     port = int(os.getenv("PORT", "5000"))
     app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
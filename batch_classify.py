@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Classificação de um conjunto de e-mails pela linha de comando, retomável
+
+Lê JSONL, diretórios de .txt/.pdf, caixas mbox/Maildir e arquivos .eml e
+distribui o trabalho em um pool de processos (cada worker com o modelo do
+backend carregado uma vez). Os resultados são gravados conforme terminam e o
+progresso vai para um arquivo de checkpoint: se a execução for interrompida,
+o mesmo comando continua de onde parou, sem repetir nem perder e-mails.
+
+Uso:
+    python batch_classify.py emails.jsonl --saida resultados.jsonl
+    python batch_classify.py pasta/ caixa.mbox --saida resultados.jsonl --processos 4
+    python batch_classify.py emails.jsonl --saida resultados.jsonl --processos 0   # threads (OpenAI)
+    python batch_classify.py emails.jsonl --saida resultados.jsonl --recomecar     # ignora o checkpoint
+
+A ordem de leitura das entradas é determinística; o checkpoint guarda até onde
+todos os itens terminaram, os poucos concluídos fora de ordem depois disso e o
+tamanho do arquivo de saída nesse momento. Ao retomar, o que foi gravado depois
+do último checkpoint é descartado e reprocessado.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from batch_io import iter_jsonl_emails, result_line
+
+# (sequência, id, tipo, conteúdo, erro): tipo "text" (str), "message" (bytes MIME) ou "file" (caminho .txt/.pdf)
+WorkItem = Tuple[int, str, Optional[str], Any, Optional[str]]
+
+FILE_EXTENSIONS = (".txt", ".pdf")
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+MAIL_EXTENSIONS = (".eml", ".mbox")
+
+
+# ---------------------------------------------------------------------------
+# Entradas
+# ---------------------------------------------------------------------------
+
+def iter_inputs(paths: Iterable[str]) -> Iterator[Tuple[str, Optional[str], Any, Optional[str]]]:
+    """(id, tipo, conteúdo, erro) de cada e-mail, sempre na mesma ordem"""
+    from mail_ingest import MAX_MESSAGE_BYTES, is_maildir, iter_source
+
+    for path in paths:
+        lower = path.lower()
+        if os.path.isdir(path) and not is_maildir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                if is_maildir(root):
+                    dirs[:] = []
+                    yield from iter_inputs([root])
+                    continue
+                yield from iter_inputs(
+                    os.path.join(root, f) for f in sorted(files)
+                    if f.lower().endswith(FILE_EXTENSIONS + JSONL_EXTENSIONS + MAIL_EXTENSIONS)
+                )
+        elif lower.endswith(JSONL_EXTENSIONS):
+            with open(path, "rb") as f:
+                for item_id, text, error in iter_jsonl_emails(f):
+                    yield item_id, "text", text, error
+        elif lower.endswith(FILE_EXTENSIONS):
+            yield path, "file", path, None
+        else:
+            for item_id, raw, error in iter_source(path, MAX_MESSAGE_BYTES):
+                yield item_id, "message", raw, error
+
+
+def count_inputs(paths: Iterable[str]) -> int:
+    """Total de itens para o ETA; lê as entradas sem decodificar (roda em paralelo com o processamento)"""
+    from mail_ingest import is_maildir, is_mbox
+
+    total = 0
+    for path in paths:
+        lower = path.lower()
+        if os.path.isdir(path) and not is_maildir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                if is_maildir(root):
+                    dirs[:] = []
+                    total += count_inputs([root])
+                    continue
+                total += count_inputs(
+                    os.path.join(root, f) for f in files
+                    if f.lower().endswith(FILE_EXTENSIONS + JSONL_EXTENSIONS + MAIL_EXTENSIONS)
+                )
+        elif os.path.isdir(path):
+            total += sum(len(os.listdir(os.path.join(path, sub))) for sub in ("new", "cur"))
+        elif lower.endswith(JSONL_EXTENSIONS):
+            with open(path, "rb") as f:
+                total += sum(1 for line in f if line.strip())
+        elif lower.endswith(FILE_EXTENSIONS) or not is_mbox(path):
+            total += 1
+        else:
+            with open(path, "rb") as f:
+                previous_blank = True
+                for line in f:
+                    total += previous_blank and line.startswith(b"From ")
+                    previous_blank = not line.strip()
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Workers
+# ---------------------------------------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(with_reply: bool, use_cache: bool) -> None:
+    """Uma vez por processo: importa o app e carrega/aquece o modelo do backend configurado"""
+    import app
+
+    app.warm_backend()
+    _worker.update(app=app, with_reply=with_reply, use_cache=use_cache)
+
+
+def work_text(kind: str, payload: Any) -> str:
+    app = _worker["app"]
+    if kind == "text":
+        return payload
+    if kind == "message":
+        from mail_ingest import message_text, pdf_bytes_text
+
+        return message_text(payload, lambda data: pdf_bytes_text(data, app.PDF_MAX_PAGES, app.PDF_MAX_CHARS),
+                            app.MAIL_MAX_CHARS)
+    if payload.lower().endswith(".pdf"):
+        from pdf_extraction import extract_pdf_text
+
+        return extract_pdf_text(payload, app.PDF_MAX_PAGES, app.PDF_MAX_CHARS)
+    with open(payload, "rb") as f:
+        return f.read().decode("utf-8", errors="ignore")
+
+
+def _process_item(item_id: str, kind: str, payload: Any) -> Dict[str, Any]:
+    app = _worker["app"]
+    try:
+        text = work_text(kind, payload).strip()
+    except Exception as e:
+        return {"id": item_id, "error": f"Entrada inválida: {e}"}
+    if not text:
+        return {"id": item_id, "error": "Sem texto extraível"}
+    try:
+        result = app.classify_email(text, use_cache=_worker["use_cache"], with_reply=_worker["with_reply"])
+        if not _worker["with_reply"] and app.HISTORY_BACKEND == "sqlite":
+            # Resposta fica para depois: POST /reply/<classificacao_id> (store SQLite compartilhado com o servidor)
+            result = dict(result, classificacao_id=app.store_classification(text, result))
+    except Exception as e:
+        return {"id": item_id, "error": f"Falha no processamento: {e}"}
+    return result_line(item_id, result)
+
+
+def classification_store_note() -> str:
+    """Onde ficam as classificações do modo --sem-resposta (para o usuário saber se /reply/<id> as acha)"""
+    try:
+        from config import HISTORY_BACKEND, HISTORY_DB_PATH
+    except ImportError:
+        HISTORY_BACKEND, HISTORY_DB_PATH = "sqlite", "data/historico.sqlite3"
+    if HISTORY_BACKEND != "sqlite":
+        return ("⚠️ HISTORY_BACKEND não é \"sqlite\": a saída não terá classificacao_id "
+                "(um store em memória some com o processo)")
+    return (f"🗂️ Classificações em {os.path.abspath(HISTORY_DB_PATH)}: gere as respostas com "
+            "POST /reply/<classificacao_id> num servidor que use o mesmo arquivo")
+
+
+def _process_chunk(chunk: List[Tuple[int, str, str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    return [(seq, _process_item(item_id, kind, payload)) for seq, item_id, kind, payload in chunk]
+
+
+def _future_lines(chunk: List[Tuple[int, str, str, Any]], future: Future) -> List[Tuple[int, Dict[str, Any]]]:
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        raise  # worker morto (ex.: falta de memória): parar; o checkpoint refaz esses itens
+    except Exception as e:
+        return [(seq, {"id": item_id, "error": f"Falha no processamento: {e}"}) for seq, item_id, _, _ in chunk]
+
+
+def classify_parallel(items: Iterable[WorkItem], workers: Optional[int] = None, max_in_flight: Optional[int] = None,
+                      with_reply: bool = True, use_cache: bool = True,
+                      chunk_size: int = 16) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(sequência, linha de resultado) de cada item, na ordem em que terminam
+
+    ``workers`` processos (padrão: nº de CPUs), cada um com o modelo carregado
+    uma vez; os itens vão em grupos de ``chunk_size`` (uma ida e volta entre
+    processos por grupo) e no máximo ``max_in_flight`` ficam pendentes, então a
+    leitura espera os workers. ``workers=0`` usa threads no próprio processo,
+    melhor quando o gargalo é a rede (OpenAI) e não a CPU.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    pool: Executor
+    if workers <= 0:
+        _init_worker(with_reply, use_cache)
+        threads = max_in_flight or _worker["app"].BATCH_MAX_IN_FLIGHT
+        chunk_size, max_chunks = 1, threads
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="batch")
+    else:
+        chunk_size = max(1, chunk_size)
+        max_chunks = max(workers, (max_in_flight or 2 * workers * chunk_size) // chunk_size)
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                   initargs=(with_reply, use_cache))
+
+    pending: Dict[Future, List[Tuple[int, str, str, Any]]] = {}
+    chunk: List[Tuple[int, str, str, Any]] = []
+    try:
+        for seq, item_id, kind, payload, error in items:
+            if error is not None:
+                yield seq, {"id": item_id, "error": error}
+                continue
+            chunk.append((seq, item_id, kind, payload))
+            if len(chunk) < chunk_size:
+                continue
+            pending[pool.submit(_process_chunk, chunk)] = chunk
+            chunk = []
+            if len(pending) >= max_chunks:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from _future_lines(pending.pop(future), future)
+        if chunk:
+            pending[pool.submit(_process_chunk, chunk)] = chunk
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from _future_lines(pending.pop(future), future)
+    finally:
+        pool.shutdown(wait=not pending, cancel_futures=True)
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint e progresso
+# ---------------------------------------------------------------------------
+
+class Checkpoint:
+    """Itens concluídos: todos abaixo de ``done_below`` e o conjunto (pequeno) dos concluídos fora de ordem"""
+
+    def __init__(self, path: str, inputs: List[str]) -> None:
+        self.path = path
+        self.inputs = inputs
+        self.done_below = 0
+        self.extras: Set[int] = set()
+        self.output_bytes = 0
+        self.done = 0
+        self.errors = 0
+
+    def signature(self) -> List[Dict[str, Any]]:
+        return [{"path": os.path.abspath(p), "size": os.path.getsize(p) if os.path.isfile(p) else None}
+                for p in self.inputs]
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        if data.get("inputs") != self.signature():
+            raise SystemExit(f"❌ As entradas mudaram desde o checkpoint {self.path}; use --recomecar")
+        self.done_below = data["done_below"]
+        self.extras = set(data["extras"])
+        self.output_bytes = data["output_bytes"]
+        self.done = data["done"]
+        self.errors = data["errors"]
+        return True
+
+    def is_done(self, seq: int) -> bool:
+        return seq < self.done_below or seq in self.extras
+
+    def mark(self, seq: int, error: bool) -> None:
+        self.extras.add(seq)
+        while self.done_below in self.extras:
+            self.extras.remove(self.done_below)
+            self.done_below += 1
+        self.done += 1
+        self.errors += error
+
+    def save(self, output_bytes: int) -> None:
+        """Grava de forma atômica (arquivo temporário + rename); chamar depois de flush/fsync da saída"""
+        self.output_bytes = output_bytes
+        data = {
+            "inputs": self.signature(),
+            "done_below": self.done_below,
+            "extras": sorted(self.extras),
+            "output_bytes": output_bytes,
+            "done": self.done,
+            "errors": self.errors,
+            "saved_at": time.time(),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    """Vazão das últimas ``window`` segundos e ETA, impressos no stderr a cada ``interval`` segundos"""
+
+    def __init__(self, checkpoint: Checkpoint, interval: float = 2.0, window: float = 30.0) -> None:
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.window = window
+        self.total: Optional[int] = None
+        self.started = time.perf_counter()
+        self.start_done = checkpoint.done
+        self.samples: Deque[Tuple[float, int]] = deque([(self.started, checkpoint.done)])
+        self.last_print = 0.0
+        self.tty = sys.stderr.isatty()
+
+    def count_in_background(self, paths: List[str]) -> None:
+        def run() -> None:
+            try:
+                self.total = count_inputs(paths)
+            except OSError:
+                pass
+        threading.Thread(target=run, name="batch-count", daemon=True).start()
+
+    def rate(self) -> float:
+        now = time.perf_counter()
+        self.samples.append((now, self.checkpoint.done))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+        (t0, d0), (t1, d1) = self.samples[0], self.samples[-1]
+        return (d1 - d0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def line(self) -> str:
+        done, rate = self.checkpoint.done, self.rate()
+        parts = [f"{done}" + (f"/{self.total} ({done / self.total:.1%})" if self.total else "")]
+        parts.append(f"{rate:.1f} e-mails/s")
+        if self.total and rate > 0:
+            parts.append(f"ETA {format_seconds(max(0, self.total - done) / rate)}")
+        parts.append(f"{self.checkpoint.errors} com erro")
+        return "⏳ " + " · ".join(parts)
+
+    def update(self, force: bool = False) -> None:
+        now = time.perf_counter()
+        if force or now - self.last_print >= self.interval:
+            self.last_print = now
+            print(("\r" if self.tty else "") + self.line(), end="" if self.tty else "\n", file=sys.stderr, flush=True)
+
+    def finish(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        processed = self.checkpoint.done - self.start_done
+        if self.tty:
+            print(file=sys.stderr)
+        print(f"✅ {processed} e-mails nesta execução em {format_seconds(elapsed)} "
+              f"({processed / elapsed if elapsed else 0:.1f}/s); {self.checkpoint.done} no total, "
+              f"{self.checkpoint.errors} com erro", file=sys.stderr)
+
+
+def format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def main() -> None:
+    try:
+        from config import INGEST_WORKERS, INGEST_MAX_IN_FLIGHT
+    except ImportError:
+        INGEST_WORKERS, INGEST_MAX_IN_FLIGHT = None, None
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entradas", nargs="+", help="JSONL, diretórios (.txt/.pdf/.eml), mbox ou Maildir")
+    parser.add_argument("--saida", required=True, help="arquivo JSONL de resultados (gravado aos poucos)")
+    parser.add_argument("--checkpoint", default=None, help="padrão: <saida>.checkpoint.json")
+    parser.add_argument("--recomecar", action="store_true", help="ignora o checkpoint e sobrescreve a saída")
+    parser.add_argument("--processos", type=int, default=INGEST_WORKERS,
+                        help="workers (padrão: nº de CPUs; 0 = threads no próprio processo)")
+    parser.add_argument("--em-voo", type=int, default=INGEST_MAX_IN_FLIGHT,
+                        help="itens pendentes no máximo (padrão: 2 grupos por processo)")
+    parser.add_argument("--grupo", type=int, default=16, help="itens enviados juntos a cada processo")
+    parser.add_argument("--intervalo-checkpoint", type=float, default=5.0, help="segundos entre checkpoints")
+    parser.add_argument("--sem-total", action="store_true", help="não conta as entradas (sem ETA)")
+    parser.add_argument("--sem-resposta", action="store_true",
+                        help="só classifica; com HISTORY_BACKEND = \"sqlite\" cada linha traz classificacao_id "
+                             "para POST /reply/<id> num servidor com o mesmo HISTORY_DB_PATH")
+    parser.add_argument("--sem-cache", action="store_true")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.saida}.checkpoint.json", args.entradas)
+    resumed = not args.recomecar and checkpoint.load()
+    out = open(args.saida, "r+b" if resumed else "wb")
+    if resumed:
+        # Linhas gravadas depois do último checkpoint serão refeitas
+        out.truncate(checkpoint.output_bytes)
+        out.seek(checkpoint.output_bytes)
+        print(f"↩️ Retomando: {checkpoint.done} e-mails já processados", file=sys.stderr)
+    else:
+        checkpoint.save(0)
+
+    if args.sem_resposta:
+        print(classification_store_note(), file=sys.stderr)
+    progress = Progress(checkpoint)
+    if not args.sem_total:
+        progress.count_in_background(args.entradas)
+
+    items = (
+        (seq, item_id, kind, payload, error)
+        for seq, (item_id, kind, payload, error) in enumerate(iter_inputs(args.entradas))
+        if not checkpoint.is_done(seq)
+    )
+    last_save = time.monotonic()
+
+    def save() -> None:
+        out.flush()
+        os.fsync(out.fileno())
+        checkpoint.save(out.tell())
+
+    results = classify_parallel(items, args.processos, args.em_voo, with_reply=not args.sem_resposta,
+                                use_cache=not args.sem_cache, chunk_size=args.grupo)
+    try:
+        for seq, line in results:
+            out.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+            checkpoint.mark(seq, "error" in line)
+            if time.monotonic() - last_save >= args.intervalo_checkpoint:
+                save()
+                last_save = time.monotonic()
+            progress.update()
+    except BrokenProcessPool:
+        save()
+        raise SystemExit("❌ Um worker morreu; rode o mesmo comando para continuar do checkpoint")
+    except KeyboardInterrupt:
+        save()
+        raise SystemExit("\n⏸️ Interrompido; rode o mesmo comando para continuar do checkpoint")
+    finally:
+        results.close()  # encerra o pool sem esperar os itens pendentes
+    save()
+    out.close()
+    progress.update(force=True)
+    progress.finish()
+
+
+if __name__ == "__main__":
+    main()
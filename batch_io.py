@@ -0,0 +1,123 @@
+"""
+Leitura em streaming de lotes de e-mails (JSONL ou .zip) e classificação concorrente
+"""
+
+import json
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# (id, texto, erro) - exatamente um entre texto e erro é preenchido
+BatchItem = Tuple[str, Optional[str], Optional[str]]
+
+TEXT_FIELDS = ("email_text", "text", "body")
+SUBJECT_FIELDS = ("title", "subject", "assunto")
+ID_FIELDS = ("id", "request_id")
+
+
+def email_from_record(record: Dict[str, Any]) -> str:
+    """Monta o texto do e-mail a partir de um registro JSON (aceita o formato do requests.jsonl)"""
+    body = next((str(record[f]) for f in TEXT_FIELDS if record.get(f)), "")
+    subject = next((str(record[f]) for f in SUBJECT_FIELDS if record.get(f)), "")
+    if subject and body:
+        return f"Assunto: {subject}\n\n{body}"
+    return body or subject
+
+
+def iter_jsonl_emails(lines: Iterable[bytes]) -> Iterator[BatchItem]:
+    """Lê um JSONL linha a linha, sem carregar a entrada inteira em memória"""
+    for line_no, raw in enumerate(lines, 1):
+        line = raw.decode("utf-8", errors="ignore").strip() if isinstance(raw, bytes) else raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield str(line_no), None, f"JSON inválido na linha {line_no}: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield str(line_no), None, f"Linha {line_no} não é um objeto JSON"
+            continue
+        item_id = next((str(record[f]) for f in ID_FIELDS if record.get(f) is not None), str(line_no))
+        text = email_from_record(record).strip()
+        if not text:
+            yield item_id, None, "Registro sem texto de e-mail"
+            continue
+        yield item_id, text, None
+
+
+def iter_zip_emails(fileobj: BinaryIO, extract: Callable[[str, BinaryIO], str],
+                    max_member_bytes: Optional[int] = None) -> Iterator[BatchItem]:
+    """Percorre um .zip de arquivos .txt/.pdf, extraindo um membro por vez
+
+    Membros que descompactados passam de ``max_member_bytes`` viram erro sem
+    serem lidos (zip bomb: poucos KB que expandem para GB). O ``zipfile``
+    não lê além do tamanho declarado no cabeçalho.
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ValueError("Arquivo .zip inválido.")
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if max_member_bytes is not None and info.file_size > max_member_bytes:
+                yield info.filename, None, f"Arquivo maior que {max_member_bytes // (1024 * 1024)} MB descompactado"
+                continue
+            try:
+                with archive.open(info) as member:
+                    text = extract(info.filename, member).strip()
+            except Exception as e:
+                yield info.filename, None, str(e)
+                continue
+            if not text:
+                yield info.filename, None, "Arquivo sem texto extraível"
+                continue
+            yield info.filename, text, None
+
+
+def _result_line(item_id: str, future: Future) -> Dict[str, Any]:
+    try:
+        result = future.result()
+    except Exception as e:
+        return {"id": item_id, "error": f"Falha no processamento: {e}"}
+    return result_line(item_id, result)
+
+
+def result_line(item_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Linha de saída (NDJSON) de um e-mail classificado"""
+    line = {
+        "id": item_id,
+        "categoria": result.get("categoria"),
+        "motivo": result.get("motivo"),
+        "resposta_sugerida": result.get("resposta_sugerida"),
+    }
+    if result.get("classificacao_id"):
+        line["classificacao_id"] = result["classificacao_id"]
+    return line
+
+
+def classify_stream(items: Iterable[BatchItem], classify: Callable[[str], Dict[str, Any]],
+                    max_in_flight: int = 4) -> Iterator[Dict[str, Any]]:
+    """Classifica itens concorrentemente e devolve resultados na ordem em que terminam
+
+    No máximo ``max_in_flight`` e-mails ficam em memória ao mesmo tempo,
+    então entrada e saída podem ter qualquer tamanho.
+    """
+    max_in_flight = max(1, max_in_flight)
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="batch") as pool:
+        pending: Dict[Future, str] = {}
+        for item_id, text, error in items:
+            if error is not None:
+                yield {"id": item_id, "error": error}
+                continue
+            pending[pool.submit(classify, text)] = item_id
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _result_line(pending.pop(future), future)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield _result_line(pending.pop(future), future)
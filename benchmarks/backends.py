@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark e acurácia de todos os backends de classificação sobre um corpus JSONL rotulado
+
+Cada backend roda em um processo separado (pico de RSS isolado), pelo mesmo
+caminho do app (``classify_email`` sem cache). A OpenAI é simulada pelo
+servidor stub local: mede o custo do nosso lado (prompt, rede, parsing), e a
+acurácia dela reflete o stub, não o modelo real.
+
+Relata e-mails/s, latência p50/p95/p99, pico de RSS e acurácia/precisão/
+recall/F1 (positivo = Produtivo). Com ``--saida`` grava JSON; com
+``--comparar`` aponta regressões em relação a um JSON anterior (código de
+saída 1), para comparar commits.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.backends
+    python -m benchmarks.backends --backends heuristic,linear --saida bench.json
+    python -m benchmarks.backends --comparar bench_main.json --tolerancia 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from linear_classifier import binary_metrics, load_labeled
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "corpus.jsonl")
+BACKENDS = ["heuristic", "linear", "huggingface", "openai", "cascade"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss: KB no Linux, bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_backend(backend: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Executa um backend neste processo e devolve as métricas"""
+    texts, labels = load_labeled(args.corpus)
+    if not texts:
+        raise SystemExit(f"Nenhum e-mail rotulado em {args.corpus}")
+
+    server = None
+    if backend in ("openai", "cascade"):
+        from stub_openai_server import serve
+        server = serve(port=args.porta, latency_ms=args.latencia_ms, token_ms=0)
+        os.environ["OPENAI_API_KEY"] = "stub"
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.porta}/v1"
+
+    # O app imprime logs por e-mail; ficam fora da saída JSON
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    app.CLASSIFICATION_METHOD = backend
+    if args.modelo_linear:
+        app.LINEAR_MODEL_PATH = args.modelo_linear
+    if backend == "huggingface" and not app.HF_AVAILABLE:
+        return {"disponivel": False, "motivo": "transformers não instalado"}
+    if backend == "linear" and not os.path.exists(app.LINEAR_MODEL_PATH):
+        return {"disponivel": False,
+                "motivo": f"modelo {app.LINEAR_MODEL_PATH} não existe (python linear_classifier.py treinar)"}
+
+    def classify(text: str) -> Tuple[float, Dict[str, Any]]:
+        started = time.perf_counter()
+        result = app.classify_email(text, use_cache=False)
+        return time.perf_counter() - started, result
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Primeira chamada carrega modelos/conexões: medida à parte
+            warmup_s, _ = classify(texts[0])
+            latencies: List[float] = []
+            first_pass: List[Dict[str, Any]] = []
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, args.concorrencia)) as pool:
+                for repeat in range(args.repeticoes):
+                    for elapsed, result in pool.map(classify, texts):
+                        latencies.append(elapsed)
+                        if repeat == 0:
+                            first_pass.append(result)
+            total_s = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    preds = [int(r.get("categoria") == "Produtivo") for r in first_pass]
+    metrics = binary_metrics(labels, preds)
+    return {
+        "disponivel": True,
+        "emails": len(latencies),
+        "emails_por_s": round(len(latencies) / total_s, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "aquecimento_s": round(warmup_s, 3),
+        "pico_rss_mb": round(peak_rss_mb(), 1),
+        **{name: round(value, 4) for name, value in metrics.items()},
+        # Métodos que de fato responderam (fallbacks aparecem aqui)
+        "metodos": dict(Counter(r.get("metodo") for r in first_pass)),
+    }
+
+
+def run_isolated(backend: str, argv: List[str]) -> Dict[str, Any]:
+    """Roda o backend em um subprocesso (pico de RSS e modelos carregados não se misturam)"""
+    cmd = [sys.executable, "-m", "benchmarks.backends", "--filho", backend] + argv
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        return {"disponivel": False, "motivo": (proc.stderr.strip().splitlines() or ["falhou"])[-1]}
+    return json.loads(lines[-1])
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lista regressões: vazão/latência/memória piores que a tolerância relativa, F1 caindo mais de 0,01"""
+    problems = []
+    for backend, now in current["resultados"].items():
+        before = baseline.get("resultados", {}).get(backend)
+        if not before or not before.get("disponivel") or not now.get("disponivel"):
+            continue
+        if now["emails_por_s"] < before["emails_por_s"] * (1 - tolerance):
+            problems.append(f"{backend}: e-mails/s {before['emails_por_s']} -> {now['emails_por_s']}")
+        if now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            problems.append(f"{backend}: p95 {before['p95_ms']} ms -> {now['p95_ms']} ms")
+        if now["pico_rss_mb"] > before["pico_rss_mb"] * (1 + tolerance):
+            problems.append(f"{backend}: pico RSS {before['pico_rss_mb']} MB -> {now['pico_rss_mb']} MB")
+        if now["f1"] < before["f1"] - 0.01:
+            problems.append(f"{backend}: F1 {before['f1']} -> {now['f1']}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL com email_text/title e categoria")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--repeticoes", type=int, default=3, help="passadas pelo corpus na medição")
+    parser.add_argument("--concorrencia", type=int, default=1, help="e-mails classificados ao mesmo tempo")
+    parser.add_argument("--latencia-ms", type=float, default=50.0, help="latência simulada do stub OpenAI")
+    parser.add_argument("--porta", type=int, default=8766, help="porta do stub OpenAI")
+    parser.add_argument("--modelo-linear", default=None, help="arquivo .npz (padrão: LINEAR_MODEL_PATH)")
+    parser.add_argument("--saida", default=None, help="grava os resultados em JSON")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita em --comparar")
+    parser.add_argument("--filho", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(run_backend(args.filho, args), ensure_ascii=False))
+        return
+
+    child_argv = [
+        "--corpus", args.corpus, "--repeticoes", str(args.repeticoes), "--concorrencia", str(args.concorrencia),
+        "--latencia-ms", str(args.latencia_ms), "--porta", str(args.porta),
+    ]
+    if args.modelo_linear:
+        child_argv += ["--modelo-linear", args.modelo_linear]
+
+    results = {}
+    print(f"{'backend':<12} {'e-mails/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>7} {'acurácia':>9} {'F1':>6}  métodos")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        r = run_isolated(backend, child_argv)
+        results[backend] = r
+        if not r.get("disponivel"):
+            print(f"{backend:<12} indisponível: {r.get('motivo')}")
+            continue
+        print(f"{backend:<12} {r['emails_por_s']:>10.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['pico_rss_mb']:>7.0f} {r['accuracy']:>9.3f} {r['f1']:>6.3f}  {r['metodos']}")
+
+    report = {
+        "commit": git_commit(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "corpus": args.corpus,
+        "repeticoes": args.repeticoes,
+        "concorrencia": args.concorrencia,
+        "resultados": results,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as out:
+            json.dump(report, out, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        problems = compare(report, baseline, args.tolerancia)
+        if problems:
+            print(f"❌ Regressões em relação a {args.comparar} ({baseline.get('commit')}):")
+            for problem in problems:
+                print(f"   - {problem}")
+            sys.exit(1)
+        print(f"✅ Sem regressões em relação a {args.comparar} ({baseline.get('commit')})")
+
+
+if __name__ == "__main__":
+    main()
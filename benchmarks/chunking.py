@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+E-mails longos no Hugging Face: corte em 512 caracteres x janelas de tokens
+
+Monta uma versão longa de cada e-mail rotulado do corpus (encaminhamento
+com aviso legal antes do texto e histórico citado depois, como chegam na
+prática) e mistura com os originais curtos. Compara, com requisições
+concorrentes passando pelo micro-batching:
+
+- ``fatia``: comportamento antigo, só os primeiros 512 caracteres
+- ``janelas-sem-ordenar``: janelas de tokens, forwards na ordem de chegada
+- ``janelas``: janelas de tokens, lote ordenado e dividido por tamanho
+
+Relata e-mails/s, fração de padding e acurácia nos e-mails longos. Com
+``--modelo-falso`` o custo de cada forward é proporcional às posições com
+padding (itens x maior texto); a acurácia só faz sentido com o modelo real.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.chunking                 # modelo real (precisa de transformers)
+    python -m benchmarks.chunking --modelo-falso
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from benchmarks.backends import DEFAULT_CORPUS
+from linear_classifier import binary_metrics, load_labeled
+
+FORWARD_HEADER = (
+    "---------- Mensagem encaminhada ----------\n"
+    "De: Equipe Comercial <comercial@empresa.com.br>\nData: seg., 3 de jun. 2024 09:12\n\n"
+)
+DISCLAIMER = (
+    "AVISO LEGAL: Esta mensagem e seus anexos podem conter informações confidenciais ou privilegiadas. "
+    "Se você não for o destinatário, fica notificado de que qualquer divulgação, cópia ou distribuição "
+    "é proibida; por favor, apague-a e avise o remetente. As opiniões aqui expressas são do autor e não "
+    "representam necessariamente a posição da empresa. "
+) * 3
+QUOTED = "\n".join("> " + line for line in (
+    "Em sex., 31 de mai. 2024, a equipe escreveu:",
+    "Seguem os comentários da última conversa, conforme combinado na chamada.",
+    "Qualquer dúvida fico à disposição.",
+) * 6)
+
+
+def long_version(text: str) -> str:
+    return f"{FORWARD_HEADER}{DISCLAIMER}\n\n{text}\n\nAtenciosamente,\nEquipe\n\n{QUOTED}"
+
+
+def fake_model(fixed_ms: float, per_token_ms: float) -> Callable:
+    """Custo fixo por forward + custo por posição com padding (tokens = palavras)"""
+    def model(texts: List[str], **kwargs: Any) -> List[List[Dict[str, Any]]]:
+        longest = max(len(t.split()) for t in texts) + 2
+        time.sleep((fixed_ms + per_token_ms * len(texts) * min(longest, 512)) / 1000.0)
+        return [[{"label": "3 stars", "score": 1.0}] for _ in texts]
+    return model
+
+
+def run_mode(app: Any, mode: str, texts: List[str], concurrency: int) -> Dict[str, Any]:
+    app.HF_CHUNKING = mode != "fatia"
+    batcher = app.MicroBatcher(
+        lambda: app.model_registry.get("sentiment"),
+        max_batch_size=app.HF_BATCH_MAX_SIZE,
+        max_wait_ms=app.HF_BATCH_MAX_WAIT_MS,
+        max_batch_tokens=app.HF_BATCH_MAX_TOKENS if mode == "janelas" else None,
+        padding_slack=256 if mode == "janelas" else None,
+    )
+    app.hf_batcher = batcher
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda t: app.classify_with_huggingface(t, app.basic_preprocess(t)), texts))
+        elapsed = time.perf_counter() - started
+    stats = batcher.stats()
+    return {
+        "emails_por_s": round(len(texts) / elapsed, 2),
+        "forwards": stats["forwards"],
+        "itens": stats["items"],
+        "padding": stats["padding_ratio"] if mode != "fatia" else None,
+        "resultados": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--modelo-falso", action="store_true")
+    parser.add_argument("--custo-fixo-ms", type=float, default=15.0, help="modelo falso: custo por forward")
+    parser.add_argument("--custo-token-ms", type=float, default=0.02, help="modelo falso: custo por posição")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    if args.modelo_falso:
+        app.model_registry.register("sentiment", lambda: fake_model(args.custo_fixo_ms, args.custo_token_ms))
+        app.HF_AVAILABLE = True
+    elif not app.HF_AVAILABLE:
+        raise SystemExit("transformers não instalado: use --modelo-falso")
+
+    short, labels = load_labeled(args.corpus)
+    long = [long_version(text) for text in short]
+    texts = [t for pair in zip(short, long) for t in pair]  # curtos e longos intercalados
+    app.model_registry.get("sentiment")  # carga fora da medição
+
+    print(f"{len(short)} e-mails curtos + {len(long)} longos (~{sum(map(len, long)) // len(long)} caracteres)")
+    print(f"{'modo':<22} {'e-mails/s':>10} {'forwards':>9} {'itens':>6} {'padding':>8} {'acurácia (longos)':>18}")
+    for mode in ("fatia", "janelas-sem-ordenar", "janelas"):
+        r = run_mode(app, mode, texts, args.concorrencia)
+        long_results = r["resultados"][1::2]
+        preds = [int(res.get("categoria") == "Produtivo") for res in long_results]
+        accuracy = binary_metrics(labels, preds)["accuracy"]
+        padding = f"{r['padding']:.1%}" if r["padding"] is not None else "-"
+        shown = "-" if args.modelo_falso else f"{accuracy:.3f}"
+        print(f"{mode:<22} {r['emails_por_s']:>10.1f} {r['forwards']:>9} {r['itens']:>6} {padding:>8} {shown:>18}")
+
+
+if __name__ == "__main__":
+    main()
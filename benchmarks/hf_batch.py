@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark do micro-batching do Hugging Face: vazão e latência por tamanho de batch
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.hf_batch                    # modelo real (precisa de transformers)
+    python -m benchmarks.hf_batch --modelo-falso     # simula custo fixo + custo por item
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from typing import Callable, List
+
+from hf_batcher import MicroBatcher
+
+EMAILS = [
+    "Olá, gostaria de agendar uma reunião para discutir o projeto de desenvolvimento do sistema.",
+    "Ganhe dinheiro fácil! Oferta imperdível de investimento em criptomoedas!",
+    "Preciso do status do relatório que enviei ontem. Podemos alinhar o cronograma?",
+    "Promoção especial! Desconto de 50% em todos os produtos!",
+    "Bom dia, envio em anexo a proposta comercial para análise.",
+]
+
+
+def fake_model(fixed_ms: float, per_item_ms: float) -> Callable:
+    """Modelo simulado: custo fixo por forward + custo marginal por item (libera o GIL como o torch)"""
+    def model(texts: List[str], **kwargs):
+        time.sleep((fixed_ms + per_item_ms * len(texts)) / 1000.0)
+        return [[{"label": "3 stars", "score": 1.0}] for _ in texts]
+    return model
+
+
+def real_model(model_name: str) -> Callable:
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=model_name, return_all_scores=True)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(model: Callable, batch_size: int, max_wait_ms: float, clients: int, requests_per_client: int) -> dict:
+    batcher = MicroBatcher(lambda: model, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    batcher.infer(EMAILS[0])  # aquece a thread e o modelo
+    batcher.batches = batcher.items = 0
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(idx: int) -> None:
+        local = []
+        for i in range(requests_per_client):
+            started = time.perf_counter()
+            batcher.infer(EMAILS[(idx + i) % len(EMAILS)])
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "batch_size": batch_size,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "avg_batch": batcher.stats()["avg_batch_size"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--clientes", type=int, default=32, help="requisições concorrentes")
+    parser.add_argument("--requisicoes", type=int, default=20, help="requisições por cliente")
+    parser.add_argument("--modelo", default="nlptown/bert-base-multilingual-uncased-sentiment")
+    parser.add_argument("--modelo-falso", action="store_true")
+    parser.add_argument("--custo-fixo-ms", type=float, default=40.0)
+    parser.add_argument("--custo-item-ms", type=float, default=4.0)
+    args = parser.parse_args()
+
+    model = fake_model(args.custo_fixo_ms, args.custo_item_ms) if args.modelo_falso else real_model(args.modelo)
+
+    print(f"{'batch':>6} {'emails/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'batch médio':>12}")
+    for size in [int(s) for s in args.batch_sizes.split(",")]:
+        r = run(model, size, args.max_wait_ms, args.clientes, args.requisicoes)
+        print(f"{r['batch_size']:>6} {r['throughput']:>10.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['avg_batch']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark do casamento de palavras-chave: laço de substrings vs autômato Aho-Corasick
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.keywords --termos 30,300,3000 --kb 4
+"""
+
+import argparse
+import random
+import string
+import time
+
+from keyword_matcher import KeywordMatcher
+from benchmarks.preprocess import make_email
+
+
+def random_terms(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))) for _ in range(count)]
+
+
+def best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--termos", default="30,300,3000,30000")
+    parser.add_argument("--kb", type=int, default=4, help="tamanho do e-mail em KB")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_email(args.kb).lower()
+    print(f"{'termos':>7} {'laço ms':>9} {'autômato ms':>12} {'montagem ms':>12}")
+    for count in [int(c) for c in args.termos.split(",")]:
+        terms = random_terms(count)
+        started = time.perf_counter()
+        matcher = KeywordMatcher().add_terms("x", terms).build()
+        build = time.perf_counter() - started
+        naive = best_of(lambda: [t for t in terms if t in text], args.repeticoes)
+        scan = best_of(lambda: matcher.scan(text), args.repeticoes)
+        print(f"{count:>7} {naive * 1000:>9.3f} {scan * 1000:>12.3f} {build * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do /process: requisições por segundo por número de workers do gunicorn
+
+Para cada valor de --workers sobe ``gunicorn -c gunicorn.conf.py wsgi:app``,
+dispara requisições concorrentes por alguns segundos e mede RPS e latência.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.loadtest --workers 1,2,4 --clientes 32 --duracao 10
+    python -m benchmarks.loadtest --url http://localhost:5000   # servidor já em execução
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import List, Optional
+
+EMAILS = [
+    "Olá, gostaria de agendar uma reunião para discutir o projeto de desenvolvimento do sistema.",
+    "Ganhe dinheiro fácil! Oferta imperdível de investimento em criptomoedas!",
+    "Preciso do status do relatório que enviei ontem. Podemos alinhar o cronograma?",
+    "Bom dia, envio em anexo a proposta comercial para análise.",
+]
+
+
+def wait_ready(url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/healthz", timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.3)
+    raise RuntimeError(f"Servidor não respondeu em {timeout:.0f}s")
+
+
+def load(url: str, clients: int, duration: float) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(idx: int) -> None:
+        nonlocal errors
+        local, local_errors, i = [], 0, idx
+        while time.monotonic() < stop_at:
+            # no_cache: mede o custo real de classificação, não o do cache
+            body = urllib.parse.urlencode({"email_text": f"{EMAILS[i % len(EMAILS)]} #{i}", "no_cache": "1"}).encode()
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f"{url}/process", data=body, timeout=60) as resp:
+                    resp.read()
+                local.append(time.perf_counter() - started)
+            except Exception:
+                local_errors += 1
+            i += clients
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+        "errors": errors,
+    }
+
+
+def start_server(workers: int, threads: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), SERVER_THREADS=str(threads))
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", "wsgi:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", type=int, default=8, help="threads por worker")
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por rodada")
+    parser.add_argument("--porta", type=int, default=5055)
+    parser.add_argument("--url", default=None, help="usa um servidor já em execução")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'erros':>6}")
+    if args.url:
+        wait_ready(args.url)
+        r = load(args.url, args.clientes, args.duracao)
+        print(f"{'-':>8} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['errors']:>6}")
+        return
+
+    for workers in [int(w) for w in args.workers.split(",")]:
+        server: Optional[subprocess.Popen] = start_server(workers, args.threads, args.porta)
+        try:
+            url = f"http://127.0.0.1:{args.porta}"
+            wait_ready(url)
+            load(url, args.clientes, 1.0)  # aquecimento
+            r = load(url, args.clientes, args.duracao)
+            print(f"{workers:>8} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['errors']:>6}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Índice de quase-duplicatas: taxa de reaproveitamento x taxa de falsos positivos por limiar
+
+A partir do corpus rotulado, cada e-mail vira um "modelo" preenchido com
+nome, número de chamado e data aleatórios (saudação, referência e
+assinatura, como sai de um sistema de atendimento). Para cada limiar:
+
+- reaproveitamento: com o índice contendo uma instância de cada modelo, a
+  fração de outras instâncias que encontram a instância do próprio modelo
+- falso positivo: com o índice sem a instância do próprio modelo, a fração
+  de consultas que ainda encontram algo (outro e-mail, mesma moldura); e
+  quantas delas trariam a categoria errada
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.near_duplicates
+    python -m benchmarks.near_duplicates --limiares 0.4,0.5,0.6 --variantes 10
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.backends import DEFAULT_CORPUS
+from linear_classifier import load_labeled
+from near_duplicates import NearDuplicateIndex
+from preprocessing import Preprocessor
+
+NAMES = ["João", "Maria", "Ana Paula", "Carlos", "Fernanda", "Ricardo", "Beatriz", "Luiz Henrique",
+         "Patrícia", "Eduardo", "Juliana", "Rafael"]
+MONTHS = ["janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho", "agosto", "setembro",
+          "outubro", "novembro", "dezembro"]
+
+
+def fill_template(body: str, rng: random.Random) -> str:
+    return (f"Olá {rng.choice(NAMES)}, {body} Referente ao chamado {rng.randint(1000, 99999)} "
+            f"de {rng.randint(1, 28)} de {rng.choice(MONTHS)}. Atenciosamente, {rng.choice(NAMES)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--limiares", default="0.3,0.4,0.5,0.6,0.7,0.8")
+    parser.add_argument("--variantes", type=int, default=5, help="instâncias consultadas por modelo")
+    parser.add_argument("--semente", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    preprocessor = Preprocessor()
+    bodies, labels = load_labeled(args.corpus)
+    stored = [preprocessor.tokens(fill_template(body, rng)) for body in bodies]
+    queries = [[preprocessor.tokens(fill_template(body, rng)) for _ in range(args.variantes)] for body in bodies]
+    n_queries = len(bodies) * args.variantes
+    print(f"{len(bodies)} modelos, {n_queries} consultas (~{sum(map(len, stored)) // len(stored)} tokens por e-mail)")
+
+    print(f"{'limiar':>6} {'reaproveitamento':>17} {'falso positivo':>15} {'categoria errada':>17} {'µs/consulta':>12}")
+    for threshold in [float(t) for t in args.limiares.split(",") if t.strip()]:
+        index = NearDuplicateIndex(threshold=threshold, min_tokens=1)
+        for i, tokens in enumerate(stored):
+            index.add(tokens, {"modelo": i, "categoria": labels[i]})
+
+        reused = 0
+        started = time.perf_counter()
+        for i, variants in enumerate(queries):
+            for tokens in variants:
+                hit = index.lookup(tokens)
+                reused += hit is not None and hit[0]["modelo"] == i
+        lookup_us = (time.perf_counter() - started) / n_queries * 1e6
+
+        false_matches = wrong_category = 0
+        for i, variants in enumerate(queries):
+            # Índice sem o próprio modelo: qualquer acerto é falso positivo
+            held_out = NearDuplicateIndex(threshold=threshold, min_tokens=1)
+            for j, tokens in enumerate(stored):
+                if j != i:
+                    held_out.add(tokens, {"modelo": j, "categoria": labels[j]})
+            for tokens in variants:
+                hit = held_out.lookup(tokens)
+                if hit is not None:
+                    false_matches += 1
+                    wrong_category += hit[0]["categoria"] != labels[i]
+
+        print(f"{threshold:>6.2f} {reused / n_queries:>17.1%} {false_matches / n_queries:>15.1%} "
+              f"{wrong_category / n_queries:>17.1%} {lookup_us:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cliente OpenAI assíncrono contra o servidor stub local
+
+Sobe o stub na própria execução e mede vazão por nível de concorrência,
+incluindo novas tentativas causadas por 429.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.openai_async --emails 200 --concorrencia 1,8,32 --taxa-429 0.05
+"""
+
+import argparse
+import json
+import os
+import time
+import urllib.request
+
+from openai_client import AsyncOpenAIRunner
+from stub_openai_server import serve
+
+EMAIL = "Olá, podemos agendar uma reunião para alinhar o cronograma do projeto?"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--concorrencia", default="1,4,16,64")
+    parser.add_argument("--latencia-ms", type=float, default=100.0)
+    parser.add_argument("--taxa-429", type=float, default=0.05)
+    parser.add_argument("--rpm", type=float, default=100_000)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    server = serve(port=args.porta, latency_ms=args.latencia_ms, rate_429=args.taxa_429)
+    base_url = f"http://127.0.0.1:{args.porta}/v1"
+    messages = [[{"role": "user", "content": f"{EMAIL} #{i}"}] for i in range(args.emails)]
+
+    print(f"{'concorr.':>9} {'emails/s':>9} {'s total':>8} {'retries':>8} {'429':>5} {'erros':>6}")
+    try:
+        for concurrency in [int(c) for c in args.concorrencia.split(",")]:
+            runner = AsyncOpenAIRunner(max_concurrency=concurrency, requests_per_minute=args.rpm,
+                                       tokens_per_minute=args.rpm * 1000, backoff_base=0.05,
+                                       base_url=base_url)
+            started = time.perf_counter()
+            results = runner.run_many(messages, "stub-model", max_tokens=60)
+            elapsed = time.perf_counter() - started
+            errors = sum(1 for r in results if isinstance(r, Exception))
+            stats = runner.stats()
+            print(f"{concurrency:>9} {args.emails / elapsed:>9.1f} {elapsed:>8.2f} "
+                  f"{stats['retries']:>8} {stats['rate_limited']:>5} {errors:>6}")
+        with urllib.request.urlopen(f"{base_url}/stats") as resp:
+            print("stub:", json.loads(resp.read()))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark do pré-processamento: implementação antiga (por chamada) vs Preprocessor
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.preprocess
+    python -m benchmarks.preprocess --tamanhos 1,10,100,1000 --repeticoes 5
+"""
+
+import argparse
+import re
+import time
+
+from preprocessing import Preprocessor
+
+SAMPLE = (
+    "Olá João,\r\nConforme conversamos, segue a proposta de orçamento para o projeto X. "
+    "O cronograma está em https://exemplo.com/docs/cronograma?v=2 e dúvidas podem ir para "
+    "joao.silva@empresa.com.br. Precisamos alinhar a entrega até 15/10, às 14h30!\n\n"
+    "Abraços,\nMaria - Gerência de Projetos (11) 99999-0000\n"
+)
+
+
+def legacy_preprocess(text: str) -> str:
+    """Cópia da versão anterior de basic_preprocess (stopwords e regex refeitos a cada chamada)"""
+    import nltk
+    from nltk.corpus import stopwords
+    try:
+        _ = stopwords.words("english")
+    except LookupError:
+        nltk.download("stopwords", quiet=True)
+
+    text = text.replace("\r", " ").replace("\n", " ")
+    text = re.sub(r"\s+", " ", text).strip().lower()
+    text = re.sub(r"https?://\S+", " ", text)
+    text = re.sub(r"\b\S+@\S+\.[a-z]{2,}\b", " ", text)
+    text = re.sub(r"[^a-zá-úà-ùâ-ûãõç\s]", " ", text)
+
+    sw_pt = set()
+    sw_en = set()
+    try:
+        sw_pt = set(stopwords.words("portuguese"))
+    except Exception:
+        pass
+    try:
+        sw_en = set(stopwords.words("english"))
+    except Exception:
+        pass
+    sw_all = sw_pt | sw_en
+
+    tokens = [t for t in text.split() if t and t not in sw_all]
+    return " ".join(tokens)
+
+
+def make_email(size_kb: int) -> str:
+    target = size_kb * 1024
+    return (SAMPLE * (target // len(SAMPLE) + 1))[:target]
+
+
+def best_of(fn, arg, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", default="1,10,100,1024", help="tamanhos dos e-mails em KB")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    pre = Preprocessor()
+    print(f"Stopwords carregadas: {len(pre.stopwords)}")
+    print(f"{'KB':>6} {'antigo ms':>11} {'novo ms':>9} {'lote ms/email':>14} {'ganho':>7} {'iguais':>7}")
+    for size in [int(s) for s in args.tamanhos.split(",")]:
+        email = make_email(size)
+        old = best_of(legacy_preprocess, email, args.repeticoes)
+        new = best_of(pre.preprocess, email, args.repeticoes)
+        batch = best_of(pre.preprocess_many, [email] * 10, args.repeticoes) / 10
+        same = legacy_preprocess(email) == pre.preprocess(email)
+        print(f"{size:>6} {old * 1000:>11.3f} {new * 1000:>9.3f} {batch * 1000:>14.3f} {old / new:>6.1f}x {str(same):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Índice de respostas: limiar de similaridade, tempo de construção, latência de busca e memória
+
+1. Calibração (corpus rotulado): cada e-mail vira um modelo preenchido com
+   nome, chamado e data aleatórios (como em ``benchmarks.near_duplicates``).
+   O índice guarda uma instância por modelo; as outras instâncias buscam.
+   Por limiar: fração que recebe a resposta do próprio modelo e, com o
+   próprio modelo fora do índice, fração que ainda receberia a resposta de
+   outro e-mail (e quantas dessas de categoria errada).
+
+2. Escala (10k, 100k e 1M linhas): vetores sintéticos em torno dos vetores
+   reais do corpus (com ruído), para ter a mesma estrutura sem embutir 1M de
+   textos. Relata tempo de gravação, de construção do IVF, latência p50/p95
+   da busca exata e da particionada, recall@1 do IVF em relação à exata,
+   tamanho em disco e RSS depois das buscas (páginas do memmap incluídas).
+   O custo do embedding é medido à parte, em e-mails/s.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.reply_index
+    python -m benchmarks.reply_index --tamanhos 10000,100000 --consultas 500
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.backends import DEFAULT_CORPUS
+from benchmarks.near_duplicates import fill_template
+from linear_classifier import load_labeled
+from model_registry import current_rss_mb
+from preprocessing import Preprocessor
+from reply_index import HashingEmbedder, ReplyIndex
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def calibrate(embedder: HashingEmbedder, bodies: List[str], labels: List[int], thresholds: List[float],
+              variants: int, rng: random.Random) -> None:
+    stored = embedder.embed_many([fill_template(b, rng) for b in bodies])
+    own, other, other_same_cat = [], [], []
+    for i, body in enumerate(bodies):
+        scores = embedder.embed_many([fill_template(body, rng) for _ in range(variants)]) @ stored.T
+        own.extend(scores[:, i])
+        # Sem o próprio modelo no índice: o mais parecido é a resposta de outro e-mail
+        scores[:, i] = -np.inf
+        best = scores.argmax(axis=1)
+        other.extend(scores[np.arange(variants), best])
+        other_same_cat.extend(labels[j] == labels[i] for j in best)
+
+    n = len(own)
+    print(f"Calibração: {len(bodies)} modelos, {n} consultas")
+    print(f"{'limiar':>6} {'resposta certa':>15} {'de outro e-mail':>16} {'categoria errada':>17}")
+    for t in thresholds:
+        right = sum(s >= t for s in own)
+        wrong = sum(s >= t for s in other)
+        wrong_cat = sum(s >= t and not same for s, same in zip(other, other_same_cat))
+        print(f"{t:>6.2f} {right / n:>15.1%} {wrong / n:>16.1%} {wrong_cat / n:>17.1%}")
+
+
+def synthetic_vectors(base: np.ndarray, n: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    picked = base[rng.integers(0, len(base), size=n)]
+    out = picked + rng.normal(0.0, noise, size=picked.shape).astype(np.float32)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out.astype(np.float32)
+
+
+def scale(embedder: HashingEmbedder, base: np.ndarray, size: int, queries: int, noise: float, nprobe: int,
+          rng: np.random.Generator) -> None:
+    directory = tempfile.mkdtemp(prefix="reply-index-")
+    try:
+        index = ReplyIndex(directory, embedder, nprobe=nprobe)
+        started = time.perf_counter()
+        for start in range(0, size, 50_000):
+            n = min(50_000, size - start)
+            index.add_many([""] * n, ["r"] * n, ["Produtivo" if i % 2 else "Improdutivo" for i in range(n)],
+                           vectors=synthetic_vectors(base, n, noise, rng))
+        write_s = time.perf_counter() - started
+
+        qs = synthetic_vectors(base, queries, noise, rng)
+        exact_ms, exact_top = [], []
+        for q in qs:
+            t0 = time.perf_counter()
+            exact_top.append(index.search(vector=q, k=1, exact=True)[0].id)
+            exact_ms.append((time.perf_counter() - t0) * 1000)
+        rss_exact = current_rss_mb()
+
+        ivf = index.build_ivf()
+        ivf_ms, hits = [], 0
+        for q, expected in zip(qs, exact_top):
+            t0 = time.perf_counter()
+            got = index.search(vector=q, k=1)
+            ivf_ms.append((time.perf_counter() - t0) * 1000)
+            hits += bool(got) and got[0].id == expected
+        stats = index.stats()
+        print(f"{size:>9} {write_s:>9.1f} {ivf['seconds']:>8.1f} {ivf['nlist']:>6} "
+              f"{percentile(exact_ms, 50):>8.2f} {percentile(exact_ms, 95):>8.2f} "
+              f"{percentile(ivf_ms, 50):>8.2f} {percentile(ivf_ms, 95):>8.2f} {hits / queries:>9.1%} "
+              f"{stats['disk_mb']:>9.0f} {rss_exact:>9.0f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--limiares", default="0.3,0.4,0.5,0.6,0.7,0.8,0.9")
+    parser.add_argument("--variantes", type=int, default=5)
+    parser.add_argument("--tamanhos", default="10000,100000,1000000")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--ruido", type=float, default=0.03, help="desvio do ruído nos vetores sintéticos")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--semente", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    embedder = HashingEmbedder(args.dim, Preprocessor().tokens)
+    bodies, labels = load_labeled(args.corpus)
+    calibrate(embedder, bodies, labels, [float(t) for t in args.limiares.split(",") if t.strip()],
+              args.variantes, rng)
+
+    texts = [fill_template(bodies[i % len(bodies)], rng) for i in range(10_000)]
+    started = time.perf_counter()
+    base = embedder.embed_many(texts)
+    print(f"\nEmbedding: {len(texts) / (time.perf_counter() - started):,.0f} e-mails/s (hashing, dim {args.dim})")
+
+    print(f"{'linhas':>9} {'gravar s':>9} {'IVF s':>8} {'grupos':>6} {'exata p50':>8} {'p95 ms':>8} "
+          f"{'IVF p50':>8} {'p95 ms':>8} {'recall@1':>9} {'disco MB':>9} {'RSS MB':>9}")
+    np_rng = np.random.default_rng(args.semente)
+    for size in [int(s) for s in args.tamanhos.split(",") if s.strip()]:
+        scale(embedder, base, size, args.consultas, args.ruido, args.nprobe, np_rng)
+
+
+if __name__ == "__main__":
+    main()
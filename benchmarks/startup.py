@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tempo de inicialização e memória de um worker, por backend
+
+Cada medição roda em um interpretador novo: tempo até ``import app`` terminar
+(o que o autoscaling espera antes de o worker atender), RSS ocioso logo após
+o import, a primeira classificação (quando os imports pesados do backend são
+resolvidos sob demanda) e quais módulos pesados ficaram carregados.
+
+``--ansioso`` importa antes transformers/torch, openai, nltk, numpy e PyPDF2,
+como o app fazia antes dos imports sob demanda, para comparar.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --backends heuristic --repeticoes 5 --ansioso
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+BACKENDS = ["heuristic", "linear", "huggingface", "openai", "cascade"]
+EAGER_MODULES = ["transformers", "torch", "openai", "httpx", "nltk.corpus", "numpy", "PyPDF2"]
+SAMPLE_EMAIL = "Olá, gostaria de agendar uma reunião para discutir o projeto de desenvolvimento do sistema."
+
+
+def measure(backend: str, eager: bool) -> Dict[str, Any]:
+    """Roda neste processo (recém-criado) e devolve as medidas"""
+    started = time.perf_counter()
+    if eager:
+        for name in EAGER_MODULES:
+            with contextlib.suppress(Exception):
+                importlib.import_module(name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    import_s = time.perf_counter() - started
+    idle_rss = app.current_rss_mb()
+
+    app.CLASSIFICATION_METHOD = backend
+    started = time.perf_counter()
+    app.classify_email(SAMPLE_EMAIL, use_cache=False)
+    first_s = time.perf_counter() - started
+    return {
+        "import_s": round(import_s, 3),
+        "rss_ocioso_mb": round(idle_rss, 1),
+        "primeira_classificacao_s": round(first_s, 3),
+        "rss_apos_primeira_mb": round(app.current_rss_mb(), 1),
+        "modulos_pesados": [name for name in app.HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def run_isolated(backend: str, eager: bool) -> Dict[str, Any]:
+    cmd = [sys.executable, "-m", "benchmarks.startup", "--filho", backend] + (["--ansioso"] if eager else [])
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    # O interpretador inteiro conta: é o que um worker novo leva para subir
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    total_s = time.perf_counter() - started
+    lines = [line for line in proc.stdout.splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        return {"erro": (proc.stderr.strip().splitlines() or ["falhou"])[-1]}
+    result = json.loads(lines[-1])
+    result["processo_s"] = round(total_s, 3)
+    return result
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if "erro" not in r]
+    if not ok:
+        return runs[0]
+    summary = {key: round(statistics.median(r[key] for r in ok), 3)
+               for key in ("import_s", "processo_s", "rss_ocioso_mb", "primeira_classificacao_s",
+                           "rss_apos_primeira_mb")}
+    summary["modulos_pesados"] = ok[-1]["modulos_pesados"]
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--repeticoes", type=int, default=3, help="processos por backend (mediana)")
+    parser.add_argument("--ansioso", action="store_true", help="importa tudo antes, como o app antigo")
+    parser.add_argument("--saida", default=None, help="grava os resultados em JSON")
+    parser.add_argument("--filho", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(measure(args.filho, args.ansioso), ensure_ascii=False))
+        return
+
+    results = {}
+    print(f"{'backend':<12} {'processo s':>10} {'import s':>9} {'RSS ocioso':>11} {'1ª classif. s':>14} "
+          f"{'RSS depois':>11}  módulos pesados")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        r = summarize([run_isolated(backend, args.ansioso) for _ in range(max(1, args.repeticoes))])
+        results[backend] = r
+        if "erro" in r:
+            print(f"{backend:<12} erro: {r['erro']}")
+            continue
+        print(f"{backend:<12} {r['processo_s']:>10.3f} {r['import_s']:>9.3f} {r['rss_ocioso_mb']:>8.0f} MB "
+              f"{r['primeira_classificacao_s']:>14.3f} {r['rss_apos_primeira_mb']:>8.0f} MB  "
+              f"{', '.join(r['modulos_pesados']) or '-'}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as out:
+            json.dump({"ansioso": args.ansioso, "resultados": results}, out, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Classificação em cascata: métodos baratos primeiro, escalando só quando a confiança é baixa
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+Classifier = Callable[..., Dict[str, Any]]
+
+
+class CascadeTier:
+    """Um nível da cascata
+
+    ``min_confidence``: o resultado é aceito se ``resultado["confianca"]`` for
+    maior ou igual a ele. Resultados sem ``confianca`` são sempre aceitos, assim
+    como os do último nível disponível. ``cost_per_call`` só é contado quando o
+    resultado veio do próprio nível (``resultado["metodo"] == name``).
+    """
+
+    def __init__(self, name: str, classify: Classifier, min_confidence: float = 0.0,
+                 cost_per_call: float = 0.0, available: Optional[Callable[[], bool]] = None) -> None:
+        self.name = name
+        self.classify = classify
+        self.min_confidence = min_confidence
+        self.cost_per_call = cost_per_call
+        self.available = available or (lambda: True)
+        self.calls = 0
+        self.accepted = 0
+        self.latency_total = 0.0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+
+
+class CascadeClassifier:
+    def __init__(self, tiers: List[CascadeTier]) -> None:
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.cost_total = 0.0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+
+    def classify(self, email_original: str, email_preprocessed: str, **kwargs: Any) -> Dict[str, Any]:
+        """Argumentos extras (ex.: ``with_reply``) são repassados a cada nível"""
+        started = time.perf_counter()
+        tiers = [tier for tier in self.tiers if tier.available()]
+        if not tiers:
+            raise RuntimeError("Nenhum nível da cascata está disponível")
+
+        result: Dict[str, Any] = {}
+        for position, tier in enumerate(tiers):
+            tier_started = time.perf_counter()
+            result = tier.classify(email_original, email_preprocessed, **kwargs)
+            elapsed = time.perf_counter() - tier_started
+            confidence = result.get("confianca")
+            is_last = position == len(tiers) - 1
+            accepted = is_last or confidence is None or confidence >= tier.min_confidence
+            with self._lock:
+                tier.calls += 1
+                tier.latency_total += elapsed
+                tier.latencies.append(elapsed)
+                # Nível que caiu para outro método por dentro (ex.: OpenAI fora do ar) não gerou cobrança
+                if result.get("metodo") == tier.name:
+                    self.cost_total += tier.cost_per_call
+                if accepted:
+                    tier.accepted += 1
+            if accepted:
+                result = dict(result)
+                result["nivel_cascata"] = tier.name
+                break
+
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.requests
+            # Custo se todo e-mail fosse direto para o nível mais caro
+            max_cost = max((t.cost_per_call for t in self.tiers), default=0.0)
+            baseline = requests * max_cost
+            tiers = {}
+            for tier in self.tiers:
+                tiers[tier.name] = {
+                    "calls": tier.calls,
+                    "accepted": tier.accepted,
+                    "hit_rate": round(tier.accepted / requests, 4) if requests else 0.0,
+                    "escalated": tier.calls - tier.accepted,
+                    "min_confidence": tier.min_confidence,
+                    "avg_latency_ms": round(tier.latency_total / tier.calls * 1000, 2) if tier.calls else None,
+                    "p50_latency_ms": round(statistics.median(tier.latencies) * 1000, 2) if tier.latencies else None,
+                }
+            return {
+                "requests": requests,
+                "p50_latency_ms": round(statistics.median(self.latencies) * 1000, 2) if self.latencies else None,
+                "estimated_cost": round(self.cost_total, 6),
+                "estimated_cost_without_cascade": round(baseline, 6),
+                "estimated_savings": round(baseline - self.cost_total, 6),
+                "tiers": tiers,
+            }
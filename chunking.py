@@ -0,0 +1,76 @@
+"""
+Divisão de e-mails longos em janelas de tokens para o modelo de sentimento
+
+O modelo enxerga no máximo 512 tokens. Em vez de cortar o e-mail em um
+número fixo de caracteres, o texto é tokenizado com o tokenizador do próprio
+modelo e dividido em janelas sobrepostas; os scores de cada janela são
+combinados pela média ponderada pelo número de tokens.
+"""
+
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+WORD_RE = re.compile(r"\S+")
+
+Span = Tuple[int, int]
+
+
+def token_offsets(pipe: Any, text: str) -> List[Span]:
+    """Posições (início, fim) de cada token no texto, sem tokens especiais e sem truncar
+
+    Usa ``pipe.token_offsets`` (ONNX) ou ``pipe.tokenizer`` (pipeline do
+    transformers); sem tokenizador (ex.: modelo falso), palavras separadas por espaço.
+    """
+    offsets_fn = getattr(pipe, "token_offsets", None)
+    if offsets_fn is not None:
+        return list(offsets_fn(text))
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if tokenizer is not None:
+        encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                            truncation=False, verbose=False)
+        return [tuple(span) for span in encoded["offset_mapping"]]
+    return [match.span() for match in WORD_RE.finditer(text)]
+
+
+def window_starts(n_tokens: int, window: int, stride: int, max_chunks: int) -> List[int]:
+    """Início de cada janela; passando de ``max_chunks``, janelas espalhadas pelo e-mail todo
+
+    ``stride`` é a sobreposição entre janelas vizinhas. A primeira e a última
+    janela sempre entram (saudação/pedido costumam estar no começo, a
+    assinatura e o "fico no aguardo" no fim).
+    """
+    if n_tokens <= window:
+        return [0]
+    step = max(1, window - stride)
+    starts = list(range(0, n_tokens - window, step)) + [n_tokens - window]
+    if max_chunks and len(starts) > max_chunks:
+        if max_chunks == 1:
+            return [0]
+        last = len(starts) - 1
+        starts = [starts[round(i * last / (max_chunks - 1))] for i in range(max_chunks)]
+    return starts
+
+
+def chunk_text(text: str, offsets: Sequence[Span], window: int = 510, stride: int = 64,
+               max_chunks: int = 4) -> List[Tuple[str, int]]:
+    """Janelas ``(trecho do texto original, nº de tokens)``"""
+    if not offsets:
+        return [(text, 0)]
+    chunks = []
+    for start in window_starts(len(offsets), window, stride, max_chunks):
+        end = min(start + window, len(offsets))
+        chunks.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+    return chunks
+
+
+def aggregate_scores(outputs: Sequence[List[Dict[str, Any]]], weights: Sequence[int]) -> List[Dict[str, Any]]:
+    """Média dos scores de cada rótulo, ponderada pelo número de tokens de cada janela"""
+    if len(outputs) == 1:
+        return outputs[0]
+    weights = [max(1, int(w)) for w in weights]
+    total = float(sum(weights))
+    sums: Dict[str, float] = {}
+    for output, weight in zip(outputs, weights):
+        for item in output:
+            sums[item["label"]] = sums.get(item["label"], 0.0) + item["score"] * weight
+    return [{"label": label, "score": value / total} for label, value in sums.items()]
@@ -5,12 +5,154 @@
 # 1. "heuristic" - Apenas heurística (sempre funciona, gratuito)
 # 2. "huggingface" - Hugging Face (gratuito, precisa instalar transformers)
 # 3. "openai" - OpenAI API (pago, precisa de chave)
+# 4. "linear" - Modelo linear local treinado com linear_classifier.py (gratuito, muito rápido)
+# 5. "cascade" - Heurística/linear primeiro; escala para HF/OpenAI só quando há dúvida
 
 CLASSIFICATION_METHOD = "openai"  # Usando OpenAI para respostas contextuais inteligentes
 
 # Configurações do Hugging Face
 HF_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+# Modelo usado em classify_with_huggingface (a lógica depende dos rótulos "1 star" ... "5 stars")
+HF_SENTIMENT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+# Carregar o modelo e rodar uma inferência fictícia na inicialização (evita latência no 1º request)
+HF_PREWARM = False
+# Micro-batching: junta requisições concorrentes em um único forward do modelo
+HF_BATCH_MAX_SIZE = 8        # máximo de e-mails por batch
+HF_BATCH_MAX_WAIT_MS = 10    # espera máxima para completar um batch
+HF_BATCH_MAX_TOKENS = 4096   # posições (itens x maior texto, com padding) por forward
+# E-mails longos: janelas de tokens com sobreposição, scores combinados pela média ponderada
+HF_CHUNKING = True           # False = corta nos primeiros 512 caracteres (comportamento antigo)
+HF_CHUNK_TOKENS = 510        # tokens por janela (512 do modelo menos [CLS] e [SEP])
+HF_CHUNK_STRIDE = 64         # tokens repetidos entre janelas vizinhas
+HF_MAX_CHUNKS = 4            # janelas por e-mail (espalhadas pelo texto se houver mais)
+# Backend de inferência do modelo de sentimento: "pytorch" (transformers) ou "onnx" (exportado
+# uma vez para ONNX com quantização int8; menor latência e memória em CPU, worker sem torch).
+# Exporta na primeira carga ou com "python onnx_sentiment.py exportar" (precisa de torch + onnx);
+# para servir bastam onnxruntime + tokenizers. Se falhar, volta para o PyTorch.
+HF_BACKEND = "pytorch"
+HF_ONNX_DIR = "models/onnx"     # cache dos artefatos exportados
+HF_ONNX_QUANTIZE = True         # pesos int8 (False = float32, só a troca de runtime)
+HF_ONNX_TOLERANCE = 0.05        # diferença máxima aceita nos scores "1 star" ... "5 stars" vs PyTorch
+HF_ONNX_THREADS = 0             # threads de inferência por processo (0 = padrão do onnxruntime)
+
+# Modelo linear local (python linear_classifier.py treinar ...)
+LINEAR_MODEL_PATH = "models/linear.npz"
+LINEAR_THRESHOLD = 0.5       # probabilidade mínima para "Produtivo"
 
 # Configurações da OpenAI
 OPENAI_MODEL = "gpt-4o-mini"
+# Cliente compartilhado: chamadas simultâneas, limites da conta e novas tentativas em 429/5xx
+OPENAI_MAX_CONCURRENCY = 16
+OPENAI_REQUESTS_PER_MINUTE = 500
+OPENAI_TOKENS_PER_MINUTE = 200_000
+OPENAI_MAX_RETRIES = 5
+OPENAI_TIMEOUT_SECONDS = 60      # teto por tentativa (leitura); o prazo da requisição pode encurtar
+OPENAI_CONNECT_TIMEOUT_SECONDS = 5
+OPENAI_MAX_CONNECTIONS = 64      # tamanho do pool HTTP (conexões mantidas vivas)
+
+# Degradação: OpenAI → Hugging Face → heurística dentro de um prazo por requisição
+REQUEST_DEADLINE_SECONDS = 20        # orçamento da classificação inteira (None = sem prazo)
+FALLBACK_RESERVE_SECONDS = 2.0       # parte do prazo guardada para os fallbacks (a OpenAI não usa)
+HF_COLD_START_MIN_SECONDS = 15.0     # sem o modelo carregado e com menos prazo que isso, pula para a heurística
+BREAKER_FAILURE_THRESHOLD = 5        # falhas seguidas que abrem o disjuntor de um backend
+BREAKER_COOLDOWN_SECONDS = 30        # tempo pulando o backend antes de uma chamada de teste
+
+
+# Classificação em lote (/process/batch): e-mails processados ao mesmo tempo
+BATCH_MAX_IN_FLIGHT = 8
+
+# Cache de resultados (evita pagar de novo por e-mails duplicados)
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_ENTRIES = 2048              # entradas na LRU em memória
+RESULT_CACHE_TTL_SECONDS = 7 * 24 * 3600     # validade de cada resultado
+RESULT_CACHE_DB_PATH = None                  # ex.: "cache/resultados.sqlite3" para persistir entre reinícios
+RESULT_CACHE_DB_MAX_ENTRIES = 100_000
+
+# Quase-duplicatas: o mesmo e-mail-modelo com outro nome, data ou nº de chamado reaproveita a
+# categoria de um parecido já classificado (MinHash + LSH sobre o texto pré-processado); só a
+# resposta é gerada de novo. python -m benchmarks.near_duplicates mede acertos x falsos positivos
+NEAR_DUP_ENABLED = True
+NEAR_DUP_THRESHOLD = 0.5          # similaridade de Jaccard estimada (unigramas + bigramas)
+NEAR_DUP_MAX_ENTRIES = 10_000     # assinaturas em memória por processo (LRU, ~0,5 KB cada)
+NEAR_DUP_MIN_TOKENS = 8           # e-mails mais curtos não são comparados
+NEAR_DUP_METHODS = ["openai", "huggingface", "cascade"]   # onde a busca custa menos que classificar
+NEAR_DUP_REPLY_OPENAI = True      # resposta personalizada pela OpenAI (só o prompt de resposta) ou local
+
+# Índice de respostas: e-mails parecidos com um já respondido recebem a resposta dele em milissegundos
+# (vetores em memmap, busca exata ou particionada); só sem nada parecido a resposta é gerada.
+# python -m benchmarks.reply_index calibra o limiar e mede latência/memória com 10k-1M respostas
+REPLY_INDEX_ENABLED = False
+REPLY_INDEX_DIR = "models/replies"
+REPLY_INDEX_EMBEDDER = "hashing"       # ou o nome de um modelo do sentence-transformers
+REPLY_INDEX_DIM = 256                  # só para "hashing"
+REPLY_INDEX_MIN_SIMILARITY = 0.7       # cosseno mínimo entre o e-mail novo e o já respondido
+REPLY_INDEX_ONLY_APPROVED = False      # usar só respostas aprovadas (POST /replies)
+REPLY_INDEX_LEARN = True               # guardar as respostas geradas pela OpenAI
+REPLY_INDEX_NPROBE = 8                 # partições percorridas quando há IVF (python reply_index.py particionar)
+# POST /replies (respostas aprovadas passam a ser enviadas a clientes): desativado sem token.
+# Prefira a variável de ambiente REPLY_INDEX_APPROVE_TOKEN; o cliente envia "Authorization: Bearer <token>"
+REPLY_INDEX_APPROVE_TOKEN = None
+
+# Extração de PDF: para de ler quando já há texto suficiente para classificar
+PDF_MAX_PAGES = 20
+PDF_MAX_CHARS = 20_000
+PDF_WORKERS = 2              # processos de extração (0 = extrair na própria thread)
+PDF_TIMEOUT_SECONDS = 30
+UPLOAD_MAX_MB = 50           # tamanho máximo de upload
+
+# Caixas de e-mail (mbox, Maildir, .eml) e lotes pela linha de comando: python mail_ingest.py,
+# python batch_classify.py e uploads em /process/batch
+MAIL_MAX_MESSAGE_BYTES = 25 * 1024 * 1024   # mensagens maiores viram erro (sem carregar em memória)
+MAIL_MAX_CHARS = 20_000                     # texto por mensagem (corpo + PDFs anexados)
+INGEST_WORKERS = None                       # processos de classificação (None = nº de CPUs, 0 = threads)
+INGEST_MAX_IN_FLIGHT = None                 # mensagens pendentes (None = 2 grupos de 16 por processo)
+
+# Servidor de produção (gunicorn.conf.py / Procfile)
+SERVER_WORKERS = 2           # processos (sobrescrito por WEB_CONCURRENCY)
+SERVER_THREADS = 8           # threads por processo
+SERVER_TIMEOUT = 120
+SERVER_GRACEFUL_TIMEOUT = 30
+SERVER_MAX_REQUESTS = 2000   # recicla o worker após N requisições (0 = nunca)
+SERVER_PRELOAD_MODEL = True  # carrega o modelo HF no mestre, antes do fork
+SERVER_TORCH_THREADS = 1     # threads do torch por worker
+
+# Logs: "DEBUG" mostra o passo a passo de cada e-mail; "INFO" só eventos de inicialização e falhas
+# (a variável de ambiente LOG_LEVEL tem prioridade)
+LOG_LEVEL = "INFO"
+
+# Histórico e contadores do dashboard
+# "sqlite" = compartilhado entre workers (e com batch_classify.py) e persistente;
+# "memory" = por processo, só para desenvolvimento com um único worker (reiniciar zera)
+HISTORY_BACKEND = "sqlite"
+HISTORY_MAX = 20
+HISTORY_DB_PATH = "data/historico.sqlite3"
+# Classificações guardadas por ID para gerar a resposta depois (POST /reply/<id>). O texto do e-mail só é
+# guardado quando a resposta ficou para depois (até MAIL_MAX_CHARS/PDF_MAX_CHARS, ~20 KB); com resposta
+# pronta a linha tem ~1 KB. Saem após o TTL ou, antes, quando passam do limite (as mais antigas primeiro):
+# 200 mil e-mails adiados ocupam no pior caso ~4 GB
+CLASSIFICATION_STORE_MAX = 200_000
+CLASSIFICATION_STORE_TTL_SECONDS = 7 * 24 * 3600   # 0 = sem expiração por idade
+
+# Fila de jobs (POST /jobs): classificações demoradas fora do ciclo da requisição
+JOBS_DB_PATH = "data/jobs.sqlite3"
+JOBS_FILES_DIR = "data/jobs"       # arquivos enviados aguardando processamento
+JOBS_WORKERS = 2                   # threads por processo (0 = não processa jobs neste servidor)
+# Máximo de jobs simultâneos por backend, somando todos os workers da máquina
+JOBS_BACKEND_CONCURRENCY = {"openai": 8, "huggingface": 2, "linear": 4, "cascade": 4, "heuristic": 8}
+JOBS_LEASE_SECONDS = 600           # job "running" há mais tempo que isso volta para a fila
+JOBS_MAX_ATTEMPTS = 3
+# Espera antes de repetir um job que falhou: dobra a cada tentativa (5 s, 10 s, 20 s...) até o máximo
+JOBS_RETRY_BACKOFF_SECONDS = 5
+JOBS_RETRY_BACKOFF_MAX_SECONDS = 300
+JOBS_RETENTION_SECONDS = 7 * 24 * 3600
+# Hosts aceitos em callback_url (".exemplo.com" inclui subdomínios). Vazio = qualquer host que resolva
+# só para endereços públicos (loopback, redes privadas e link-local são sempre recusados)
+JOBS_CALLBACK_ALLOWED_HOSTS = []
 
+# Cascata (CLASSIFICATION_METHOD = "cascade")
+# Níveis em ordem; níveis indisponíveis (sem modelo/chave) são pulados
+CASCADE_TIERS = ["heuristic", "linear", "openai"]
+# Confiança mínima (0..1) para aceitar o resultado de um nível sem escalar
+CASCADE_MIN_CONFIDENCE = {"heuristic": 0.7, "linear": 0.7}
+# Custo estimado por chamada (US$), usado para relatar a economia em /cascade
+CASCADE_COST_PER_CALL = {"openai": 0.0003}
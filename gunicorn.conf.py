@@ -0,0 +1,73 @@
+"""
+Configuração do gunicorn: python -m gunicorn -c gunicorn.conf.py wsgi:app
+
+Recarga graciosa: ``kill -HUP <pid do mestre>`` troca os workers sem derrubar
+conexões. Como o app é pré-carregado, para publicar código novo use
+``kill -USR2`` (novo mestre) seguido de ``kill -WINCH``/``-TERM`` no antigo.
+"""
+
+import os
+
+try:
+    from config import (
+        SERVER_WORKERS, SERVER_THREADS, SERVER_TIMEOUT, SERVER_GRACEFUL_TIMEOUT,
+        SERVER_MAX_REQUESTS, SERVER_TORCH_THREADS, HF_PREWARM, HISTORY_BACKEND,
+    )
+except ImportError:
+    SERVER_WORKERS = 2
+    SERVER_THREADS = 8
+    SERVER_TIMEOUT = 120
+    SERVER_GRACEFUL_TIMEOUT = 30
+    SERVER_MAX_REQUESTS = 2000
+    SERVER_TORCH_THREADS = 1
+    HF_PREWARM = False
+    HISTORY_BACKEND = "sqlite"
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# WEB_CONCURRENCY é a convenção de plataformas como Heroku/Render
+workers = int(os.getenv("WEB_CONCURRENCY", SERVER_WORKERS))
+threads = int(os.getenv("SERVER_THREADS", SERVER_THREADS))
+worker_class = "gthread"
+timeout = SERVER_TIMEOUT
+graceful_timeout = SERVER_GRACEFUL_TIMEOUT
+keepalive = 5
+
+# Carrega o app (e o modelo) antes do fork: pesos compartilhados copy-on-write
+preload_app = True
+
+# Recicla workers periodicamente (vazamentos de memória), com jitter para não reciclar todos juntos
+max_requests = SERVER_MAX_REQUESTS
+max_requests_jitter = max(1, SERVER_MAX_REQUESTS // 10) if SERVER_MAX_REQUESTS else 0
+
+accesslog = "-"
+
+
+def when_ready(server):
+    # Histórico em memória é por worker: /reply/<id> e o dashboard só funcionam no worker que classificou
+    if HISTORY_BACKEND == "memory" and workers > 1:
+        server.log.warning(
+            "HISTORY_BACKEND = \"memory\" com %d workers: classificações e histórico não são compartilhados "
+            "(POST /reply/<id> devolve 404 em outro worker). Use HISTORY_BACKEND = \"sqlite\".", workers
+        )
+
+
+def post_fork(server, worker):
+    # Evita que N workers x M threads do torch disputem os mesmos núcleos
+    try:
+        import torch
+        torch.set_num_threads(SERVER_TORCH_THREADS)
+    except Exception:
+        pass
+
+
+def post_worker_init(worker):
+    # O mestre só carrega os pesos; a inferência de aquecimento (threads e caches do torch/onnx)
+    # roda aqui, depois do fork, em cada worker
+    if not HF_PREWARM:
+        return
+    from app import model_registry
+    if model_registry.is_loaded("sentiment"):
+        try:
+            model_registry.prewarm("sentiment")
+        except Exception as e:
+            worker.log.warning("Falha ao aquecer modelo no worker %s: %s", worker.pid, e)
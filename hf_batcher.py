@@ -0,0 +1,139 @@
+"""
+Micro-batching de inferências do Hugging Face entre requisições concorrentes
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+Item = Tuple[str, int, Future]
+
+
+class MicroBatcher:
+    """Agrupa textos de requisições concorrentes e roda um único batch no modelo
+
+    Uma thread de fundo espera o primeiro texto, coleta outros por até
+    ``max_wait_ms`` (ou até ``max_batch_size``) e roda o modelo com padding.
+    O lote coletado é ordenado por tamanho e dividido em forwards quando
+    incluir o próximo texto custaria mais de ``padding_slack`` posições de
+    padding ou passaria de ``max_batch_tokens`` (itens x maior tamanho): um
+    texto longo não obriga os curtos a carregar padding.
+    Cada requisição recebe seu resultado por um ``Future``.
+    """
+
+    def __init__(self, model_getter: Callable[[], Callable], max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 max_batch_tokens: Optional[int] = None, padding_slack: Optional[int] = 256) -> None:
+        self.model_getter = model_getter
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_batch_tokens = max_batch_tokens
+        self.padding_slack = padding_slack
+        self._queue: "queue.Queue[Item]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.batches = 0
+        self.forwards = 0
+        self.items = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def _ensure_worker(self) -> None:
+        # Threads não sobrevivem a fork: cada processo (ex.: worker do gunicorn) inicia a sua
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="hf-microbatcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str, length: Optional[int] = None) -> Future:
+        """``length``: tamanho em tokens, se já conhecido (senão, o número de caracteres)"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, len(text) if length is None else int(length), future))
+        return future
+
+    def infer(self, text: str, timeout: Optional[float] = None, length: Optional[int] = None) -> Any:
+        """Envia um texto e bloqueia até o resultado do batch em que ele entrou"""
+        return self.submit(text, length).result(timeout=timeout)
+
+    def infer_many(self, texts: Sequence[str], lengths: Optional[Sequence[int]] = None,
+                   timeout: Optional[float] = None) -> List[Any]:
+        """Vários textos (ex.: janelas de um e-mail longo), que podem cair no mesmo forward"""
+        lengths = lengths if lengths is not None else [None] * len(texts)
+        futures = [self.submit(text, length) for text, length in zip(texts, lengths)]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_tokens": self.max_batch_tokens,
+            "forwards": self.forwards,
+            # Fração das posições com padding nos forwards (tamanhos informados em submit)
+            "padding_ratio": round(1 - self.tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0,
+        }
+
+    def plan(self, batch: List[Item]) -> List[List[Item]]:
+        """Ordena por tamanho e divide em forwards de tamanhos parecidos"""
+        groups: List[List[Item]] = []
+        current: List[Item] = []
+        for item in sorted(batch, key=lambda it: it[1]):
+            length = item[1]
+            if current and (
+                (self.padding_slack is not None and len(current) * (length - current[-1][1]) > self.padding_slack)
+                or (self.max_batch_tokens and (len(current) + 1) * length > self.max_batch_tokens)
+            ):
+                groups.append(current)
+                current = []
+            current.append(item)
+        if current:
+            groups.append(current)
+        return groups
+
+    def _collect(self) -> List[Item]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            for group in self.plan(batch):
+                texts = [text for text, _, _ in group]
+                try:
+                    model = self.model_getter()
+                    outputs = model(texts, batch_size=len(texts), truncation=True)
+                except Exception as exc:
+                    for _, _, fut in group:
+                        fut.set_exception(exc)
+                    continue
+                self.forwards += 1
+                self.items += len(group)
+                self.tokens += sum(length for _, length, _ in group)
+                self.padded_tokens += len(group) * group[-1][1]
+                for (_, _, fut), output in zip(group, outputs):
+                    fut.set_result(output)
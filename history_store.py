@@ -0,0 +1,178 @@
+"""
+Histórico de e-mails processados, contadores por categoria e classificações
+guardadas por ID (para gerar a resposta sugerida depois, sob demanda)
+
+As classificações saem pela idade (``classification_ttl`` segundos) ou,
+antes disso, pela quantidade (``max_classifications``, as mais antigas primeiro).
+
+``MemoryHistoryStore`` vale para um único processo. ``SQLiteHistoryStore``
+(modo WAL) é compartilhado por todos os workers da mesma máquina.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+CATEGORIES = ("Produtivo", "Improdutivo")
+
+HistorySnapshot = Tuple[List[Dict[str, Any]], Dict[str, int]]
+
+
+class MemoryHistoryStore:
+    """Deque limitado (inserção O(1)) e contadores protegidos por um lock"""
+
+    def __init__(self, max_items: int = 20, max_classifications: int = 5000,
+                 classification_ttl: float = 0) -> None:
+        self.max_items = max_items
+        self.max_classifications = max_classifications
+        self.classification_ttl = classification_ttl
+        self._lock = threading.Lock()
+        self._items: Deque[Dict[str, Any]] = deque(maxlen=max_items)
+        self._counts = {cat: 0 for cat in CATEGORIES}
+        self._classifications: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._items.appendleft(entry)
+            cat = entry.get("categoria")
+            if cat in self._counts:
+                self._counts[cat] += 1
+
+    def snapshot(self, limit: int = 0) -> HistorySnapshot:
+        with self._lock:
+            items = list(self._items)
+            counts = dict(self._counts)
+        return (items[:limit] if limit else items), counts
+
+    def save_classification(self, classification_id: str, data: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._classifications[classification_id] = (now, data)
+            self._classifications.move_to_end(classification_id)
+            while len(self._classifications) > self.max_classifications:
+                self._classifications.popitem(last=False)
+            if self.classification_ttl:
+                # Ordem de inserção = ordem de idade: basta olhar o começo
+                cutoff = now - self.classification_ttl
+                while self._classifications and next(iter(self._classifications.values()))[0] < cutoff:
+                    self._classifications.popitem(last=False)
+
+    def get_classification(self, classification_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stored = self._classifications.get(classification_id)
+        if stored is None or (self.classification_ttl and stored[0] < time.time() - self.classification_ttl):
+            return None
+        return stored[1]
+
+
+class SQLiteHistoryStore:
+    """Histórico em SQLite (WAL): leituras não bloqueiam escritas e todos os workers veem os mesmos totais
+
+    Cada thread de cada processo tem sua própria conexão, então não há lock
+    global no caminho da requisição; o SQLite serializa apenas as escritas.
+    """
+
+    def __init__(self, path: str, max_items: int = 20, max_classifications: int = 5000,
+                 classification_ttl: float = 0) -> None:
+        self.path = path
+        self.max_items = max_items
+        self.max_classifications = max_classifications
+        self.classification_ttl = classification_ttl
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS counts (categoria TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+        conn.executemany("INSERT OR IGNORE INTO counts (categoria, n) VALUES (?, 0)", [(c,) for c in CATEGORIES])
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, created REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS classifications_created ON classifications (created)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Conexões não podem atravessar fork nem ser usadas por outra thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            # Arquivo e tabelas só no primeiro uso: importar o app (ex.: CLIs) não cria nada em disco
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(
+                "INSERT INTO history (created, data) VALUES (?, ?)",
+                (time.time(), json.dumps(entry, ensure_ascii=False)),
+            )
+            conn.execute("UPDATE counts SET n = n + 1 WHERE categoria = ?", (entry.get("categoria"),))
+            # Mantém só as últimas max_items linhas
+            conn.execute("DELETE FROM history WHERE id <= ?", (cur.lastrowid - self.max_items,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def snapshot(self, limit: int = 0) -> HistorySnapshot:
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT data FROM history ORDER BY id DESC LIMIT ?", (limit or self.max_items,)
+        ).fetchall()
+        counts = {cat: 0 for cat in CATEGORIES}
+        counts.update(dict(conn.execute("SELECT categoria, n FROM counts").fetchall()))
+        return [json.loads(row[0]) for row in rows], counts
+
+    def save_classification(self, classification_id: str, data: Dict[str, Any]) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM classifications WHERE id = ?", (classification_id,))
+            cur = conn.execute(
+                "INSERT INTO classifications (id, created, data) VALUES (?, ?, ?)",
+                (classification_id, now, json.dumps(data, ensure_ascii=False)),
+            )
+            conn.execute("DELETE FROM classifications WHERE seq <= ?", (cur.lastrowid - self.max_classifications,))
+            if self.classification_ttl:
+                conn.execute("DELETE FROM classifications WHERE created < ?", (now - self.classification_ttl,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_classification(self, classification_id: str) -> Optional[Dict[str, Any]]:
+        cutoff = time.time() - self.classification_ttl if self.classification_ttl else 0
+        row = self._conn().execute(
+            "SELECT data FROM classifications WHERE id = ? AND created >= ?", (classification_id, cutoff)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def create_history_store(backend: str = "memory", max_items: int = 20, db_path: str = "",
+                         max_classifications: int = 5000, classification_ttl: float = 0):
+    if backend == "sqlite":
+        return SQLiteHistoryStore(db_path or "data/historico.sqlite3", max_items, max_classifications,
+                                  classification_ttl)
+    return MemoryHistoryStore(max_items, max_classifications, classification_ttl)
@@ -0,0 +1,432 @@
+"""
+Fila de jobs persistente (SQLite) para classificações demoradas
+
+O cliente recebe o ID do job na hora e consulta ``GET /jobs/<id>`` ou recebe
+um callback (webhook) quando termina. Os jobs ficam em disco: sobrevivem a
+reinícios, e jobs "running" de um processo que morreu voltam para a fila
+quando o lease expira (cada nova tentativa espera um recuo exponencial,
+``not_before``). Prioridade maior sai primeiro; cada backend de
+classificação tem um limite de jobs simultâneos, contado no próprio banco
+(vale para todos os workers da máquina).
+"""
+
+import http.client
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Conecta no IP já validado (``address``); Host continua sendo o nome da URL"""
+
+    def __init__(self, host: str, port: Optional[int] = None, address: Optional[str] = None, **kwargs: Any) -> None:
+        super().__init__(host, port, **kwargs)
+        self.address = address
+
+    def connect(self) -> None:
+        if self.address is None:
+            return super().connect()
+        self.sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """Como ``_PinnedHTTPConnection``, com SNI e certificado verificados contra o nome da URL"""
+
+    def __init__(self, host: str, port: Optional[int] = None, address: Optional[str] = None, **kwargs: Any) -> None:
+        super().__init__(host, port, **kwargs)
+        self.address = address
+
+    def connect(self) -> None:
+        if self.address is None:
+            return super().connect()
+        sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def post_callback(url: str, body: bytes, headers: Dict[str, str], timeout: float,
+                  allowed_hosts: Sequence[str] = ()) -> int:
+    """Valida a URL e faz o POST no endereço validado (sem nova resolução de DNS entre os dois)
+
+    Redirecionamentos não são seguidos (um host público poderia apontar para um
+    interno): um 3xx conta como falha, como qualquer status fora de 2xx.
+    """
+    addresses = validate_callback_url(url, allowed_hosts)
+    parsed = urllib.parse.urlsplit(url)
+    cls = _PinnedHTTPSConnection if parsed.scheme == "https" else _PinnedHTTPConnection
+    conn = cls(parsed.hostname, parsed.port, address=addresses[0] if addresses else None, timeout=timeout)
+    path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+    try:
+        conn.request("POST", path, body=body, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+    finally:
+        conn.close()
+    if not 200 <= resp.status < 300:
+        raise OSError(f"HTTP {resp.status}" + (" (redirecionamento recusado)" if 300 <= resp.status < 400 else ""))
+    return resp.status
+
+
+def validate_callback_url(url: str, allowed_hosts: Sequence[str] = ()) -> List[str]:
+    """Levanta ValueError se o callback não pode ser chamado pelo servidor
+
+    Com ``allowed_hosts`` só esses hosts (ou subdomínios de ``.dominio``) são
+    aceitos. Sem lista, o host precisa resolver só para endereços públicos:
+    loopback, redes privadas, link-local (ex.: 169.254.169.254) e afins são
+    recusados, para o webhook não virar um proxy para a rede interna. Devolve
+    os endereços validados (vazio com ``allowed_hosts``), que é onde a entrega
+    deve conectar.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url deve ser uma URL http:// ou https://.")
+    host = parsed.hostname.lower().rstrip(".")
+    if allowed_hosts:
+        for allowed in allowed_hosts:
+            allowed = allowed.lower()
+            if host == allowed.lstrip(".") or (allowed.startswith(".") and host.endswith(allowed)):
+                return []
+        raise ValueError(f"callback_url: host {host} não está na lista de hosts permitidos.")
+    try:
+        infos = socket.getaddrinfo(host, parsed.port or (443 if parsed.scheme == "https" else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"callback_url: host {host} não resolve ({e}).") from None
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not address.is_global:
+            raise ValueError(f"callback_url: host {host} aponta para um endereço interno ({address}).")
+        addresses.append(str(address))
+    return addresses
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Fila em SQLite (WAL) + pool de threads que executa ``handler(payload)`` por job
+
+    ``backend_limits``: máximo de jobs "running" por backend (ausente = sem limite).
+    ``retry_backoff``: espera antes da 2ª tentativa, dobrando a cada falha até
+    ``retry_backoff_max`` (um backend fora do ar não é martelado em laço).
+    ``on_finish(payload)`` roda quando o job chega a um estado final (ex.: apagar
+    o arquivo enviado). As threads são criadas sob demanda e por processo
+    (``ensure_started``).
+    """
+
+    def __init__(self, path: str, handler: JobHandler, workers: int = 2,
+                 on_finish: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 backend_limits: Optional[Dict[str, int]] = None, lease_seconds: float = 600.0,
+                 max_attempts: int = 3, retention_seconds: float = 7 * 24 * 3600,
+                 retry_backoff: float = 5.0, retry_backoff_max: float = 300.0,
+                 poll_interval: float = 0.5, callback_timeout: float = 10.0, callback_retries: int = 3,
+                 callback_allowed_hosts: Sequence[str] = ()) -> None:
+        self.path = path
+        self.handler = handler
+        self.on_finish = on_finish
+        self.workers = workers
+        self.backend_limits = dict(backend_limits or {})
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.poll_interval = poll_interval
+        self.callback_timeout = callback_timeout
+        self.callback_retries = callback_retries
+        self.callback_allowed_hosts = list(callback_allowed_hosts)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid: Optional[int] = None
+        self._last_maintenance = 0.0
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0,"
+            " backend TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, owner TEXT, lease_until REAL,"
+            " callback_url TEXT, callback_status TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL, not_before REAL)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "not_before" not in columns:
+            # Bancos criados antes do recuo entre tentativas
+            conn.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Uma conexão por thread e por processo (não atravessam fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            # Banco criado no primeiro submit/worker, não ao importar o app (ex.: CLIs)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _owner() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # ----------------------------- API -----------------------------
+
+    def submit(self, payload: Dict[str, Any], backend: str, priority: int = 0,
+               callback_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs (id, status, priority, backend, payload, callback_url, created)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, int(priority), backend, json.dumps(payload, ensure_ascii=False),
+             callback_url or None, time.time()),
+        )
+        self.ensure_started()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._describe(row) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        running = dict(conn.execute(
+            "SELECT backend, COUNT(*) FROM jobs WHERE status = ? GROUP BY backend", (RUNNING,)
+        ).fetchall())
+        queued = dict(conn.execute(
+            "SELECT backend, COUNT(*) FROM jobs WHERE status = ? GROUP BY backend", (QUEUED,)
+        ).fetchall())
+        return {
+            "jobs": {status: by_status.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+            "running_by_backend": running,
+            "queued_by_backend": queued,
+            "backend_limits": self.backend_limits,
+            "workers_per_process": self.workers,
+        }
+
+    @staticmethod
+    def _describe(row: sqlite3.Row) -> Dict[str, Any]:
+        job = {
+            "id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "backend": row["backend"],
+            "attempts": row["attempts"],
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+        }
+        if row["status"] == QUEUED and row["not_before"]:
+            job["retry_at"] = row["not_before"]
+        if row["result"]:
+            job["result"] = json.loads(row["result"])
+        if row["error"]:
+            job["error"] = row["error"]
+        if row["callback_url"]:
+            job["callback_status"] = row["callback_status"]
+        return job
+
+    # --------------------------- workers ---------------------------
+
+    def ensure_started(self) -> None:
+        """Cria as threads de trabalho neste processo (idempotente; refeito após fork)"""
+        if self.workers <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._pid = None
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._maintenance()
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.warning("⚠️ Fila de jobs indisponível: %s", e)
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Pega o job de maior prioridade cujo backend ainda tem vaga (transação exclusiva)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = dict(conn.execute(
+                "SELECT backend, COUNT(*) FROM jobs WHERE status = ? GROUP BY backend", (RUNNING,)
+            ).fetchall())
+            full = [b for b, limit in self.backend_limits.items() if running.get(b, 0) >= limit]
+            now = time.time()
+            where = "status = ? AND (not_before IS NULL OR not_before <= ?)"
+            params: list = [QUEUED, now]
+            if full:
+                where += f" AND backend NOT IN ({','.join('?' * len(full))})"
+                params.extend(full)
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE {where} ORDER BY priority DESC, created LIMIT 1", params
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, started = ?, attempts = attempts + 1"
+                " WHERE id = ?",
+                (RUNNING, self._owner(), now + self.lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _run(self, job: sqlite3.Row) -> None:
+        payload = json.loads(job["payload"])
+        try:
+            result = self.handler(payload)
+        except Exception as e:
+            attempts = job["attempts"] + 1
+            # Erros de entrada (ValueError) não melhoram com nova tentativa
+            final = isinstance(e, ValueError) or attempts >= self.max_attempts
+            self._finish(job["id"], FAILED if final else QUEUED, error=str(e),
+                         not_before=None if final else time.time() + self._backoff(attempts))
+            if final:
+                self._finalize(job["id"], payload)
+            return
+        self._finish(job["id"], DONE, result=result)
+        self._finalize(job["id"], payload)
+
+    def _backoff(self, attempts: int) -> float:
+        """Recuo exponencial depois da tentativa número ``attempts``"""
+        return min(self.retry_backoff_max, self.retry_backoff * (2 ** max(0, attempts - 1)))
+
+    def _finalize(self, job_id: str, payload: Dict[str, Any]) -> None:
+        if self.on_finish is not None:
+            try:
+                self.on_finish(payload)
+            except Exception as e:
+                logger.warning("⚠️ Falha ao finalizar job %s: %s", job_id, e)
+        self._notify(job_id)
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, not_before: Optional[float] = None) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, owner = NULL, lease_until = NULL,"
+            " finished = ?, not_before = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+             time.time() if status in (DONE, FAILED) else None, not_before, job_id),
+        )
+
+    def _notify(self, job_id: str) -> None:
+        """POST do estado final do job no callback_url, com algumas tentativas"""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or not row["callback_url"]:
+            return
+        body = json.dumps(self._describe(row), ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Job-Id": job_id}
+        status = "failed"
+        for attempt in range(self.callback_retries):
+            try:
+                # Valida de novo na entrega (o DNS pode ter mudado desde o submit) e conecta no IP validado
+                code = post_callback(row["callback_url"], body, headers, self.callback_timeout,
+                                     self.callback_allowed_hosts)
+                status = f"delivered:{code}"
+                break
+            except ValueError as e:
+                status = f"failed: {e}"
+                break
+            except Exception as e:
+                status = f"failed: {e}"
+                if attempt + 1 < self.callback_retries:
+                    time.sleep(min(30.0, 0.5 * (2 ** attempt)))
+        self._conn().execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job_id))
+
+    def _maintenance(self) -> None:
+        """Devolve à fila jobs órfãos (lease expirado ou processo morto) e apaga jobs antigos"""
+        now = time.time()
+        if now - self._last_maintenance < max(self.poll_interval * 10, 5.0):
+            return
+        self._last_maintenance = now
+        conn = self._conn()
+        host = socket.gethostname()
+        rows = conn.execute(
+            "SELECT id, owner, lease_until, attempts FROM jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        for row in rows:
+            owner_host, _, owner_pid = (row["owner"] or "").rpartition(":")
+            dead = owner_host == host and owner_pid.isdigit() and not _pid_alive(int(owner_pid))
+            expired = row["lease_until"] is not None and row["lease_until"] < now
+            if not (dead or expired):
+                continue
+            status = FAILED if row["attempts"] >= self.max_attempts else QUEUED
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, error = ?,"
+                " finished = CASE WHEN ? = 'failed' THEN ? END, not_before = ? WHERE id = ? AND status = ?",
+                (status, "Job interrompido (processo reiniciado ou tempo esgotado)", status, now,
+                 now + self._backoff(row["attempts"]) if status == QUEUED else None, row["id"], RUNNING),
+            ).rowcount
+            if updated and status == FAILED:
+                payload = conn.execute("SELECT payload FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                self._finalize(row["id"], json.loads(payload["payload"]))
+        if self.retention_seconds:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?",
+                (DONE, FAILED, now - self.retention_seconds),
+            )
@@ -0,0 +1,134 @@
+"""
+Casamento de múltiplas palavras-chave em uma única passada (Aho-Corasick)
+"""
+
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Union
+
+
+class Hit(NamedTuple):
+    term: str
+    lexicon: str
+    category: str
+    weight: float
+    order: int
+
+
+class Matches:
+    """Termos encontrados em um texto, agrupados por léxico na ordem de cadastro"""
+
+    def __init__(self, found: FrozenSet[int], payloads: List[List[Hit]]) -> None:
+        self._by_lexicon: Dict[str, List[Hit]] = {}
+        for term_id in found:
+            for hit in payloads[term_id]:
+                self._by_lexicon.setdefault(hit.lexicon, []).append(hit)
+        for hits in self._by_lexicon.values():
+            hits.sort(key=lambda h: h.order)
+
+    def hits(self, lexicon: str) -> List[Hit]:
+        return self._by_lexicon.get(lexicon, [])
+
+    def terms(self, lexicon: str) -> List[str]:
+        return [h.term for h in self.hits(lexicon)]
+
+    def score(self, lexicon: str) -> float:
+        return sum(h.weight for h in self.hits(lexicon))
+
+
+# Léxico simples: {termo: peso}; com categorias: {categoria: {termo: peso}} ou {categoria: [termos]}
+Lexicon = Mapping[str, Union[float, Iterable[str], Mapping[str, float]]]
+
+
+class KeywordMatcher:
+    """Autômato Aho-Corasick com todos os léxicos; ``scan`` percorre o texto uma vez
+
+    O custo da busca depende do tamanho do texto, não da quantidade de termos.
+    Termos casam como substring (mesma semântica de ``kw in texto``).
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[int]] = [[]]
+        self._term_ids: Dict[str, int] = {}
+        self._payloads: List[List[Hit]] = []
+        self._order = 0
+        self._built = False
+
+    def add_lexicon(self, name: str, lexicon: Lexicon, default_weight: float = 1.0) -> "KeywordMatcher":
+        for key, value in lexicon.items():
+            if isinstance(value, (int, float)):
+                self.add(key, name, name, float(value))
+            elif isinstance(value, Mapping):
+                for term, weight in value.items():
+                    self.add(term, name, key, float(weight))
+            else:
+                for term in value:
+                    self.add(term, name, key, default_weight)
+        return self
+
+    def add_terms(self, name: str, terms: Iterable[str], weight: float = 1.0) -> "KeywordMatcher":
+        for term in terms:
+            self.add(term, name, name, weight)
+        return self
+
+    def add(self, term: str, lexicon: str, category: str, weight: float = 1.0) -> None:
+        term = term.lower()
+        if not term:
+            return
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._payloads)
+            self._term_ids[term] = term_id
+            self._payloads.append([])
+            state = 0
+            for ch in term:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append(term_id)
+        self._payloads[term_id].append(Hit(term, lexicon, category, weight, self._order))
+        self._order += 1
+        self._built = False
+
+    def build(self) -> "KeywordMatcher":
+        """Calcula links de falha e transforma o trie em um DFA completo"""
+        fail = [0] * len(self._goto)
+        delta: List[Dict[str, int]] = [dict(edges) for edges in self._goto]
+        out = [list(ids) for ids in self._out]
+        queue = deque(delta[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in self._goto[f]:
+                    f = fail[f]
+                fail[nxt] = self._goto[f].get(ch, 0)
+                out[nxt].extend(out[fail[nxt]])
+            # Herda transições do estado de falha: cada caractere vira um único lookup
+            for ch, target in delta[fail[state]].items():
+                delta[state].setdefault(ch, target)
+        self._delta = delta
+        self._out_final = [tuple(ids) for ids in out]
+        self._built = True
+        return self
+
+    def scan(self, text: str) -> Matches:
+        """Encontra todos os termos presentes em ``text`` (que deve estar em minúsculas)"""
+        if not self._built:
+            self.build()
+        delta, out = self._delta, self._out_final
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return Matches(frozenset(found), self._payloads)
+
+    def __len__(self) -> int:
+        return len(self._payloads)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Classificador linear local: TF-IDF com hashing de features + regressão logística (NumPy)
+
+Uso:
+    python linear_classifier.py rotular --entrada emails.jsonl --saida rotulados.jsonl   # rótulos via OpenAI
+    python linear_classifier.py treinar --dados rotulados.jsonl --saida models/linear.npz
+    python linear_classifier.py avaliar --dados teste.jsonl --metodos linear,heuristic,openai
+
+Os arquivos JSONL têm um objeto por linha com o texto (``email_text``/``body``)
+e, para treino/avaliação, a categoria (``categoria``: "Produtivo" ou "Improdutivo").
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+POSITIVE = "Produtivo"
+NEGATIVE = "Improdutivo"
+
+
+def _hash(feature: str) -> int:
+    # crc32 é estável entre processos (hash() do Python não é)
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class HashedTfidf:
+    """Unigramas + bigramas em ``n_features`` posições via hashing; TF sublinear, IDF e norma L2"""
+
+    def __init__(self, n_features: int = 2 ** 18, idf: Optional[np.ndarray] = None) -> None:
+        self.n_features = n_features
+        self.idf = idf
+
+    def _row(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        tokens = text.split()
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        mask = self.n_features - 1
+        idx = np.fromiter((_hash(f) & mask for f in features), dtype=np.int64, count=len(features))
+        cols, tf = np.unique(idx, return_counts=True)
+        return cols, (1.0 + np.log(tf)).astype(np.float32)
+
+    def transform(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Matriz esparsa no formato CSR: (indptr, indices, data)"""
+        rows = [self._row(t) for t in texts]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(c) for c, _ in rows])
+        indices = np.concatenate([c for c, _ in rows]) if rows else np.empty(0, dtype=np.int64)
+        data = np.concatenate([d for _, d in rows]) if rows else np.empty(0, dtype=np.float32)
+        if self.idf is not None:
+            data = data * self.idf[indices]
+        # Normalização L2 por linha
+        row_ids = np.repeat(np.arange(len(rows)), np.diff(indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=data * data, minlength=len(rows)))
+        norms[norms == 0] = 1.0
+        data = (data / norms[row_ids]).astype(np.float32)
+        return indptr, indices, data
+
+    def fit_idf(self, texts: Sequence[str]) -> None:
+        df = np.zeros(self.n_features, dtype=np.float64)
+        for text in texts:
+            cols, _ = self._row(text)
+            df[cols] += 1
+        n = len(texts)
+        self.idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+
+
+class LinearEmailClassifier:
+    """Regressão logística sobre TF-IDF com hashing; pontua lotes inteiros de forma vetorizada"""
+
+    def __init__(self, n_features: int = 2 ** 18) -> None:
+        self.vectorizer = HashedTfidf(n_features)
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+
+    # -- inferência --
+
+    def decision_function(self, preprocessed: Sequence[str]) -> np.ndarray:
+        indptr, indices, data = self.vectorizer.transform(preprocessed)
+        row_ids = np.repeat(np.arange(len(preprocessed)), np.diff(indptr))
+        return np.bincount(row_ids, weights=self.weights[indices] * data, minlength=len(preprocessed)) + self.bias
+
+    def predict_proba(self, preprocessed: Sequence[str]) -> np.ndarray:
+        """Probabilidade de cada e-mail (já pré-processado) ser Produtivo"""
+        return 1.0 / (1.0 + np.exp(-self.decision_function(preprocessed)))
+
+    # -- treino --
+
+    def fit(self, preprocessed: Sequence[str], labels: Sequence[int], epochs: int = 30,
+            learning_rate: float = 0.05, l2: float = 1e-4, batch_size: int = 256, seed: int = 0) -> "LinearEmailClassifier":
+        """Gradiente descendente em mini-lotes (Adam) sobre a matriz esparsa"""
+        self.vectorizer.fit_idf(preprocessed)
+        indptr, indices, data = self.vectorizer.transform(preprocessed)
+        y = np.asarray(labels, dtype=np.float64)
+        n = len(y)
+        n_features = self.vectorizer.n_features
+        w = np.zeros(n_features, dtype=np.float64)
+        b = 0.0
+        m_w, v_w = np.zeros_like(w), np.zeros_like(w)
+        m_b = v_b = 0.0
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        rng = np.random.default_rng(seed)
+        step = 0
+        for _ in range(epochs):
+            order = rng.permutation(n)
+            for start in range(0, n, batch_size):
+                batch = order[start:start + batch_size]
+                # Fatia as linhas do lote na CSR
+                lengths = indptr[batch + 1] - indptr[batch]
+                take = np.concatenate([np.arange(indptr[i], indptr[i + 1]) for i in batch]) if len(batch) else np.empty(0, dtype=np.int64)
+                cols, vals = indices[take], data[take]
+                rows = np.repeat(np.arange(len(batch)), lengths)
+                z = np.bincount(rows, weights=w[cols] * vals, minlength=len(batch)) + b
+                p = 1.0 / (1.0 + np.exp(-z))
+                err = p - y[batch]
+                g_w = np.bincount(cols, weights=vals * err[rows], minlength=n_features) / len(batch) + l2 * w
+                g_b = err.mean()
+                step += 1
+                m_w = beta1 * m_w + (1 - beta1) * g_w
+                v_w = beta2 * v_w + (1 - beta2) * g_w * g_w
+                m_b = beta1 * m_b + (1 - beta1) * g_b
+                v_b = beta2 * v_b + (1 - beta2) * g_b * g_b
+                corr1, corr2 = 1 - beta1 ** step, 1 - beta2 ** step
+                w -= learning_rate * (m_w / corr1) / (np.sqrt(v_w / corr2) + eps)
+                b -= learning_rate * (m_b / corr1) / (math.sqrt(v_b / corr2) + eps)
+        self.weights = w.astype(np.float32)
+        self.bias = float(b)
+        return self
+
+    # -- persistência --
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=np.float32(self.bias),
+            idf=self.vectorizer.idf,
+            n_features=np.int64(self.vectorizer.n_features),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LinearEmailClassifier":
+        with np.load(path) as arrays:
+            model = cls(int(arrays["n_features"]))
+            model.weights = arrays["weights"].astype(np.float32)
+            model.bias = float(arrays["bias"])
+            model.vectorizer.idf = arrays["idf"].astype(np.float32)
+        return model
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def load_labeled(path: str) -> Tuple[List[str], List[int]]:
+    from batch_io import email_from_record
+
+    texts, labels = [], []
+    for record in read_jsonl(path):
+        label = record.get("categoria") or record.get("label")
+        text = email_from_record(record)
+        if text and label in (POSITIVE, NEGATIVE):
+            texts.append(text)
+            labels.append(1 if label == POSITIVE else 0)
+    return texts, labels
+
+
+def binary_metrics(y_true: Sequence[int], y_pred: Sequence[int]) -> Dict[str, float]:
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    tp = int(((y_true == 1) & (y_pred == 1)).sum())
+    fp = int(((y_true == 0) & (y_pred == 1)).sum())
+    fn = int(((y_true == 1) & (y_pred == 0)).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    accuracy = float((y_true == y_pred).mean()) if len(y_true) else 0.0
+    return {"accuracy": accuracy, "precision": precision, "recall": recall, "f1": f1}
+
+
+def cmd_train(args: argparse.Namespace) -> None:
+    from preprocessing import Preprocessor
+
+    texts, labels = load_labeled(args.dados)
+    if not texts:
+        sys.exit("Nenhum exemplo rotulado encontrado.")
+    preprocessed = Preprocessor().preprocess_many(texts)
+    started = time.perf_counter()
+    model = LinearEmailClassifier(2 ** args.bits).fit(preprocessed, labels, epochs=args.epocas)
+    elapsed = time.perf_counter() - started
+    model.save(args.saida)
+    train_metrics = binary_metrics(labels, (model.predict_proba(preprocessed) >= 0.5).astype(int))
+    size_kb = os.path.getsize(args.saida) / 1024
+    print(f"✅ Treinado com {len(texts)} e-mails em {elapsed:.2f}s -> {args.saida} ({size_kb:.0f} KB)")
+    print(f"   Treino: acurácia {train_metrics['accuracy']:.3f}, F1 {train_metrics['f1']:.3f}")
+
+
+def cmd_evaluate(args: argparse.Namespace) -> None:
+    texts, labels = load_labeled(args.dados)
+    if not texts:
+        sys.exit("Nenhum exemplo rotulado encontrado.")
+
+    print(f"{'método':<12} {'e-mails/s':>10} {'acurácia':>9} {'F1':>6}")
+    for method in args.metodos.split(","):
+        started = time.perf_counter()
+        if method == "linear":
+            from preprocessing import Preprocessor
+            model = LinearEmailClassifier.load(args.modelo)
+            proba = model.predict_proba(Preprocessor().preprocess_many(texts))
+            preds = (proba >= args.limiar).astype(int).tolist()
+        else:
+            import app
+            classify = {
+                "heuristic": app.heuristic_classification,
+                "huggingface": app.classify_with_huggingface,
+                "openai": app.classify_and_respond_with_openai,
+            }[method]
+            preds = [int(classify(t, app.basic_preprocess(t))["categoria"] == POSITIVE) for t in texts]
+        elapsed = time.perf_counter() - started
+        m = binary_metrics(labels, preds)
+        print(f"{method:<12} {len(texts) / elapsed:>10.1f} {m['accuracy']:>9.3f} {m['f1']:>6.3f}")
+
+
+def cmd_label(args: argparse.Namespace) -> None:
+    """Colhe rótulos da OpenAI para montar um conjunto de treino"""
+    import app
+    from batch_io import email_from_record
+
+    if not os.getenv("OPENAI_API_KEY"):
+        sys.exit("Defina OPENAI_API_KEY (no ambiente ou no .env) para rotular com a OpenAI.")
+    records = list(read_jsonl(args.entrada))
+    texts = [email_from_record(r) for r in records]
+    # Só a categoria interessa: prompt de classificação e poucos tokens (sem gerar respostas)
+    batch = [app.build_openai_messages(t, with_reply=False) for t in texts]
+    results = app.openai_runner.run_many(batch, app.OPENAI_MODEL, temperature=0.0, max_tokens=80)
+    kept = 0
+    with open(args.saida, "w", encoding="utf-8") as out:
+        for record, text, result in zip(records, texts, results):
+            if isinstance(result, Exception):
+                continue
+            try:
+                parsed = app.parse_openai_content(result.choices[0].message.content or "{}")
+            except json.JSONDecodeError:
+                continue
+            out.write(json.dumps({"id": record.get("id"), "email_text": text,
+                                  "categoria": parsed["categoria"], "fonte": "openai"}, ensure_ascii=False) + "\n")
+            kept += 1
+    print(f"✅ {kept}/{len(records)} e-mails rotulados via OpenAI -> {args.saida}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("treinar", help="treina e salva o modelo")
+    p.add_argument("--dados", required=True)
+    p.add_argument("--saida", default="models/linear.npz")
+    p.add_argument("--bits", type=int, default=18, help="2^bits features")
+    p.add_argument("--epocas", type=int, default=30)
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("avaliar", help="compara o modelo com os outros métodos")
+    p.add_argument("--dados", required=True)
+    p.add_argument("--modelo", default="models/linear.npz")
+    p.add_argument("--metodos", default="linear,heuristic")
+    p.add_argument("--limiar", type=float, default=0.5)
+    p.set_defaults(func=cmd_evaluate)
+
+    p = sub.add_parser("rotular", help="rotula e-mails com a OpenAI para treino")
+    p.add_argument("--entrada", required=True)
+    p.add_argument("--saida", required=True)
+    p.set_defaults(func=cmd_label)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Leitura em streaming de caixas de e-mail (mbox, Maildir, .eml) e classificação em paralelo
+
+As mensagens são lidas uma a uma (um mbox de vários GB não é carregado em
+memória), decodificadas (partes MIME, charsets, HTML -> texto, PDFs anexados)
+e classificadas por um pool de processos com o modelo carregado em cada um.
+No máximo ``max_in_flight`` mensagens ficam pendentes: se os classificadores
+ficam para trás, a leitura espera.
+
+Uso:
+    python mail_ingest.py caixa.mbox --saida resultados.jsonl
+    python mail_ingest.py ~/Maildir mensagens/*.eml --processos 4 --sem-resposta
+    python mail_ingest.py caixa.mbox --processos 0     # threads no próprio processo (ex.: OpenAI)
+
+Saída: uma linha JSON por e-mail, como em ``/process/batch``, com ``id``
+``arquivo#posição`` (mbox) ou o caminho da mensagem (Maildir/.eml).
+"""
+
+import argparse
+import email
+import io
+import json
+import os
+import re
+import sys
+import time
+from email.header import decode_header, make_header
+from email.message import Message
+from html.parser import HTMLParser
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from batch_io import BatchItem
+
+# (id, bytes da mensagem, erro) - exatamente um entre bytes e erro é preenchido
+RawMessage = Tuple[str, Optional[bytes], Optional[str]]
+
+MAX_MESSAGE_BYTES = 25 * 1024 * 1024
+MAX_CHARS = 20_000
+FALLBACK_CHARSETS = ("utf-8", "cp1252")
+MBOX_ESCAPED_FROM = re.compile(rb"^>+From ")
+
+
+# ---------------------------------------------------------------------------
+# Fontes: mensagens cruas, uma por vez
+# ---------------------------------------------------------------------------
+
+def iter_mbox(fileobj: BinaryIO, name: str = "mbox", max_bytes: int = MAX_MESSAGE_BYTES) -> Iterator[RawMessage]:
+    """Separa as mensagens de um mbox pelas linhas ``From `` lendo linha a linha
+
+    Desfaz o escape ``>From `` (mboxrd). Mensagens acima de ``max_bytes``
+    viram erro, sem acumular o resto em memória.
+    """
+    index = 0
+    lines: List[bytes] = []
+    size = 0
+    too_big = False
+    previous_blank = True
+
+    def finish() -> RawMessage:
+        item_id = f"{name}#{index}"
+        if too_big:
+            return item_id, None, f"Mensagem maior que {max_bytes // (1024 * 1024)} MB"
+        return item_id, b"".join(lines), None
+
+    for line in fileobj:
+        if previous_blank and line.startswith(b"From "):
+            if index:
+                yield finish()
+            index += 1
+            lines, size, too_big = [], 0, False
+            previous_blank = False
+            continue
+        previous_blank = not line.strip()
+        if not index or too_big:
+            continue  # lixo antes da primeira mensagem, ou mensagem já descartada
+        if MBOX_ESCAPED_FROM.match(line):
+            line = line[1:]
+        size += len(line)
+        if max_bytes and size > max_bytes:
+            too_big, lines = True, []
+            continue
+        lines.append(line)
+    if index:
+        yield finish()
+
+
+def _read_message_file(path: str, item_id: str, max_bytes: int) -> RawMessage:
+    try:
+        if max_bytes and os.path.getsize(path) > max_bytes:
+            return item_id, None, f"Mensagem maior que {max_bytes // (1024 * 1024)} MB"
+        with open(path, "rb") as f:
+            return item_id, f.read(), None
+    except OSError as e:
+        return item_id, None, f"Falha ao ler {path}: {e}"
+
+
+def iter_maildir(path: str, max_bytes: int = MAX_MESSAGE_BYTES) -> Iterator[RawMessage]:
+    """Mensagens de ``new/`` e ``cur/`` (``tmp/`` são entregas incompletas), em ordem de nome"""
+    for sub in ("new", "cur"):
+        folder = os.path.join(path, sub)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            full = os.path.join(folder, filename)
+            if os.path.isfile(full):
+                yield _read_message_file(full, full, max_bytes)
+
+
+def is_maildir(path: str) -> bool:
+    return all(os.path.isdir(os.path.join(path, sub)) for sub in ("cur", "new"))
+
+
+def is_mbox(path: str) -> bool:
+    if path.lower().endswith(".eml"):
+        return False
+    if path.lower().endswith(".mbox"):
+        return True
+    with open(path, "rb") as f:
+        return f.read(5) == b"From "
+
+
+def iter_source(path: str, max_bytes: int = MAX_MESSAGE_BYTES) -> Iterator[RawMessage]:
+    """Detecta o formato: diretório Maildir, arquivo mbox, arquivo .eml ou pasta com vários deles"""
+    if os.path.isdir(path):
+        if is_maildir(path):
+            yield from iter_maildir(path, max_bytes)
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if is_maildir(root):
+                dirs[:] = []
+                yield from iter_maildir(root, max_bytes)
+                continue
+            for filename in sorted(files):
+                if filename.lower().endswith((".eml", ".mbox")):
+                    yield from iter_source(os.path.join(root, filename), max_bytes)
+        return
+    try:
+        mbox = is_mbox(path)
+    except OSError as e:
+        yield path, None, f"Falha ao ler {path}: {e}"
+        return
+    if mbox:
+        with open(path, "rb") as f:
+            yield from iter_mbox(f, path, max_bytes)
+    else:
+        yield _read_message_file(path, path, max_bytes)
+
+
+def iter_sources(paths: Iterable[str], max_bytes: int = MAX_MESSAGE_BYTES) -> Iterator[RawMessage]:
+    for path in paths:
+        yield from iter_source(path, max_bytes)
+
+
+# ---------------------------------------------------------------------------
+# MIME -> texto
+# ---------------------------------------------------------------------------
+
+class _HTMLText(HTMLParser):
+    SKIP = {"script", "style", "head", "title", "noscript"}
+    BLOCK = {"p", "div", "br", "li", "tr", "table", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "hr"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Texto visível de um corpo HTML (sem scripts/estilos, quebras nos blocos)"""
+    parser = _HTMLText()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass  # HTML malformado: fica o que já foi lido
+    lines = (re.sub(r"[ \t\r\f\v\xa0]+", " ", line).strip() for line in "".join(parser.parts).split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def decode_header_value(value: Optional[str]) -> str:
+    """Cabeçalho com ``=?charset?...?=`` (RFC 2047) em texto"""
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(value))).strip()
+    except Exception:
+        return str(value).strip()
+
+
+def decode_part(part: Message) -> str:
+    """Conteúdo de uma parte de texto, decodificado pelo charset declarado (ou os mais comuns)"""
+    payload = part.get_payload(decode=True) or b""
+    declared = part.get_content_charset()
+    for charset in ((declared,) if declared else ()) + FALLBACK_CHARSETS:
+        try:
+            return payload.decode(charset)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return payload.decode("utf-8", errors="replace")
+
+
+def pdf_bytes_text(data: bytes, max_pages: int = 20, max_chars: int = 20_000) -> str:
+    """Extrai um PDF anexado na própria thread (os workers de ingestão já são processos separados)"""
+    from pdf_extraction import extract_pdf_text, spill_to_tempfile
+
+    path = spill_to_tempfile(io.BytesIO(data), suffix=".pdf")
+    try:
+        return extract_pdf_text(path, max_pages, max_chars)
+    finally:
+        os.unlink(path)
+
+
+def message_text(raw: bytes, extract_pdf: Optional[Callable[[bytes], str]] = pdf_bytes_text,
+                 max_chars: int = MAX_CHARS) -> str:
+    """Assunto + corpo (text/plain, ou o HTML convertido) + texto dos PDFs anexados"""
+    msg = email.message_from_bytes(raw)
+    plain: List[str] = []
+    html: List[str] = []
+    attachments: List[str] = []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        ctype = part.get_content_type()
+        filename = decode_header_value(part.get_filename())
+        if ctype == "application/pdf" or filename.lower().endswith(".pdf"):
+            if extract_pdf is None:
+                continue
+            try:
+                text = extract_pdf(part.get_payload(decode=True) or b"").strip()
+            except Exception:
+                continue  # anexo corrompido não impede classificar o corpo
+            if text:
+                attachments.append(f"[Anexo: {filename or 'documento.pdf'}]\n{text}")
+        elif part.get_content_disposition() == "attachment":
+            continue
+        elif ctype == "text/plain":
+            plain.append(decode_part(part).strip())
+        elif ctype == "text/html":
+            html.append(html_to_text(decode_part(part)))
+
+    body = "\n\n".join(p for p in plain if p) or "\n\n".join(h for h in html if h)
+    text = "\n\n".join(p for p in [body] + attachments if p)
+    subject = decode_header_value(msg.get("Subject"))
+    if subject:
+        # Mesmo formato de batch_io.email_from_record
+        text = f"Assunto: {subject}\n\n{text}" if text else subject
+    return text[:max_chars] if max_chars else text
+
+
+def iter_mail_items(messages: Iterable[RawMessage], extract_pdf: Optional[Callable[[bytes], str]] = pdf_bytes_text,
+                    max_chars: int = MAX_CHARS) -> Iterator[BatchItem]:
+    """Mensagens cruas -> itens de ``batch_io.classify_stream`` (decodificação na thread que consome)"""
+    for item_id, raw, error in messages:
+        if error is not None:
+            yield item_id, None, error
+            continue
+        try:
+            text = message_text(raw, extract_pdf, max_chars).strip()
+        except Exception as e:
+            yield item_id, None, f"Mensagem inválida: {e}"
+            continue
+        if not text:
+            yield item_id, None, "Mensagem sem texto extraível"
+            continue
+        yield item_id, text, None
+
+
+# ---------------------------------------------------------------------------
+# Classificação: leitura no processo principal, decodificação + classificação nos workers
+# ---------------------------------------------------------------------------
+
+def classify_messages(messages: Iterable[RawMessage], workers: Optional[int] = None,
+                      max_in_flight: Optional[int] = None, with_reply: bool = True,
+                      use_cache: bool = True, chunk_size: int = 16) -> Iterator[Dict[str, Any]]:
+    """Decodifica e classifica as mensagens no pool de ``batch_classify``; resultados na ordem em que terminam"""
+    from batch_classify import classify_parallel
+
+    items = ((seq, item_id, "message", raw, error) for seq, (item_id, raw, error) in enumerate(messages))
+    for _, line in classify_parallel(items, workers, max_in_flight, with_reply, use_cache, chunk_size):
+        yield line
+
+
+def main() -> None:
+    try:
+        from config import INGEST_WORKERS, INGEST_MAX_IN_FLIGHT, MAIL_MAX_MESSAGE_BYTES
+    except ImportError:
+        INGEST_WORKERS, INGEST_MAX_IN_FLIGHT, MAIL_MAX_MESSAGE_BYTES = None, None, MAX_MESSAGE_BYTES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("caminhos", nargs="+", help="arquivos mbox/.eml ou diretórios Maildir")
+    parser.add_argument("--saida", default=None, help="arquivo JSONL (padrão: saída padrão)")
+    parser.add_argument("--processos", type=int, default=INGEST_WORKERS,
+                        help="workers de classificação (padrão: nº de CPUs; 0 = threads)")
+    parser.add_argument("--em-voo", type=int, default=INGEST_MAX_IN_FLIGHT,
+                        help="mensagens pendentes no máximo (padrão: 2 grupos por processo)")
+    parser.add_argument("--grupo", type=int, default=16, help="mensagens enviadas juntas a cada processo")
+    parser.add_argument("--sem-resposta", action="store_true",
+                        help="só classifica; com HISTORY_BACKEND = \"sqlite\" cada linha traz classificacao_id "
+                             "para POST /reply/<id> num servidor com o mesmo HISTORY_DB_PATH")
+    parser.add_argument("--sem-cache", action="store_true")
+    args = parser.parse_args()
+
+    if args.sem_resposta:
+        from batch_classify import classification_store_note
+
+        print(classification_store_note(), file=sys.stderr)
+    out = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+    started = time.perf_counter()
+    done = errors = 0
+    try:
+        messages = iter_sources(args.caminhos, MAIL_MAX_MESSAGE_BYTES)
+        for line in classify_messages(messages, args.processos, args.em_voo,
+                                      with_reply=not args.sem_resposta, use_cache=not args.sem_cache,
+                                      chunk_size=args.grupo):
+            out.write(json.dumps(line, ensure_ascii=False) + "\n")
+            done += 1
+            errors += "error" in line
+            if done % 500 == 0:
+                rate = done / (time.perf_counter() - started)
+                print(f"📬 {done} e-mails ({rate:.1f}/s, {errors} com erro)", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ {done} e-mails em {elapsed:.1f} s ({done / elapsed if elapsed else 0:.1f}/s, {errors} com erro)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
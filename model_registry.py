@@ -0,0 +1,97 @@
+"""
+Registro de modelos carregados uma única vez por processo
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def current_rss_mb() -> float:
+    """Memória residente (RSS) atual do processo em MB"""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss é o pico (KB no Linux, bytes no macOS); melhor que nada
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
+        return 0.0
+
+
+class _ModelEntry:
+    def __init__(self, loader: Callable[[], Any], warmup_input: Optional[str]) -> None:
+        self.loader = loader
+        self.warmup_input = warmup_input
+        self.model: Any = None
+        self.lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.rss_delta_mb: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class ModelRegistry:
+    """Carrega modelos sob demanda, uma vez por processo, e os compartilha entre threads"""
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], warmup_input: Optional[str] = None) -> None:
+        self._entries[name] = _ModelEntry(loader, warmup_input)
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.model is not None
+
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Modelo não registrado: {name}")
+        if entry.model is not None:
+            return entry.model
+
+        # Double-checked locking: só uma thread carrega, as outras esperam
+        with entry.lock:
+            if entry.model is None:
+                rss_before = current_rss_mb()
+                started = time.perf_counter()
+                try:
+                    model = entry.loader()
+                except Exception as exc:
+                    entry.error = str(exc)
+                    raise
+                entry.load_seconds = time.perf_counter() - started
+                entry.rss_delta_mb = current_rss_mb() - rss_before
+                entry.loaded_at = time.time()
+                entry.error = None
+                entry.model = model
+        return entry.model
+
+    def prewarm(self, name: str) -> None:
+        """Carrega o modelo e roda uma inferência fictícia para aquecer caches"""
+        entry = self._entries[name]
+        model = self.get(name)
+        if entry.warmup_input is not None:
+            started = time.perf_counter()
+            model(entry.warmup_input)
+            entry.warmup_seconds = time.perf_counter() - started
+
+    def describe(self) -> Dict[str, Any]:
+        models = {}
+        for name, entry in self._entries.items():
+            models[name] = {
+                "loaded": entry.model is not None,
+                "load_seconds": entry.load_seconds,
+                "warmup_seconds": entry.warmup_seconds,
+                "rss_delta_mb": entry.rss_delta_mb,
+                "loaded_at": entry.loaded_at,
+                "error": entry.error,
+            }
+        return {"pid": os.getpid(), "rss_mb": round(current_rss_mb(), 1), "models": models}
@@ -0,0 +1,182 @@
+"""
+Índice de quase-duplicatas (MinHash + LSH) para reaproveitar classificações de e-mails-modelo
+
+Muitos e-mails são o mesmo modelo com outro nome, data ou número de chamado.
+Cada e-mail vira uma assinatura MinHash de ``num_perm`` valores sobre as
+features do pré-processamento (unigramas + bigramas); a fração de valores
+iguais entre duas assinaturas estima a similaridade de Jaccard. A busca usa
+LSH por faixas: só assinaturas que coincidem em alguma faixa inteira são
+comparadas. O número de linhas por faixa é escolhido para que um par no
+limiar vire candidato com probabilidade de pelo menos 99%.
+
+Memória limitada a ``max_entries`` assinaturas (LRU), 2 bytes por permutação.
+O numpy só é importado na primeira assinatura.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SEED = 20240601
+_perm_cache: Dict[int, Tuple["np.ndarray", "np.ndarray"]] = {}
+
+
+def features(tokens: Sequence[str]) -> Set[str]:
+    feats = set(tokens)
+    feats.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return feats
+
+
+def _permutations(num_perm: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Parâmetros (a ímpar, b) do hashing multiply-shift; fixos (semente) para valer entre processos"""
+    import numpy as np
+
+    params = _perm_cache.get(num_perm)
+    if params is None:
+        rng = np.random.default_rng(SEED)
+        a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        params = _perm_cache[num_perm] = (a, b)
+    return params
+
+
+def minhash(tokens: Sequence[str], num_perm: int = 128) -> "np.ndarray":
+    """Assinatura (uint16): para cada "permutação", o menor hash entre as features
+
+    Cada feature vira um crc32 (estável entre processos); as permutações são
+    ``(a * x + b) mod 2^64`` com os 16 bits mais altos, calculadas de uma vez.
+    """
+    import numpy as np
+
+    a, b = _permutations(num_perm)
+    feats = features(tokens)
+    if not feats:
+        return np.full(num_perm, 0xFFFF, dtype=np.uint16)
+    x = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint64, count=len(feats))
+    hashed = (x[:, None] * a[None, :] + b[None, :]) >> np.uint64(48)  # estouro de uint64 = mod 2^64
+    return hashed.min(axis=0).astype(np.uint16)
+
+
+def estimate_jaccard(a: "np.ndarray", b: "np.ndarray") -> float:
+    return float((a == b).sum()) / len(a)
+
+
+def lsh_rows(threshold: float, num_perm: int, min_recall: float = 0.99) -> int:
+    """Maior nº de linhas por faixa (menos candidatos falsos) que ainda acha um par no limiar"""
+    best = 1
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1.0 - (1.0 - threshold ** rows) ** bands >= min_recall:
+            best = rows
+        else:
+            break
+    return best
+
+
+class NearDuplicateIndex:
+    """Assinaturas MinHash -> classificação, com busca LSH e despejo LRU
+
+    ``namespace`` separa métodos/modelos (uma classificação heurística não
+    serve para quem configurou a OpenAI).
+    """
+
+    def __init__(self, threshold: float = 0.5, max_entries: int = 10_000, min_tokens: int = 8,
+                 num_perm: int = 128) -> None:
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold deve estar em (0, 1]")
+        self.threshold = threshold
+        self.max_entries = max(1, int(max_entries))
+        self.min_tokens = min_tokens
+        self.num_perm = num_perm
+        self.rows = lsh_rows(threshold, num_perm)
+        self.bands = num_perm // self.rows
+        self._entries: "OrderedDict[int, Tuple[str, np.ndarray, Dict[str, Any]]]" = OrderedDict()
+        self._tables: List[Dict[Tuple[str, bytes], Set[int]]] = [{} for _ in range(self.bands)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.candidates = 0
+
+    def _keys(self, namespace: str, signature: "np.ndarray") -> List[Tuple[str, bytes]]:
+        r = self.rows
+        return [(namespace, signature[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def lookup(self, tokens: Sequence[str], namespace: str = "") -> Optional[Tuple[Dict[str, Any], float]]:
+        """Classificação guardada mais parecida acima do limiar, e a similaridade estimada; senão None"""
+        if len(tokens) < self.min_tokens:
+            with self._lock:
+                self.skipped += 1
+            return None
+        signature = minhash(tokens, self.num_perm)
+        keys = self._keys(namespace, signature)
+        with self._lock:
+            self.lookups += 1
+            ids: Set[int] = set()
+            for table, key in zip(self._tables, keys):
+                ids.update(table.get(key, ()))
+            self.candidates += len(ids)
+            best_id, best_similarity = None, self.threshold
+            for entry_id in ids:
+                score = estimate_jaccard(self._entries[entry_id][1], signature)
+                if score >= best_similarity:
+                    best_id, best_similarity = entry_id, score
+            if best_id is None:
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2], best_similarity
+
+    def add(self, tokens: Sequence[str], data: Dict[str, Any], namespace: str = "") -> bool:
+        if len(tokens) < self.min_tokens:
+            return False
+        signature = minhash(tokens, self.num_perm)
+        keys = self._keys(namespace, signature)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, signature, data)
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                old_id, (old_ns, old_sig, _) = self._entries.popitem(last=False)
+                for table, key in zip(self._tables, self._keys(old_ns, old_sig)):
+                    bucket = table.get(key)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del table[key]
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "num_perm": self.num_perm,
+                "lsh_bands": self.bands,
+                "lsh_rows": self.rows,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "reuse_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "skipped_short": self.skipped,
+                "evictions": self.evictions,
+                "avg_candidates": round(self.candidates / self.lookups, 2) if self.lookups else 0.0,
+            }
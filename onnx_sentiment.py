@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Modelo de sentimento exportado para ONNX com quantização dinâmica int8, para inferência em CPU
+
+A exportação roda uma vez (precisa de torch, transformers, onnx e onnxruntime)
+e fica em cache em ``HF_ONNX_DIR``. Para servir bastam onnxruntime, tokenizers
+e numpy: o worker não importa torch. Na exportação os scores de "1 star" ...
+"5 stars" são comparados com o modelo PyTorch original; o artefato só é usado
+se a maior diferença ficar dentro da tolerância.
+
+Uso:
+    python onnx_sentiment.py exportar
+    python onnx_sentiment.py validar --tolerancia 0.02
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+META_FILE = "meta.json"
+MAX_LENGTH = 512
+# Amostras da validação: e-mails curtos e longos, PT e EN, produtivos e não
+VALIDATION_TEXTS = [
+    "Olá, gostaria de agendar uma reunião para discutir o projeto de desenvolvimento do sistema.",
+    "Preciso do status do relatório que enviei ontem. Podemos alinhar o cronograma?",
+    "Bom dia, envio em anexo a proposta comercial para análise.",
+    "Ganhe dinheiro fácil! Oferta imperdível de investimento em criptomoedas!",
+    "Promoção especial! Desconto de 50% em todos os produtos!",
+    "Feliz aniversário! Tudo de bom para você.",
+    "The invoice is overdue and the client is very unhappy with the delay.",
+    "Thanks a lot, the presentation was excellent!",
+    "Prezados, segue o cronograma revisado. " * 60,
+]
+
+
+def runtime_available() -> bool:
+    """onnxruntime e tokenizers instalados (o suficiente para servir um artefato já exportado)"""
+    return all(importlib.util.find_spec(name) is not None for name in ("onnxruntime", "tokenizers"))
+
+
+def artifact_dir(cache_dir: str, model_name: str, quantize: bool = True) -> str:
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name)
+    return os.path.join(cache_dir, slug + ("-int8" if quantize else "-fp32"))
+
+
+def read_meta(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class OnnxSentimentPipeline:
+    """Mesma interface da ``pipeline("sentiment-analysis", return_all_scores=True)`` usada no app
+
+    ``pipe(textos)`` devolve, para cada texto, a lista ``[{"label", "score"}, ...]``
+    com todos os rótulos.
+    """
+
+    def __init__(self, directory: str, threads: int = 0) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        meta = read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"Artefato ONNX não encontrado em {directory}")
+        self.directory = directory
+        self.meta = meta
+        self.labels: List[str] = meta["labels"]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(directory, meta["arquivo"]), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {inp.name for inp in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=meta.get("max_length", MAX_LENGTH))
+        self.tokenizer.enable_padding(pad_id=meta["pad_id"], pad_token=meta["pad_token"])
+        # Cópia sem truncar/padding para dividir e-mails longos em janelas (chunking.py)
+        self._offsets_tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self._offsets_tokenizer.no_truncation()
+        self._offsets_tokenizer.no_padding()
+
+    def token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        return self._offsets_tokenizer.encode(text, add_special_tokens=False).offsets
+
+    def scores(self, texts: Sequence[str]) -> np.ndarray:
+        """Probabilidades (n_textos x n_rótulos)"""
+        encodings = self.tokenizer.encode_batch(list(texts))
+        feed = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64)}
+        if "attention_mask" in self.input_names:
+            feed["attention_mask"] = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = self.session.run(["logits"], feed)[0]
+        return softmax(logits.astype(np.float32))
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: Optional[int] = None,
+                 truncation: bool = True, **_: Any) -> List[List[Dict[str, Any]]]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        if not texts:
+            return []
+        return [
+            [{"label": label, "score": float(score)} for label, score in zip(self.labels, row)]
+            for row in self.scores(texts)
+        ]
+
+
+def torch_scores(model: Any, tokenizer: Any, texts: Sequence[str]) -> np.ndarray:
+    import torch
+
+    with torch.no_grad():
+        batch = tokenizer(list(texts), padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors="pt")
+        return softmax(model(**batch).logits.numpy().astype(np.float32))
+
+
+def export(model_name: str, cache_dir: str, quantize: bool = True, opset: int = 14,
+           texts: Sequence[str] = VALIDATION_TEXTS) -> str:
+    """Exporta (e quantiza) o modelo, valida contra o PyTorch e grava o artefato; devolve o diretório
+
+    Tudo é escrito em um diretório temporário e renomeado no fim: outro
+    processo nunca vê um artefato pela metade.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    directory = artifact_dir(cache_dir, model_name, quantize)
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        started = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        tokenizer.save_pretrained(tmp_dir)  # grava tokenizer.json (tokenizer rápido)
+
+        sample = tokenizer(["Olá, tudo bem?"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequencia"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        fp32_path = os.path.join(tmp_dir, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                model, tuple(sample[name] for name in input_names), fp32_path,
+                input_names=input_names, output_names=["logits"], dynamic_axes=dynamic_axes,
+                opset_version=opset, do_constant_folding=True,
+            )
+
+        filename = "model.onnx"
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(fp32_path, os.path.join(tmp_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+            os.remove(fp32_path)
+            filename = "model.int8.onnx"
+
+        meta = {
+            "modelo": model_name,
+            "arquivo": filename,
+            "quantizado": quantize,
+            "labels": [model.config.id2label[i] for i in range(model.config.num_labels)],
+            "max_length": MAX_LENGTH,
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+            "opset": opset,
+            "exportado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "exportacao_s": None,
+        }
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, ensure_ascii=False, indent=2)
+
+        expected = torch_scores(model, tokenizer, texts)
+        got = OnnxSentimentPipeline(tmp_dir).scores(texts)
+        meta["validacao"] = {
+            "amostras": len(texts),
+            "max_diff": round(float(np.abs(expected - got).max()), 6),
+            "mesmo_rotulo": round(float((expected.argmax(axis=1) == got.argmax(axis=1)).mean()), 4),
+        }
+        meta["exportacao_s"] = round(time.perf_counter() - started, 2)
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, ensure_ascii=False, indent=2)
+
+        try:
+            os.replace(tmp_dir, directory)
+        except OSError:
+            # Outro processo exportou primeiro (diretório já existe e não está vazio): fica o dele
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return directory
+
+
+def load_or_export(model_name: str, cache_dir: str, quantize: bool = True, tolerance: float = 0.05,
+                   threads: int = 0) -> OnnxSentimentPipeline:
+    """Carrega o artefato em cache (exportando na primeira vez) se ele estiver dentro da tolerância"""
+    directory = artifact_dir(cache_dir, model_name, quantize)
+    meta = read_meta(directory)
+    if meta is None:
+        directory = export(model_name, cache_dir, quantize)
+        meta = read_meta(directory) or {}
+    max_diff = meta.get("validacao", {}).get("max_diff")
+    if max_diff is None or max_diff > tolerance:
+        raise RuntimeError(
+            f"Artefato ONNX em {directory} difere do PyTorch em {max_diff} (tolerância {tolerance}); "
+            "reexporte sem quantização ou aumente HF_ONNX_TOLERANCE"
+        )
+    return OnnxSentimentPipeline(directory, threads=threads)
+
+
+def cmd_export(args: argparse.Namespace) -> None:
+    directory = artifact_dir(args.cache, args.modelo, not args.sem_quantizacao)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    directory = export(args.modelo, args.cache, quantize=not args.sem_quantizacao)
+    meta = read_meta(directory) or {}
+    size_mb = os.path.getsize(os.path.join(directory, meta["arquivo"])) / (1024 * 1024)
+    print(f"💾 {directory} ({size_mb:.0f} MB, {meta['exportacao_s']} s)")
+    print(f"📊 Validação: {meta['validacao']}")
+
+
+def cmd_validate(args: argparse.Namespace) -> None:
+    """Compara scores e latência do artefato com o PyTorch em um arquivo de textos (ou nas amostras)"""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    texts = VALIDATION_TEXTS
+    if args.textos:
+        with open(args.textos, encoding="utf-8") as fh:
+            texts = [line.strip() for line in fh if line.strip()]
+    directory = artifact_dir(args.cache, args.modelo, not args.sem_quantizacao)
+    onnx_pipe = OnnxSentimentPipeline(directory)
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    model = AutoModelForSequenceClassification.from_pretrained(args.modelo).eval()
+
+    def timed(fn):
+        started = time.perf_counter()
+        out = np.concatenate([fn(texts[i:i + 8]) for i in range(0, len(texts), 8)])
+        return out, (time.perf_counter() - started) / len(texts) * 1000
+
+    expected, torch_ms = timed(lambda batch: torch_scores(model, tokenizer, batch))
+    got, onnx_ms = timed(onnx_pipe.scores)
+    max_diff = float(np.abs(expected - got).max())
+    same = float((expected.argmax(axis=1) == got.argmax(axis=1)).mean())
+    print(f"📊 {len(texts)} textos: diferença máxima {max_diff:.4f}, mesmo rótulo em {same:.1%}")
+    print(f"⏱️ PyTorch {torch_ms:.1f} ms/e-mail, ONNX {onnx_ms:.1f} ms/e-mail")
+    if max_diff > args.tolerancia:
+        raise SystemExit(f"❌ Fora da tolerância ({args.tolerancia})")
+    print("✅ Dentro da tolerância")
+
+
+def main() -> None:
+    try:
+        from config import HF_ONNX_DIR, HF_ONNX_TOLERANCE, HF_SENTIMENT_MODEL
+    except ImportError:
+        HF_ONNX_DIR, HF_ONNX_TOLERANCE = "models/onnx", 0.05
+        HF_SENTIMENT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    for name, fn in (("exportar", cmd_export), ("validar", cmd_validate)):
+        p = sub.add_parser(name)
+        p.add_argument("--modelo", default=HF_SENTIMENT_MODEL)
+        p.add_argument("--cache", default=HF_ONNX_DIR)
+        p.add_argument("--sem-quantizacao", action="store_true", help="mantém os pesos em float32")
+        p.set_defaults(func=fn)
+        if name == "validar":
+            p.add_argument("--textos", default=None, help="arquivo com um texto por linha")
+            p.add_argument("--tolerancia", type=float, default=HF_ONNX_TOLERANCE)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
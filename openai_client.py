@@ -0,0 +1,323 @@
+"""
+Cliente OpenAI compartilhado: pool de conexões, chamadas assíncronas concorrentes,
+limite de requisições/tokens por minuto e backoff exponencial em 429
+
+``openai`` e ``httpx`` só são importados na primeira chamada: processos que
+nunca falam com a OpenAI (ex.: só heurística) não pagam o import (~0,6 s).
+"""
+
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Type
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Balde de fichas: ``capacity`` por minuto, reabastecido continuamente"""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Espera até haver ``amount`` fichas; devolve quanto tempo esperou"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def refund(self, amount: float) -> None:
+        """Devolve fichas (ex.: a estimativa de tokens foi maior que o uso real)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    # ~4 caracteres por token é uma aproximação conservadora para PT/EN
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+class AsyncOpenAIRunner:
+    """Executa chat completions em um event loop de fundo compartilhado pelo processo
+
+    Threads síncronas (Flask, lote) usam ``complete``; código assíncrono usa
+    ``acomplete`` ou ``run_many``. Todos dividem o mesmo pool HTTP, os mesmos
+    limites de RPM/TPM e o mesmo teto de chamadas simultâneas.
+    """
+
+    def __init__(self, max_concurrency: int = 16, requests_per_minute: float = 500,
+                 tokens_per_minute: float = 200_000, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 60.0,
+                 connect_timeout: float = 10.0, max_connections: int = 64, base_url: Optional[str] = None) -> None:
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._retryable_errors: Tuple[Type[BaseException], ...] = ()
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+        self.deadline_exceeded = 0
+
+    # -- event loop de fundo (um por processo; threads não sobrevivem a fork) --
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                failure: List[BaseException] = []
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    try:
+                        self._setup()
+                    except BaseException as exc:  # ex.: sem OPENAI_API_KEY, openai/httpx não instalados
+                        failure.append(exc)
+                    finally:
+                        ready.set()
+                    if failure:
+                        loop.close()
+                        return
+                    loop.run_forever()
+
+                threading.Thread(target=run, name="openai-runner", daemon=True).start()
+                ready.wait()
+                if failure:
+                    # Nada fica guardado: a próxima chamada tenta de novo (ex.: chave definida depois)
+                    raise failure[0]
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+
+    def _setup(self) -> None:
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+        # Criados dentro do loop de fundo para ficarem presos a ele
+        self._retryable_errors = (APIStatusError, APIConnectionError, APITimeoutError)
+        self._client = self._make_client()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._rpm = TokenBucket(self.requests_per_minute)
+        self._tpm = TokenBucket(self.tokens_per_minute)
+
+    def _make_client(self) -> "AsyncOpenAI":
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+        )
+        # As novas tentativas ficam por conta do backoff abaixo
+        return AsyncOpenAI(base_url=self.base_url, max_retries=0, http_client=http_client)
+
+    # -- API --
+
+    async def acomplete(self, messages: List[Dict[str, str]], model: str, deadline: Optional[float] = None,
+                        **kwargs: Any) -> Any:
+        """Uma chat completion respeitando RPM/TPM, concorrência e backoff em 429/5xx
+
+        ``deadline`` (``time.monotonic()``) limita a chamada inteira, incluindo
+        a espera por vaga, os limites e as novas tentativas: passado o prazo
+        levanta ``TimeoutError`` e cancela a requisição HTTP em andamento.
+        """
+        if deadline is None:
+            return await self._acomplete(messages, model, **kwargs)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.deadline_exceeded += 1
+            raise TimeoutError("Prazo esgotado antes da chamada à OpenAI")
+        # Cada tentativa também tem timeout HTTP explícito, nunca maior que o prazo
+        kwargs.setdefault("timeout", min(self.timeout, remaining))
+        try:
+            return await asyncio.wait_for(self._acomplete(messages, model, **kwargs), remaining)
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise TimeoutError(f"OpenAI não respondeu em {remaining:.1f}s") from None
+
+    async def _acomplete(self, messages: List[Dict[str, str]], model: str, **kwargs: Any) -> Any:
+        estimate = estimate_tokens(messages, int(kwargs.get("max_tokens") or 256))
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.throttled_seconds += await self._rpm.acquire(1)
+                self.throttled_seconds += await self._tpm.acquire(estimate)
+                try:
+                    self.calls += 1
+                    completion = await self._client.chat.completions.create(
+                        model=model, messages=messages, **kwargs
+                    )
+                except self._retryable_errors as exc:
+                    delay = self._retry_delay(attempt, exc)
+                else:
+                    usage = getattr(completion, "usage", None)
+                    if usage is not None and usage.total_tokens:
+                        self._tpm.refund(max(0, estimate - usage.total_tokens))
+                    return completion
+            # Dorme fora do semáforo para não segurar vaga de concorrência
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _astream(self, messages: List[Dict[str, str]], model: str, out: "queue.Queue", **kwargs: Any) -> None:
+        """Completion com ``stream=True``: cada trecho de texto vai para ``out``; ``None`` marca o fim
+
+        Só a abertura do stream é repetida em 429/5xx; depois do primeiro
+        trecho um erro interrompe a resposta (o texto já foi entregue).
+        """
+        estimate = estimate_tokens(messages, int(kwargs.get("max_tokens") or 256))
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.throttled_seconds += await self._rpm.acquire(1)
+                self.throttled_seconds += await self._tpm.acquire(estimate)
+                try:
+                    self.calls += 1
+                    stream = await self._client.chat.completions.create(
+                        model=model, messages=messages, stream=True, **kwargs
+                    )
+                except self._retryable_errors as exc:
+                    delay = self._retry_delay(attempt, exc)
+                else:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            out.put(delta)
+                    out.put(None)
+                    return
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        """Espera antes da próxima tentativa; relança se o erro não for transitório ou acabaram as tentativas"""
+        status = getattr(exc, "status_code", None)
+        retryable = status is None or status in RETRYABLE_STATUS
+        if status == 429:  # RateLimitError
+            self.rate_limited += 1
+        if not retryable or attempt >= self.max_retries:
+            raise exc
+        return self._backoff_delay(attempt, exc)
+
+    def _backoff_delay(self, attempt: int, exc: Exception) -> float:
+        response = getattr(exc, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)  # jitter evita rajadas sincronizadas
+
+    def submit(self, messages: List[Dict[str, str]], model: str, deadline: Optional[float] = None,
+               **kwargs: Any) -> Future:
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.acomplete(messages, model, deadline, **kwargs), loop)
+
+    def complete(self, messages: List[Dict[str, str]], model: str, deadline: Optional[float] = None,
+                 **kwargs: Any) -> Any:
+        """Versão síncrona para threads de requisição"""
+        return self.submit(messages, model, deadline, **kwargs).result()
+
+    def stream(self, messages: List[Dict[str, str]], model: str, deadline: Optional[float] = None,
+               **kwargs: Any) -> Iterator[str]:
+        """Versão síncrona do streaming: devolve os trechos de texto conforme chegam
+
+        ``deadline`` (``time.monotonic()``) é o prazo para o primeiro trecho;
+        depois dele cada trecho tem até ``timeout`` segundos para chegar (uma
+        resposta saudável não é cortada no meio). Estourado o prazo, levanta
+        ``TimeoutError``. Se o consumidor parar antes do fim (ex.: navegador
+        fechou a conexão), a chamada em andamento é cancelada.
+        """
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.deadline_exceeded += 1
+                raise TimeoutError("Prazo esgotado antes da chamada à OpenAI")
+            kwargs.setdefault("timeout", min(self.timeout, remaining))
+        out: "queue.Queue" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._astream(messages, model, out, **kwargs), self._ensure_loop())
+        future.add_done_callback(lambda f: out.put(None) if f.cancelled() or f.exception() else None)
+        started = False
+        try:
+            while True:
+                wait = self.timeout if started or deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    delta = out.get(timeout=wait)
+                except queue.Empty:
+                    self.deadline_exceeded += 1
+                    raise TimeoutError(f"OpenAI parou de responder (sem trecho em {wait:.1f}s)") from None
+                if delta is None:
+                    break
+                started = True
+                yield delta
+            future.result()  # propaga erros da chamada
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def run_many(self, batch: List[List[Dict[str, str]]], model: str, **kwargs: Any) -> List[Any]:
+        """Dispara todas as completions de uma vez; exceções voltam no lugar do resultado"""
+        futures = [self.submit(messages, model, **kwargs) for messages in batch]
+        results: List[Any] = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "deadline_exceeded": self.deadline_exceeded,
+            "timeout_seconds": self.timeout,
+            "max_concurrency": self.max_concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+        }
@@ -0,0 +1,179 @@
+"""
+Extração de texto de PDFs página a página, com orçamento de páginas/caracteres,
+em processos próprios (mortos se estourarem o tempo) para não prender as
+threads de requisição
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from multiprocessing.connection import Connection
+from typing import Any, BinaryIO, Dict, List, Optional
+
+SPOOL_CHUNK = 1024 * 1024
+
+
+def extract_pdf_text(path: str, max_pages: int = 20, max_chars: int = 20_000) -> str:
+    """Lê páginas em ordem e para assim que houver texto suficiente para classificar"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    parts = []
+    total = 0
+    for index, page in enumerate(reader.pages):
+        if max_pages and index >= max_pages:
+            break
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            continue
+        parts.append(text)
+        total += len(text) + 1
+        if max_chars and total >= max_chars:
+            break
+    text = "\n".join(parts)
+    return text[:max_chars] if max_chars else text
+
+
+def spill_to_tempfile(stream: BinaryIO, suffix: str = "") -> str:
+    """Copia o stream em blocos para um arquivo temporário nomeado e devolve o caminho"""
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="email-classifier-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(stream, out, SPOOL_CHUNK)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _worker_main(conn: Connection) -> None:
+    """Loop de um processo de extração: recebe (caminho, páginas, caracteres), devolve (ok, texto/erro)"""
+    while True:
+        try:
+            path, max_pages, max_chars = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send((True, extract_pdf_text(path, max_pages, max_chars)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx: Any) -> None:
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), name="pdf-extractor", daemon=True)
+        self.process.start()
+        child.close()
+        self.tasks = 0
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1.0)
+        self.conn.close()
+
+
+class PdfExtractor:
+    """Executa ``extract_pdf_text`` em processos separados (ou na própria thread se ``workers=0``)
+
+    No máximo ``workers`` PDFs são extraídos ao mesmo tempo; os demais esperam
+    uma vaga, e o ``timeout`` só começa a contar quando o PDF chega a um
+    processo. Um processo que estoura o tempo é morto (e não segura a vaga),
+    um que morre (falta de memória, PDF hostil) é descartado, e cada um é
+    reciclado após ``max_tasks_per_worker`` PDFs. Os processos são criados sob
+    demanda e por processo do servidor, com ``forkserver`` para não herdar
+    threads (micro-batcher, cliente OpenAI).
+    """
+
+    def __init__(self, workers: int = 2, max_pages: int = 20, max_chars: int = 20_000,
+                 timeout: Optional[float] = 30.0, max_tasks_per_worker: int = 200) -> None:
+        self.workers = workers
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+        self._idle: List[_Worker] = []
+        self._pid: Optional[int] = None
+        self.killed = 0
+        self.crashed = 0
+
+    def _context(self) -> Any:
+        methods = multiprocessing.get_all_start_methods()
+        return multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+
+    def _acquire_worker(self) -> _Worker:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processos e pipes do processo pai não servem depois de um fork
+                self._idle = []
+                self._pid = os.getpid()
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+        return _Worker(self._context())
+
+    def _release_worker(self, worker: _Worker) -> None:
+        worker.tasks += 1
+        if worker.tasks >= self.max_tasks_per_worker:
+            worker.kill()
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                self._idle.append(worker)
+                return
+        worker.kill()
+
+    def extract_path(self, path: str) -> str:
+        if self.workers <= 0:
+            return extract_pdf_text(path, self.max_pages, self.max_chars)
+        with self._slots:
+            worker = self._acquire_worker()
+            try:
+                worker.conn.send((path, self.max_pages, self.max_chars))
+                if not worker.conn.poll(self.timeout):
+                    # Cancelar não interrompe um parse em andamento: o processo é morto
+                    worker.kill()
+                    self.killed += 1
+                    raise ValueError("Tempo esgotado ao extrair texto do PDF.")
+                ok, payload = worker.conn.recv()
+            except (EOFError, OSError, BrokenPipeError):
+                worker.kill()
+                self.crashed += 1
+                raise ValueError("O processo de extração do PDF terminou inesperadamente "
+                                 "(PDF malformado ou memória insuficiente).") from None
+            except BaseException:
+                if worker.process.is_alive() and not worker.conn.closed:
+                    worker.kill()
+                raise
+            self._release_worker(worker)
+        if not ok:
+            raise ValueError(f"Não foi possível extrair texto do PDF ({payload}).")
+        return payload
+
+    def extract_stream(self, stream: BinaryIO) -> str:
+        """Despeja o upload em disco (sem manter o PDF inteiro em RAM) e extrai de lá"""
+        path = spill_to_tempfile(stream, suffix=".pdf")
+        try:
+            return self.extract_path(path)
+        finally:
+            os.unlink(path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle) if self._pid == os.getpid() else 0
+        return {"workers": self.workers, "idle_processes": idle, "killed_on_timeout": self.killed,
+                "crashed": self.crashed, "timeout_seconds": self.timeout}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            idle, self._idle = (self._idle if self._pid == os.getpid() else []), []
+        for worker in idle:
+            worker.kill()
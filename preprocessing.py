@@ -0,0 +1,116 @@
+"""
+Pré-processamento de e-mails com padrões compilados e stopwords carregadas uma única vez
+"""
+
+import os
+import re
+import sys
+import zipfile
+from typing import FrozenSet, Iterable, List, Optional
+
+URL_RE = re.compile(r"https?://\S+")
+EMAIL_RE = re.compile(r"\b\S+@\S+\.[a-z]{2,}\b")
+# Tokens = sequências de letras; equivale a trocar o resto por espaço e fazer split
+TOKEN_RE = re.compile(r"[a-zá-úà-ùâ-ûãõç]+")
+
+STOPWORD_LANGUAGES = ("portuguese", "english")
+
+
+def ensure_nltk() -> None:
+    from nltk.corpus import stopwords
+    try:
+        _ = stopwords.words("english")
+    except LookupError:
+        import nltk
+        nltk.download("stopwords")
+
+
+def nltk_data_dirs() -> List[str]:
+    """Mesmos diretórios que ``nltk.data.path`` usa, sem importar o nltk"""
+    dirs = [d for d in os.environ.get("NLTK_DATA", "").split(os.pathsep) if d]
+    dirs.append(os.path.expanduser("~/nltk_data"))
+    dirs += [os.path.join(sys.prefix, sub) for sub in ("nltk_data", "share/nltk_data", "lib/nltk_data")]
+    dirs += ["/usr/share/nltk_data", "/usr/local/share/nltk_data", "/usr/lib/nltk_data", "/usr/local/lib/nltk_data"]
+    return dirs
+
+
+def read_stopwords_files(languages: Iterable[str]) -> Optional[FrozenSet[str]]:
+    """Lê o corpus de stopwords direto do disco (pasta ou .zip); None se não achar todas as línguas
+
+    Importar o nltk custa ~0,2 s e dezenas de MB por processo, só para ler
+    arquivos de uma palavra por linha.
+    """
+    languages = list(languages)
+    for base in nltk_data_dirs():
+        folder = os.path.join(base, "corpora", "stopwords")
+        archive = folder + ".zip"
+        words = set()
+        try:
+            if all(os.path.isfile(os.path.join(folder, lang)) for lang in languages):
+                for lang in languages:
+                    with open(os.path.join(folder, lang), encoding="utf-8") as fh:
+                        words.update(line.strip() for line in fh if line.strip())
+                return frozenset(words)
+            if os.path.isfile(archive):
+                with zipfile.ZipFile(archive) as zf:
+                    for lang in languages:
+                        text = zf.read(f"stopwords/{lang}").decode("utf-8")
+                        words.update(line.strip() for line in text.splitlines() if line.strip())
+                return frozenset(words)
+        except (OSError, KeyError, UnicodeDecodeError, zipfile.BadZipFile):
+            continue
+    return None
+
+
+def load_stopwords(languages: Iterable[str] = STOPWORD_LANGUAGES) -> FrozenSet[str]:
+    """Carrega as stopwords do NLTK (baixando o corpus se preciso); conjunto vazio se indisponível"""
+    languages = tuple(languages)
+    found = read_stopwords_files(languages)
+    if found is not None:
+        return found
+    try:
+        ensure_nltk()
+        from nltk.corpus import stopwords
+    except Exception:
+        return frozenset()
+    words = set()
+    for language in languages:
+        try:
+            words.update(stopwords.words(language))
+        except Exception:
+            pass
+    return frozenset(words)
+
+
+class Preprocessor:
+    """Normaliza e tokeniza e-mails; padrões e stopwords são montados uma vez na construção"""
+
+    def __init__(self, stopwords: Optional[Iterable[str]] = None) -> None:
+        self.stopwords: FrozenSet[str] = frozenset(stopwords) if stopwords is not None else load_stopwords()
+
+    def tokens(self, text: str) -> List[str]:
+        text = text.lower()
+
+        # Remove URLs, emails
+        text = URL_RE.sub(" ", text)
+        text = EMAIL_RE.sub(" ", text)
+
+        # Mantém só letras (números, pontuação e espaços extras viram separadores)
+        sw = self.stopwords
+        return [t for t in TOKEN_RE.findall(text) if t not in sw]
+
+    def preprocess(self, text: str) -> str:
+        return " ".join(self.tokens(text))
+
+    __call__ = preprocess
+
+    def preprocess_many(self, texts: Iterable[str]) -> List[str]:
+        """Versão em lote: evita o custo de lookup de atributos a cada e-mail"""
+        url_sub, email_sub, findall = URL_RE.sub, EMAIL_RE.sub, TOKEN_RE.findall
+        sw = self.stopwords
+        out = []
+        append = out.append
+        for text in texts:
+            text = email_sub(" ", url_sub(" ", text.lower()))
+            append(" ".join([t for t in findall(text) if t not in sw]))
+        return out
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Índice de respostas já geradas/aprovadas, buscadas pela similaridade dos e-mails de origem
+
+Cada resposta guardada tem o vetor (embedding) do e-mail que a originou. Um
+e-mail novo parecido o bastante com um antigo recebe a resposta dele em
+milissegundos; só quando nada é parecido a resposta é gerada (OpenAI/modelos).
+
+Armazenamento em ``directory``:
+
+- ``vectors.f32``: matriz ``linhas x dim`` (float32, normalizada), lida com
+  ``np.memmap``: as páginas ficam no cache do sistema e são compartilhadas
+  entre os workers, sem carregar o índice inteiro em cada processo
+- ``labels.u8``: um byte por linha (categoria e aprovação), para filtrar sem ir ao SQLite
+- ``replies.sqlite3``: texto da resposta e metadados (linha = ``id - 1``)
+- ``ivf-*/``: índice particionado opcional (k-means esférico): só os
+  ``nprobe`` grupos mais próximos são percorridos; as linhas adicionadas
+  depois da construção são comparadas uma a uma
+
+Uso:
+    python reply_index.py adicionar --dados respostas.jsonl   # {"email_text", "resposta_sugerida", "categoria"}
+    python reply_index.py particionar                         # constrói o IVF
+    python reply_index.py buscar "texto do e-mail"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+LABEL_PRODUCTIVE = 1
+LABEL_APPROVED = 2
+SCAN_BLOCK = 65_536
+WORD_RE = re.compile(r"\w+")
+
+
+class ReplyMatch(NamedTuple):
+    id: int
+    score: float
+    resposta: str
+    categoria: str
+    aprovada: bool
+
+
+# ---------------------------------------------------------------------------
+# Embeddings
+# ---------------------------------------------------------------------------
+
+class HashingEmbedder:
+    """Unigramas + bigramas em ``dim`` posições com sinal (feature hashing), norma L2
+
+    Sem modelo nem treino; captura e-mails com o mesmo vocabulário (modelos,
+    pedidos recorrentes), não sinônimos. Para isso, ``SentenceTransformerEmbedder``.
+    """
+
+    def __init__(self, dim: int = 256, tokenizer: Optional[Callable[[str], List[str]]] = None) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self.tokenizer = tokenizer or (lambda text: WORD_RE.findall(text.lower()))
+
+    def __call__(self, text: str) -> "np.ndarray":
+        import numpy as np
+
+        tokens = self.tokenizer(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return np.zeros(self.dim, dtype=np.float32)
+        h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+        signs = np.where(h & np.uint32(0x80000000), -1.0, 1.0)
+        vec = np.bincount((h % np.uint32(self.dim)).astype(np.intp), weights=signs, minlength=self.dim)
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).astype(np.float32)
+
+    def embed_many(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            out[i] = self(text)
+        return out
+
+
+class SentenceTransformerEmbedder:
+    """Modelo do ``sentence-transformers`` (opcional; importado só quando configurado)"""
+
+    def __init__(self, model_name: str) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_name}"
+
+    def __call__(self, text: str) -> "np.ndarray":
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+def make_embedder(spec: str = "hashing", dim: int = 256,
+                  tokenizer: Optional[Callable[[str], List[str]]] = None) -> Any:
+    """``"hashing"`` ou o nome de um modelo do sentence-transformers"""
+    if spec == "hashing":
+        return HashingEmbedder(dim, tokenizer)
+    return SentenceTransformerEmbedder(spec)
+
+
+def email_hash(text: str) -> str:
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Busca
+# ---------------------------------------------------------------------------
+
+def _top_k(scores: "np.ndarray", rows: "np.ndarray", k: int) -> List[tuple]:
+    import numpy as np
+
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    order = np.argsort(-scores)
+    return [(float(scores[i]), int(rows[i])) for i in order if np.isfinite(scores[i])]
+
+
+def _label_mask(labels: "np.ndarray", categoria: Optional[str], only_approved: bool) -> Optional["np.ndarray"]:
+    mask = None
+    if categoria is not None:
+        want = LABEL_PRODUCTIVE if categoria == "Produtivo" else 0
+        mask = (labels & LABEL_PRODUCTIVE) == want
+    if only_approved:
+        approved = (labels & LABEL_APPROVED) != 0
+        mask = approved if mask is None else mask & approved
+    return mask
+
+
+def spherical_kmeans(x: "np.ndarray", nlist: int, iterations: int = 8, seed: int = 0) -> "np.ndarray":
+    """Centróides (normalizados) que maximizam a similaridade de cosseno com os pontos"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_clusters(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        nonempty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        # Grupos vazios recomeçam em pontos aleatórios
+        empty = np.flatnonzero(~nonempty)
+        sums[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def assign_clusters(x: "np.ndarray", centroids: "np.ndarray", block: int = 16_384) -> "np.ndarray":
+    import numpy as np
+
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), block):
+        out[start:start + block] = np.argmax(np.asarray(x[start:start + block]) @ centroids.T, axis=1)
+    return out
+
+
+class ReplyIndex:
+    """Vetores em memmap + SQLite; busca exata (blocos) ou particionada (IVF) com filtro de categoria"""
+
+    def __init__(self, directory: str, embedder: Any, nprobe: int = 8) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.nprobe = nprobe
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.labels_path = os.path.join(directory, "labels.u8")
+        self.db_path = os.path.join(directory, "replies.sqlite3")
+        self._check_meta()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._mapped_rows = 0
+        self._vectors: Optional["np.ndarray"] = None
+        self._labels: Optional["np.ndarray"] = None
+        self._ivf: Optional[Dict[str, Any]] = None
+        self._ivf_version: Optional[str] = None
+        self.searches = 0
+        self.search_seconds = 0.0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS replies ("
+            " id INTEGER PRIMARY KEY, email_hash TEXT NOT NULL, categoria TEXT NOT NULL, resposta TEXT NOT NULL,"
+            " aprovada INTEGER NOT NULL, fonte TEXT, created REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS replies_email ON replies (email_hash)")
+        for path in (self.vectors_path, self.labels_path):
+            open(path, "ab").close()
+
+    def _check_meta(self) -> None:
+        """Vetores de outro embedder/dimensão não são comparáveis: recusa em vez de buscar lixo"""
+        path = os.path.join(self.directory, "meta.json")
+        meta = {"embedder": self.embedder.name, "dim": self.dim}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved != meta:
+                raise ValueError(f"Índice em {self.directory} foi criado com {saved}, não {meta}; use outro diretório")
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # -- escrita -----------------------------------------------------------
+
+    def add(self, email_text: str, resposta: str, categoria: str, aprovada: bool = False,
+            fonte: str = "") -> Optional[int]:
+        """Guarda uma resposta; o mesmo e-mail com a mesma resposta só atualiza a aprovação"""
+        if not resposta or not email_text.strip():
+            return None
+        digest = email_hash(email_text)
+        conn = self._conn()
+        existing = conn.execute(
+            "SELECT id, aprovada FROM replies WHERE email_hash = ? AND resposta = ?", (digest, resposta)
+        ).fetchone()
+        if existing is not None:
+            if aprovada and not existing[1]:
+                self._approve(existing[0], categoria)
+            return existing[0]
+        ids = self.add_many([email_text], [resposta], [categoria], [aprovada], [fonte])
+        return ids[0] if ids else None
+
+    def _approve(self, row_id: int, categoria: str) -> None:
+        conn = self._conn()
+        conn.execute("UPDATE replies SET aprovada = 1 WHERE id = ?", (row_id,))
+        label = (LABEL_PRODUCTIVE if categoria == "Produtivo" else 0) | LABEL_APPROVED
+        fd = os.open(self.labels_path, os.O_WRONLY)
+        try:
+            os.pwrite(fd, bytes([label]), row_id - 1)
+        finally:
+            os.close(fd)
+
+    def add_many(self, emails: Sequence[str], respostas: Sequence[str], categorias: Sequence[str],
+                 aprovadas: Optional[Sequence[bool]] = None, fontes: Optional[Sequence[str]] = None,
+                 vectors: Optional["np.ndarray"] = None) -> List[int]:
+        """Inserção em lote: vetores e rótulos gravados em posições contíguas, metadados numa transação
+
+        Vários processos podem escrever: o ``BEGIN IMMEDIATE`` do SQLite
+        serializa os escritores e decide as linhas. Se algo falha antes do
+        COMMIT, as mesmas linhas são reaproveitadas pela próxima inserção.
+        """
+        import numpy as np
+
+        n = len(emails)
+        if not n:
+            return []
+        aprovadas = aprovadas or [False] * n
+        fontes = fontes or [""] * n
+        if vectors is None:
+            vectors = self.embedder.embed_many(emails)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        labels = np.array([
+            (LABEL_PRODUCTIVE if c == "Produtivo" else 0) | (LABEL_APPROVED if a else 0)
+            for c, a in zip(categorias, aprovadas)
+        ], dtype=np.uint8)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM replies").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO replies (id, email_hash, categoria, resposta, aprovada, fonte, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(first + i, email_hash(e), c, r, int(bool(a)), f, now)
+                 for i, (e, r, c, a, f) in enumerate(zip(emails, respostas, categorias, aprovadas, fontes))],
+            )
+            row = first - 1
+            for path, data in ((self.vectors_path, vectors), (self.labels_path, labels)):
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    os.pwrite(fd, data.tobytes(), row * data.itemsize * (data.shape[1] if data.ndim > 1 else 1))
+                finally:
+                    os.close(fd)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return list(range(first, first + n))
+
+    # -- leitura -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        row_bytes = self.dim * 4
+        return min(os.path.getsize(self.vectors_path) // row_bytes, os.path.getsize(self.labels_path))
+
+    def _mapped(self) -> tuple:
+        """Memmaps dos vetores/rótulos; remapeia quando outro processo acrescentou linhas"""
+        import numpy as np
+
+        rows = len(self)
+        if rows != self._mapped_rows:
+            with self._lock:
+                if rows != self._mapped_rows:
+                    if rows:
+                        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+                        self._labels = np.memmap(self.labels_path, dtype=np.uint8, mode="r", shape=(rows,))
+                    self._mapped_rows = rows
+        return self._mapped_rows, self._vectors, self._labels
+
+    def _load_ivf(self) -> Optional[Dict[str, Any]]:
+        import numpy as np
+
+        pointer = os.path.join(self.directory, "ivf.json")
+        try:
+            with open(pointer, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            return None
+        if info["version"] != self._ivf_version:
+            folder = os.path.join(self.directory, info["version"])
+            self._ivf = {
+                "rows_covered": info["rows"],
+                "centroids": np.load(os.path.join(folder, "centroids.npy")),
+                "offsets": np.load(os.path.join(folder, "offsets.npy")),
+                "rows": np.load(os.path.join(folder, "rows.npy"), mmap_mode="r"),
+                "vectors": np.load(os.path.join(folder, "vectors.npy"), mmap_mode="r"),
+            }
+            self._ivf_version = info["version"]
+        return self._ivf
+
+    def _scan(self, vectors: "np.ndarray", labels: "np.ndarray", q: "np.ndarray", start: int, stop: int,
+              k: int, categoria: Optional[str], only_approved: bool) -> List[tuple]:
+        import numpy as np
+
+        best: List[tuple] = []
+        for block in range(start, stop, SCAN_BLOCK):
+            end = min(block + SCAN_BLOCK, stop)
+            scores = np.asarray(vectors[block:end]) @ q
+            mask = _label_mask(np.asarray(labels[block:end]), categoria, only_approved)
+            if mask is not None:
+                scores[~mask] = -np.inf
+            best = sorted(best + _top_k(scores, np.arange(block, end), k), reverse=True)[:k]
+        return best
+
+    def _search_ivf(self, ivf: Dict[str, Any], labels: "np.ndarray", q: "np.ndarray", k: int,
+                    categoria: Optional[str], only_approved: bool, nprobe: int) -> List[tuple]:
+        import numpy as np
+
+        centroids, offsets = ivf["centroids"], ivf["offsets"]
+        nprobe = min(nprobe, len(centroids))
+        probes = np.argpartition(-(centroids @ q), nprobe - 1)[:nprobe]
+        scores, rows = [], []
+        for c in probes:
+            s, e = offsets[c], offsets[c + 1]
+            if e > s:
+                scores.append(np.asarray(ivf["vectors"][s:e]) @ q)
+                rows.append(np.asarray(ivf["rows"][s:e]))
+        if not scores:
+            return []
+        scores_all, rows_all = np.concatenate(scores), np.concatenate(rows)
+        mask = _label_mask(np.asarray(labels[rows_all]), categoria, only_approved)
+        if mask is not None:
+            scores_all[~mask] = -np.inf
+        return _top_k(scores_all, rows_all, k)
+
+    def search(self, email_text: Optional[str] = None, k: int = 5, categoria: Optional[str] = None,
+               only_approved: bool = False, vector: Optional["np.ndarray"] = None,
+               exact: bool = False, nprobe: Optional[int] = None) -> List[ReplyMatch]:
+        """As ``k`` respostas de e-mails mais parecidos (similaridade de cosseno), da mais parecida"""
+        started = time.perf_counter()
+        q = self.embedder(email_text) if vector is None else vector
+        rows, vectors, labels = self._mapped()
+        if not rows or not q.any():
+            return []
+        ivf = None if exact else self._load_ivf()
+        if ivf is not None and ivf["rows_covered"] <= rows:
+            covered = ivf["rows_covered"]
+            hits = self._search_ivf(ivf, labels, q, k, categoria, only_approved, nprobe or self.nprobe)
+            # Linhas adicionadas depois da construção do IVF: comparação direta
+            hits = sorted(hits + self._scan(vectors, labels, q, covered, rows, k, categoria, only_approved),
+                          reverse=True)[:k]
+        else:
+            hits = self._scan(vectors, labels, q, 0, rows, k, categoria, only_approved)
+        matches = self._fetch(hits)
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - started
+        return matches
+
+    def _fetch(self, hits: List[tuple]) -> List[ReplyMatch]:
+        if not hits:
+            return []
+        ids = [row + 1 for _, row in hits]
+        found = {
+            r[0]: r for r in self._conn().execute(
+                f"SELECT id, resposta, categoria, aprovada FROM replies WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+        }
+        # Linha sem metadados = escrita interrompida antes do COMMIT: ignorada
+        return [ReplyMatch(row + 1, score, found[row + 1][1], found[row + 1][2], bool(found[row + 1][3]))
+                for score, row in hits if row + 1 in found]
+
+    def best(self, email_text: str, min_similarity: float, categoria: Optional[str] = None,
+             only_approved: bool = False) -> Optional[ReplyMatch]:
+        matches = self.search(email_text, k=1, categoria=categoria, only_approved=only_approved)
+        if matches and matches[0].score >= min_similarity:
+            return matches[0]
+        return None
+
+    # -- particionamento ---------------------------------------------------
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 8, sample: int = 100_000,
+                  seed: int = 0) -> Dict[str, Any]:
+        """k-means esférico numa amostra, vetores regravados agrupados por partição (leitura contígua)"""
+        import numpy as np
+
+        started = time.perf_counter()
+        rows, vectors, _ = self._mapped()
+        if rows < 2:
+            raise ValueError("Índice vazio: nada para particionar")
+        nlist = min(rows, nlist or max(1, int(np.sqrt(rows))))
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(rows, min(rows, max(sample, nlist)), replace=False))
+        centroids = spherical_kmeans(np.asarray(vectors[picked]), nlist, iterations, seed)
+        assign = assign_clusters(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist)))).astype(np.int64)
+
+        version = f"ivf-{int(time.time() * 1000)}"
+        folder = os.path.join(self.directory, version)
+        os.makedirs(folder)
+        np.save(os.path.join(folder, "centroids.npy"), centroids)
+        np.save(os.path.join(folder, "offsets.npy"), offsets)
+        np.save(os.path.join(folder, "rows.npy"), order)
+        grouped = np.lib.format.open_memmap(os.path.join(folder, "vectors.npy"), mode="w+",
+                                            dtype=np.float32, shape=(rows, self.dim))
+        for start in range(0, rows, SCAN_BLOCK):
+            grouped[start:start + SCAN_BLOCK] = vectors[order[start:start + SCAN_BLOCK]]
+        grouped.flush()
+        del grouped
+
+        pointer = os.path.join(self.directory, "ivf.json")
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": version, "rows": rows, "nlist": nlist}, f)
+        os.replace(f"{pointer}.tmp", pointer)
+        # Versões antigas: quem ainda as tem mapeadas continua lendo até remapear
+        for name in os.listdir(self.directory):
+            if name.startswith("ivf-") and name != version:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return {"rows": rows, "nlist": nlist, "seconds": round(time.perf_counter() - started, 2)}
+
+    def stats(self) -> Dict[str, Any]:
+        ivf = self._load_ivf()
+        return {
+            "entries": len(self),
+            "embedder": self.embedder.name,
+            "dim": self.dim,
+            "ivf_rows": ivf["rows_covered"] if ivf else 0,
+            "ivf_partitions": len(ivf["centroids"]) if ivf else 0,
+            "nprobe": self.nprobe,
+            "searches": self.searches,
+            "avg_search_ms": round(self.search_seconds / self.searches * 1000, 3) if self.searches else 0.0,
+            "disk_mb": round(sum(
+                os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(self.directory) for f in files
+            ) / 1e6, 1),
+        }
+
+
+def main() -> None:
+    try:
+        from config import REPLY_INDEX_DIR, REPLY_INDEX_EMBEDDER, REPLY_INDEX_DIM, REPLY_INDEX_NPROBE
+    except ImportError:
+        REPLY_INDEX_DIR, REPLY_INDEX_EMBEDDER, REPLY_INDEX_DIM, REPLY_INDEX_NPROBE = "models/replies", "hashing", 256, 8
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--indice", default=REPLY_INDEX_DIR)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("adicionar", help="importa respostas de um JSONL")
+    p.add_argument("--dados", required=True)
+    p.add_argument("--aprovadas", action="store_true", help="marca todas como aprovadas")
+    p = sub.add_parser("particionar", help="constrói o índice IVF")
+    p.add_argument("--particoes", type=int, default=None, help="padrão: raiz quadrada do nº de linhas")
+    p = sub.add_parser("buscar")
+    p.add_argument("texto")
+    p.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    # Mesmo pré-processamento do app, para os vetores serem comparáveis com os do servidor
+    from preprocessing import Preprocessor
+
+    preprocessor = Preprocessor()
+    index = ReplyIndex(args.indice, make_embedder(REPLY_INDEX_EMBEDDER, REPLY_INDEX_DIM, preprocessor.tokens),
+                       REPLY_INDEX_NPROBE)
+    if args.comando == "adicionar":
+        from batch_io import email_from_record
+
+        batch: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            index.add_many([email_from_record(r) for r in batch], [r["resposta_sugerida"] for r in batch],
+                           [r.get("categoria") or "Improdutivo" for r in batch],
+                           [args.aprovadas or bool(r.get("aprovada")) for r in batch],
+                           [r.get("fonte") or "importacao" for r in batch])
+            batch.clear()
+
+        with open(args.dados, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("resposta_sugerida"):
+                        batch.append(record)
+                if len(batch) >= 1000:
+                    flush()
+        flush()
+        print(f"✅ {len(index)} respostas no índice {args.indice}")
+    elif args.comando == "particionar":
+        print(f"✅ {index.build_ivf(args.particoes)}")
+    else:
+        for match in index.search(args.texto, k=args.k):
+            print(f"{match.score:.3f} [{match.categoria}{', aprovada' if match.aprovada else ''}] {match.resposta}")
+    print(json.dumps(index.stats(), ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
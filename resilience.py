@@ -0,0 +1,137 @@
+"""
+Degradação controlada: prazo por requisição e disjuntor por backend
+
+Quando a OpenAI fica lenta ou fora do ar, cada requisição esperaria o
+timeout inteiro antes de cair para o próximo método. Com um ``Deadline`` a
+classificação inteira tem um orçamento (os backends pegam só o que sobra) e
+o ``CircuitBreaker`` pula direto um backend que vem falhando, até passar o
+tempo de resfriamento.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class Deadline:
+    """Instante-limite (relógio monotônico) de uma requisição"""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = float(seconds)
+        self.at = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+
+# Um prazo por thread/contexto: o código chamado não precisa recebê-lo como argumento
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining_budget(default: Optional[float] = None) -> Optional[float]:
+    """Segundos que sobram do prazo atual (``default`` se não há prazo)"""
+    deadline = _current.get()
+    return default if deadline is None else deadline.remaining()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Define o prazo do bloco; um prazo externo mais curto continua valendo"""
+    outer = _current.get()
+    if seconds is None or (outer is not None and outer.remaining() <= seconds):
+        yield outer
+        return
+    token = _current.set(Deadline(seconds))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+class CircuitBreaker:
+    """Disjuntor clássico: fechado → aberto → meio-aberto
+
+    - fechado: tudo passa; ``failure_threshold`` falhas seguidas abrem o disjuntor
+    - aberto: ``allow()`` devolve False (o chamador usa o fallback na hora)
+      por ``cooldown_seconds``
+    - meio-aberto: passado o resfriamento, uma única chamada de teste passa;
+      sucesso fecha o disjuntor, falha o abre de novo
+
+    O estado é por processo (cada worker descobre a falha sozinho).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds = float(cooldown_seconds)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.skipped = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Pode chamar o backend agora? No meio-aberto só uma chamada de teste por vez"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Registra uma falha; devolve True se o disjuntor acabou de abrir"""
+        with self._lock:
+            self._failures += 1
+            reopen = self._state == self.HALF_OPEN
+            self._probing = False
+            if reopen or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                return True
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "skipped": self.skipped,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_seconds": self.cooldown_seconds,
+            }
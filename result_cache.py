@@ -0,0 +1,152 @@
+"""
+Cache de classificações endereçado por conteúdo (LRU em memória + SQLite opcional)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza espaços e caixa para que cópias idênticas gerem a mesma chave"""
+    return " ".join(text.split()).casefold()
+
+
+def make_key(text: str, method: str, model: str) -> str:
+    payload = f"{method}\x00{model}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _SQLiteTier:
+    """Camada em disco que sobrevive a reinícios; uma conexão protegida por lock"""
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+        self._writes = 0
+
+    def get(self, key: str, min_created: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < min_created:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Dict[str, Any], created: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), created, created),
+            )
+            self._writes += 1
+            # Poda em lotes para não pagar um COUNT(*) a cada escrita
+            if self._writes % 100 == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        total = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = total - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """Cache de resultados com LRU em memória, TTL e camada SQLite opcional"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 7 * 24 * 3600,
+                 db_path: Optional[str] = None, db_max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._disk = _SQLiteTier(db_path, db_max_entries) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        min_created = time.time() - self.ttl_seconds
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if item[1] >= min_created:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return dict(item[0])
+                del self._memory[key]
+
+        found = self._disk.get(key, min_created) if self._disk is not None else None
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store_memory(key, found[0], found[1])
+        return dict(found[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        created = time.time()
+        value = dict(value)
+        with self._lock:
+            self._store_memory(key, value, created)
+        if self._disk is not None:
+            self._disk.set(key, value, created)
+
+    def _store_memory(self, key: str, value: Dict[str, Any], created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+        stats["disk_entries"] = len(self._disk) if self._disk is not None else None
+        return stats
@@ -60,6 +60,79 @@ function updateDashboardAndHistory(data) {
   }
 }
 
+// Métodos cuja resposta é gerada pela OpenAI: vale a pena receber em streaming (SSE)
+const STREAMING_METHODS = ['openai', 'cascade'];
+
+function useStreaming() {
+  return STREAMING_METHODS.includes(form.dataset.metodo) && 'ReadableStream' in window && 'TextDecoder' in window;
+}
+
+async function processBlocking(formData) {
+  const res = await fetch('/process', {
+    method: 'POST',
+    body: formData,
+  });
+  const data = await res.json();
+  if (!res.ok) {
+    throw new Error(data.error || 'Erro ao processar');
+  }
+  updateResult(data);
+  updateDashboardAndHistory(data);
+}
+
+function parseSseEvent(block) {
+  let event = 'message';
+  const dataLines = [];
+  block.split('\n').forEach(line => {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  });
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+}
+
+async function processStreaming(formData) {
+  const res = await fetch('/process/stream', {
+    method: 'POST',
+    body: formData,
+    headers: { 'Accept': 'text/event-stream' },
+  });
+  if (!res.ok) {
+    const data = await res.json().catch(() => ({}));
+    throw new Error(data.error || 'Erro ao processar');
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let resposta = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const { event, data } = parseSseEvent(buffer.slice(0, sep));
+      buffer = buffer.slice(sep + 2);
+      if (event === 'classificacao') {
+        // Categoria já conhecida: mostra o resultado e esconde o spinner
+        updateResult({ categoria: data.categoria, motivo: data.motivo, resposta_sugerida: '' });
+        setLoading(false);
+      } else if (event === 'resposta') {
+        resposta += data.texto || '';
+        respostaEl.value = resposta;
+      } else if (event === 'fim') {
+        respostaEl.value = data.resposta_sugerida || resposta;
+        updateDashboardAndHistory(data);
+      } else if (event === 'erro') {
+        throw new Error(data.error || 'Erro ao gerar resposta');
+      }
+    }
+  }
+}
+
 form.addEventListener('submit', async (e) => {
   e.preventDefault();
   setError('');
@@ -68,16 +141,11 @@ form.addEventListener('submit', async (e) => {
 
   try {
     const formData = new FormData(form);
-    const res = await fetch('/process', {
-      method: 'POST',
-      body: formData,
-    });
-    const data = await res.json();
-    if (!res.ok) {
-      throw new Error(data.error || 'Erro ao processar');
+    if (useStreaming()) {
+      await processStreaming(formData);
+    } else {
+      await processBlocking(formData);
     }
-    updateResult(data);
-    updateDashboardAndHistory(data);
   } catch (err) {
     setError(err.message || String(err));
   } finally {
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita o endpoint /v1/chat/completions da OpenAI (para testes e benchmarks)
+
+Uso:
+    python stub_openai_server.py --porta 8001 --latencia-ms 300 --taxa-429 0.1
+
+Depois aponte o app para ele:
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+PRODUCTIVE_HINTS = ("reuni", "projeto", "proposta", "prazo", "cronograma", "status", "contrato", "relatório")
+
+
+STUB_REPLY = "Olá! Obrigado pelo contato, retornaremos em breve."
+
+
+def fake_classification(messages: List[Dict[str, Any]]) -> str:
+    """Resposta determinística no formato pedido pelo prompt do app
+
+    Prompt sem JSON → só o texto da resposta; JSON sem ``resposta_sugerida`` →
+    só categoria e motivo; caso contrário, o JSON completo.
+    """
+    system = " ".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+    text = " ".join(str(m.get("content") or "") for m in messages if m.get("role") == "user").lower()
+    if "JSON" in system and "sem JSON" in system:
+        return STUB_REPLY
+    productive = any(hint in text for hint in PRODUCTIVE_HINTS)
+    data = {
+        "categoria": "Produtivo" if productive else "Improdutivo",
+        "motivo": "Resposta simulada pelo servidor stub",
+    }
+    if "resposta_sugerida" in system or not system:
+        data["resposta_sugerida"] = STUB_REPLY
+    return json.dumps(data, ensure_ascii=False)
+
+
+class StubState:
+    def __init__(self, latency_ms: float, rate_429: float, rpm_limit: Optional[int], token_ms: float = 20.0) -> None:
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+        self.rate_429 = rate_429
+        self.rpm_limit = rpm_limit
+        self.lock = threading.Lock()
+        self.window: List[float] = []
+        self.requests = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def admit(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 60.0]
+            limited = self.rpm_limit is not None and len(self.window) >= self.rpm_limit
+            if limited or random.random() < self.rate_429:
+                self.rejected += 1
+                return False
+            self.window.append(now)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def release(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como a API real
+        # Cabeçalho e corpo saem em writes separados: sem isso o Nagle + ACK atrasado somam ~40 ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_stream(self, content: str, model: str, token_ms: float) -> None:
+            """Devolve o conteúdo em eventos SSE ``chat.completion.chunk``, uma palavra por vez"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            words = content.split(" ")
+            for index, word in enumerate(words):
+                piece = word if index == 0 else " " + word
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(token_ms / 1000.0)
+            done = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send(200, {"requests": state.requests, "rejected": state.rejected,
+                                 "max_in_flight": state.max_in_flight})
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            if not state.admit():
+                self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests",
+                                           "code": "rate_limit_exceeded"}}, {"Retry-After": "0.2"})
+                return
+            try:
+                time.sleep(state.latency_ms / 1000.0)
+                messages = body.get("messages") or []
+                content = fake_classification(messages)
+                if body.get("stream"):
+                    self._send_stream(content, body.get("model", "stub"), state.token_ms)
+                    return
+                prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+                completion_tokens = len(content) // 4
+                self._send(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+            finally:
+                state.release()
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8001, latency_ms: float = 200.0, rate_429: float = 0.0,
+          rpm_limit: Optional[int] = None, token_ms: float = 20.0) -> ThreadingHTTPServer:
+    """Sobe o stub em uma thread e devolve o servidor (use ``shutdown()`` para parar)
+
+    ``latency_ms`` é o tempo até a resposta (ou o primeiro trecho, com
+    ``stream=True``); ``token_ms`` é o intervalo entre trechos do stream.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(StubState(latency_ms, rate_429, rpm_limit, token_ms)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8001)
+    parser.add_argument("--latencia-ms", type=float, default=200.0)
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração de requisições rejeitadas com 429")
+    parser.add_argument("--limite-rpm", type=int, default=None, help="rejeita acima deste RPM")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="intervalo entre trechos com stream=True")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.porta, args.latencia_ms, args.taxa_429, args.limite_rpm, args.token_ms)
+    print(f"🧪 Stub OpenAI em http://{args.host}:{args.porta}/v1 (Ctrl+C para sair)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
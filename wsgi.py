@@ -0,0 +1,36 @@
+"""
+Ponto de entrada WSGI para produção (gunicorn)
+
+O gunicorn importa este módulo uma vez no processo mestre (``preload_app``);
+o modelo carregado aqui é compartilhado com os workers via copy-on-write.
+"""
+
+import gc
+
+from app import app, logger, model_registry, preload_backend_modules, HF_AVAILABLE, CLASSIFICATION_METHOD
+
+try:
+    from config import SERVER_PRELOAD_MODEL
+except ImportError:
+    SERVER_PRELOAD_MODEL = True
+
+if SERVER_PRELOAD_MODEL:
+    # Só os módulos do backend configurado (um worker só de heurística não importa torch/openai)
+    loaded = preload_backend_modules(CLASSIFICATION_METHOD)
+    if loaded:
+        logger.info("📦 Módulos pré-importados no processo mestre: %s", ", ".join(loaded))
+
+if SERVER_PRELOAD_MODEL and HF_AVAILABLE and CLASSIFICATION_METHOD in ("huggingface", "openai"):
+    try:
+        # Só os pesos: a inferência de aquecimento roda em cada worker (pools de threads
+        # do torch criados antes do fork podem travar nos filhos)
+        model_registry.get("sentiment")
+        logger.info("📦 Modelo Hugging Face pré-carregado no processo mestre")
+    except Exception as e:
+        logger.warning("⚠️ Falha ao pré-carregar modelo Hugging Face: %s", e)
+
+# Tira os objetos já criados do rastreamento do GC: evita que coletas nos workers
+# escrevam nessas páginas e quebrem o compartilhamento copy-on-write
+gc.freeze()
+
+__all__ = ["app"]